@@ -1,103 +1,80 @@
-import requests
-import json
-from datetime import datetime, timedelta
-import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+import time
+import Geodesy
+import Metrics
+from AircraftBatch import AircraftBatch
+import ConflictPrediction
+import OpenSkyClient
+from Snapshot import Snapshot
+from SpatialIndex import SphereGrid
+from TrackTiles import lon_ranges
+
+# Aircraft are fetched per grid tile around the balloons when that costs fewer API credits than one box around all of them
+TILE_DEG = float(os.environ.get('WINDBORNE_AIR_TILE_DEG', 10))
+MAX_TILES = int(os.environ.get('WINDBORNE_AIR_MAX_TILES', 24))  # Coarser tiles are used beyond this many requests
+TILE_SIZES = (10, 15, 20, 30, 45, 60, 90, 180)  # Tile sizes that divide the globe evenly, for coarsening
+TILE_TTL = float(os.environ.get('WINDBORNE_AIR_TILE_TTL', 120))  # Seconds a tile's aircraft stay fresh
+STALE_TILE_TTL = 15 * TILE_TTL  # A tile that cannot be refreshed serves its last result for this long
+BUFFER_DEG = 1.0  # Margin fetched around each balloon
+TILE_WORKERS = 8
+FETCH_DEADLINE = 10  # Seconds to wait for all tiles of one refresh
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide OpenSky client, so every tile shares its session, budget and circuit breaker"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            # OpenSky credentials raise the daily request budget tenfold
+            username = os.environ.get('OPENSKY_USERNAME')
+            password = os.environ.get('OPENSKY_PASSWORD')
+            _client = OpenSkyClient.OpenSkyClient(auth=(username, password) if username and password else None,
+                                                  pool_size=TILE_WORKERS)
+    return _client
 
 class AirTrafficDataCollector:
-    def __init__(self):
-        # OpenSky Network API - free tier with signup
-        self.base_url = "https://opensky-network.org/api"
-        # Note: For production use, you'd need to sign up for API credentials
-        # For demo purposes, we'll use the public endpoint with limitations
-        self.username = None  # Add your OpenSky username here
-        self.password = None  # Add your OpenSky password here
+    def __init__(self, client=None):
+        # OpenSky Network API, through the shared client that retries, budgets and trips its breaker
+        self.client = client or get_client()
     
     def get_aircraft_in_area(self, lat_min, lat_max, lon_min, lon_max, altitude_min=0, altitude_max=50000):
         """Get aircraft positions in a specific area using OpenSky Network API"""
         try:
-            url = f"{self.base_url}/states/all"
-            params = {
-                'lamin': lat_min,
-                'lamax': lat_max,
-                'lomin': lon_min,
-                'lomax': lon_max,
-                'time': int(datetime.now().timestamp())
-            }
-            
-            # Use basic authentication if credentials are provided
-            auth = None
-            if self.username and self.password:
-                auth = (self.username, self.password)
-            
-            response = requests.get(url, params=params, auth=auth, timeout=5)
-            response.raise_for_status()
-            
-            data = response.json()
-            states = data.get('states', [])
-            
-            if not states:
-                return []
-            
-            # Filter and process aircraft data
-            aircraft_list = []
-            for state in states:
-                if len(state) >= 17:  # Ensure we have enough data fields
-                    aircraft = self._parse_aircraft_state(state)
-                    if aircraft and self._is_valid_aircraft(aircraft, altitude_min, altitude_max):
-                        aircraft_list.append(aircraft)
-            
-            return aircraft_list
-            
+            return self.fetch_area(lat_min, lat_max, lon_min, lon_max, altitude_min, altitude_max)
         except Exception as e:
-            return []
-    
-    def _parse_aircraft_state(self, state):
-        """Parse aircraft state data from OpenSky API response"""
-        try:
-            return {
-                'icao24': state[0],  # ICAO24 address
-                'callsign': state[1],  # Callsign
-                'origin_country': state[2],  # Country
-                'time_position': state[3],  # Unix timestamp
-                'time_velocity': state[4],  # Unix timestamp
-                'longitude': state[5],  # WGS84 longitude
-                'latitude': state[6],  # WGS84 latitude
-                'altitude': state[7],  # Geometric altitude in meters
-                'on_ground': state[8],  # Boolean
-                'velocity': state[9],  # Velocity in m/s
-                'true_track': state[10],  # True track in degrees
-                'vertical_rate': state[11],  # Vertical rate in m/s
-                'sensors': state[12],  # Sensor IDs
-                'geo_altitude': state[13],  # Geometric altitude in meters
-                'squawk': state[14],  # Squawk code
-                'spi': state[15],  # Special purpose indicator
-                'position_source': state[16]  # Position source
-            }
-        except (IndexError, TypeError):
-            return None
-    
-    def _is_valid_aircraft(self, aircraft, altitude_min, altitude_max):
-        """Check if aircraft data is valid and within altitude range"""
-        if not aircraft:
-            return False
-        
-        # Check if we have valid position data
-        if aircraft.get('latitude') is None or aircraft.get('longitude') is None:
-            return False
-        
-        # Check altitude range
-        altitude = aircraft.get('altitude') or aircraft.get('geo_altitude')
-        if altitude is None:
-            return False
-        
-        return altitude_min <= altitude <= altitude_max
-    
+            return AircraftBatch.empty()
 
+    def fetch_area(self, lat_min, lat_max, lon_min, lon_max, altitude_min=0, altitude_max=50000):
+        """Like get_aircraft_in_area, but raises on failure so callers can tell it from an empty area"""
+        data = self.client.get_states(lat_min, lat_max, lon_min, lon_max)
+        # Aircraft with a position and an altitude in range, keeping only the fields the app reads
+        return AircraftBatch.from_states(data.get('states') or [], altitude_min, altitude_max)
     
-    def analyze_safety_concerns(self, balloons_data, aircraft_data):
-        """Analyze potential safety concerns between balloons and aircraft"""
+    def analyze_safety_concerns(self, balloons_data, aircraft_data, heads=None, motion=None, now=None, balloon_ids=None):
+        """Analyze potential safety concerns between balloons and aircraft.
+
+        With motion, the (speed, direction) arrays from ConflictPrediction.balloon_motion,
+        conflicts predicted over the look-ahead horizon are added as well. heads and
+        balloon_ids are read from balloons_data when not given.
+        """
+        # Current balloon positions, one row per entry in balloons_data
+        if heads is None:
+            heads = balloon_heads(balloons_data)
+        # Encounters name balloons by track id, which stays the same across refreshes, not by row
+        if balloon_ids is None:
+            balloon_ids = np.array([b['id'] for b in balloons_data], dtype=np.int64)
+        return self.analyze_heads(heads, balloon_ids, aircraft_data, motion, now)
+
+    def analyze_heads(self, heads, balloon_ids, aircraft_data, motion=None, now=None):
+        """analyze_safety_concerns from balloon columns alone: a Snapshot of current positions and the track id of each row"""
         safety_analysis = {
-            'total_balloons': len(balloons_data),
+            'total_balloons': len(heads),
             'total_aircraft': len(aircraft_data),
             'near_misses': [],
             'high_risk_encounters': [],
@@ -113,138 +90,250 @@ class AirTrafficDataCollector:
         HIGH_RISK_DISTANCE = 2000  # 2 km for high risk
         MEDIUM_RISK_DISTANCE = 3500  # 3.5 km for medium risk
         
-        for balloon_idx, balloon in enumerate(balloons_data):
-            if not balloon['path'] or len(balloon['path']) == 0:
-                continue
-            
-            balloon_pos = balloon['path'][0]  # Current balloon position
-            balloon_lat, balloon_lon = balloon_pos[0], balloon_pos[1]
-            balloon_altitude = 20000  # Assume balloon altitude ~20km (typical sounding balloon)
-            
-            for aircraft in aircraft_data:
-                aircraft_lat = aircraft['latitude']
-                aircraft_lon = aircraft['longitude']
-                aircraft_altitude = aircraft['altitude'] or aircraft['geo_altitude'] or 0
-                
-                # Calculate horizontal distance
-                horizontal_distance = self._calculate_distance(
-                    balloon_lat, balloon_lon, 
-                    aircraft_lat, aircraft_lon
-                )
+        BALLOON_ALTITUDE = 20000  # Assume balloon altitude ~20km (typical sounding balloon)
+        timings = {}
+        stage_start = time.perf_counter()
+        balloon_rows = heads.valid_indices()
+
+        # Stage 1: vertical separation, vectorised over all aircraft. Only aircraft within
+        # VERTICAL_SAFETY_DISTANCE of the balloon layer can appear in any category below.
+        aircraft_data = AircraftBatch.coerce(aircraft_data)
+        aircraft_altitudes = np.nan_to_num(aircraft_data.altitudes(), nan=0.0)
+        in_layer = np.flatnonzero(np.abs(BALLOON_ALTITUDE - aircraft_altitudes) <= VERTICAL_SAFETY_DISTANCE)
+        timings['vertical_filter'] = time.perf_counter() - stage_start
+
+        # Stage 2: index the remaining aircraft and find the ones near each balloon
+        stage_start = time.perf_counter()
+        aircraft_lats = aircraft_data.columns['latitude'][in_layer]
+        aircraft_lons = aircraft_data.columns['longitude'][in_layer]
+        grid = SphereGrid(aircraft_lats, aircraft_lons, HORIZONTAL_SAFETY_DISTANCE / 1000)
+        balloon_index, aircraft_index = grid.candidates(heads.lat[balloon_rows], heads.lon[balloon_rows])
+        timings['spatial_index'] = time.perf_counter() - stage_start
+
+        # Stage 3: exact distances for candidate pairs only
+        stage_start = time.perf_counter()
+        horizontal_distances = Geodesy.haversine_km(
+            heads.lat[balloon_rows][balloon_index], heads.lon[balloon_rows][balloon_index],
+            aircraft_lats[aircraft_index], aircraft_lons[aircraft_index]) * 1000
+        close = horizontal_distances <= HORIZONTAL_SAFETY_DISTANCE
+        pairs_balloon = balloon_rows[balloon_index[close]]
+        pairs_aircraft = in_layer[aircraft_index[close]]
+        horizontal_distances = horizontal_distances[close]
+        # Same order as the old nested loop: by balloon, then by aircraft
+        order = np.lexsort((pairs_aircraft, pairs_balloon))
+        timings['exact_distance'] = time.perf_counter() - stage_start
+
+        # Stage 4: classify exactly as before
+        stage_start = time.perf_counter()
+        callsigns = aircraft_data.columns['callsign']
+        for balloon_idx, aircraft_idx, horizontal_distance in zip(
+                pairs_balloon[order].tolist(), pairs_aircraft[order].tolist(), horizontal_distances[order].tolist()):
+            balloon_altitude = BALLOON_ALTITUDE
+            aircraft_altitude = float(aircraft_altitudes[aircraft_idx])
                 
-                # Calculate vertical distance
-                vertical_distance = abs(balloon_altitude - aircraft_altitude)
+            # Calculate vertical distance
+            vertical_distance = abs(balloon_altitude - aircraft_altitude)
+            encounter = {
+                'balloon_id': int(balloon_ids[balloon_idx]),
+                'aircraft_callsign': callsigns[aircraft_idx],
+                'horizontal_distance': horizontal_distance,
+                'vertical_distance': vertical_distance,
+                'aircraft_altitude': aircraft_altitude,
+                'balloon_altitude': balloon_altitude
+            }
+            
+            # Check for safety violations
+            if horizontal_distance <= HORIZONTAL_SAFETY_DISTANCE and vertical_distance <= VERTICAL_SAFETY_DISTANCE:
+                safety_analysis['safety_zones_violated'] += 1
                 
-                # Check for safety violations
-                if horizontal_distance <= HORIZONTAL_SAFETY_DISTANCE and vertical_distance <= VERTICAL_SAFETY_DISTANCE:
-                    safety_analysis['safety_zones_violated'] += 1
-                    
-                    # Classify risk level
-                    if horizontal_distance <= HIGH_RISK_DISTANCE:
-                        risk_level = 'HIGH'
-                        safety_analysis['high_risk_encounters'].append({
-                            'balloon_id': balloon_idx,
-                            'aircraft_callsign': aircraft['callsign'],
-                            'horizontal_distance': horizontal_distance,
-                            'vertical_distance': vertical_distance,
-                            'aircraft_altitude': aircraft_altitude,
-                            'balloon_altitude': balloon_altitude
-                        })
-                    elif horizontal_distance <= MEDIUM_RISK_DISTANCE:
-                        risk_level = 'MEDIUM'
-                        safety_analysis['medium_risk_encounters'].append({
-                            'balloon_id': balloon_idx,
-                            'aircraft_callsign': aircraft['callsign'],
-                            'horizontal_distance': horizontal_distance,
-                            'vertical_distance': vertical_distance,
-                            'aircraft_altitude': aircraft_altitude,
-                            'balloon_altitude': balloon_altitude
-                        })
-                    else:
-                        risk_level = 'LOW'
-                        safety_analysis['low_risk_encounters'].append({
-                            'balloon_id': balloon_idx,
-                            'aircraft_callsign': aircraft['callsign'],
-                            'horizontal_distance': horizontal_distance,
-                            'vertical_distance': vertical_distance,
-                            'aircraft_altitude': aircraft_altitude,
-                            'balloon_altitude': balloon_altitude
-                        })
-                    
-                    # Check for altitude conflicts (balloons in flight corridors)
-                    if 8000 <= aircraft_altitude <= 12000:  # Typical commercial flight corridor
-                        safety_analysis['altitude_conflicts'] += 1
+                # Classify risk level
+                if horizontal_distance <= HIGH_RISK_DISTANCE:
+                    safety_analysis['high_risk_encounters'].append(encounter)
+                elif horizontal_distance <= MEDIUM_RISK_DISTANCE:
+                    safety_analysis['medium_risk_encounters'].append(encounter)
+                else:
+                    safety_analysis['low_risk_encounters'].append(encounter)
                 
-                # Record near misses (very close encounters)
-                if horizontal_distance <= 1000 and vertical_distance <= 100:
-                    safety_analysis['near_misses'].append({
-                        'balloon_id': balloon_idx,
-                        'aircraft_callsign': aircraft['callsign'],
-                        'horizontal_distance': horizontal_distance,
-                        'vertical_distance': vertical_distance,
-                        'aircraft_altitude': aircraft_altitude,
-                        'balloon_altitude': balloon_altitude
-                    })
+                # Check for altitude conflicts (balloons in flight corridors)
+                if 8000 <= aircraft_altitude <= 12000:  # Typical commercial flight corridor
+                    safety_analysis['altitude_conflicts'] += 1
+            
+            # Record near misses (very close encounters)
+            if horizontal_distance <= 1000 and vertical_distance <= 100:
+                safety_analysis['near_misses'].append(dict(encounter))
+        timings['classify'] = time.perf_counter() - stage_start
+
+        if motion is not None:
+            stage_start = time.perf_counter()
+            safety_analysis.update(ConflictPrediction.predict(heads, motion[0], motion[1], aircraft_data, now,
+                                                                  balloon_ids=balloon_ids))
+            timings['prediction'] = time.perf_counter() - stage_start
+
+        safety_analysis['candidate_pairs'] = len(balloon_index)
+        safety_analysis['timings_ms'] = {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
         
         return safety_analysis
     
-    def _calculate_distance(self, lat1, lon1, lat2, lon2):
-        """Calculate distance between two points using Haversine formula"""
-        R = 6371000  # Earth's radius in meters
-        
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lon = math.radians(lon2 - lon1)
-        
-        a = (math.sin(delta_lat / 2) * math.sin(delta_lat / 2) +
-             math.cos(lat1_rad) * math.cos(lat2_rad) *
-             math.sin(delta_lon / 2) * math.sin(delta_lon / 2))
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        distance = R * c
-        
-        return distance
 
-def get_air_traffic_for_balloons(balloons_data, fetch_air_traffic=False):
+def balloon_heads(balloons_data):
+    """Snapshot of each balloon's current position; balloons without a path are invalid rows"""
+    nan = float('nan')
+    lat = np.array([b['path'][0][0] if b['path'] else nan for b in balloons_data], dtype=float)
+    lon = np.array([b['path'][0][1] if b['path'] else nan for b in balloons_data], dtype=float)
+    return Snapshot(lat, lon, np.zeros(len(balloons_data)))
+
+def plan_tiles(lat, lon, tile_deg=TILE_DEG, buffer_deg=BUFFER_DEG):
+    """Group balloon positions into grid tiles; returns {(x, y): [lat_min, lat_max, lon_min, lon_max]}.
+
+    Each tile's box only covers the balloons in it plus the buffer, so sparse tiles stay
+    small. A balloon whose buffer crosses a tile edge (or the antimeridian) contributes
+    to every tile it touches.
+    """
+    columns = int(round(360 / tile_deg))
+    tiles = {}
+    for head_lat, head_lon in zip(np.asarray(lat, dtype=float).tolist(), np.asarray(lon, dtype=float).tolist()):
+        if head_lat != head_lat or head_lon != head_lon:
+            continue
+        south, north = max(head_lat - buffer_deg, -90.0), min(head_lat + buffer_deg, 90.0)
+        for west, east in lon_ranges(head_lon - buffer_deg, head_lon + buffer_deg):
+            for x in range(int((west + 180) // tile_deg), min(columns - 1, int((east + 180) // tile_deg)) + 1):
+                for y in range(int((south + 90) // tile_deg), min(int(180 / tile_deg) - 1, int((north + 90) // tile_deg)) + 1):
+                    tile_west, tile_south = x * tile_deg - 180, y * tile_deg - 90
+                    box = [max(south, tile_south), min(north, tile_south + tile_deg),
+                           max(west, tile_west), min(east, tile_west + tile_deg)]
+                    current = tiles.get((x, y))
+                    if current is None:
+                        tiles[(x, y)] = box
+                    else:
+                        tiles[(x, y)] = [min(current[0], box[0]), max(current[1], box[1]),
+                                         min(current[2], box[2]), max(current[3], box[3])]
+    return tiles
+
+
+def enclosing_box(lat, lon, buffer_deg=BUFFER_DEG):
+    """One box around every balloon plus the buffer, as a single query covers them"""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    if not valid.any():
+        return None
+    return [max(float(lat[valid].min()) - buffer_deg, -90.0), min(float(lat[valid].max()) + buffer_deg, 90.0),
+            max(float(lon[valid].min()) - buffer_deg, -180.0), min(float(lon[valid].max()) + buffer_deg, 180.0)]
+
+
+def plan_cost(tiles):
+    """API credits needed to fetch every tile in a plan"""
+    return sum(OpenSkyClient.request_cost(*box) for box in tiles.values())
+
+
+def choose_tiles(lat, lon, tile_deg=TILE_DEG, max_tiles=MAX_TILES, credits=None):
+    """The cheapest way to fetch aircraft around the balloons; returns (tile_deg, tiles).
+
+    Tiles are only worth it while they cost fewer API credits than one enclosing box,
+    so this tries the finest tile size that needs at most max_tiles requests, at most
+    `credits` credits (the budget left, when given) and less than that box. Otherwise
+    the plan is the enclosing box alone, as tile (0, 0) of a 360 degree grid.
+    """
+    box = enclosing_box(lat, lon)
+    if box is None:
+        return tile_deg, {}
+    box_cost = OpenSkyClient.request_cost(*box)
+    for size in [tile_deg] + [size for size in TILE_SIZES if size > tile_deg]:
+        tiles = plan_tiles(lat, lon, size)
+        cost = plan_cost(tiles)
+        if len(tiles) <= max_tiles and cost < box_cost and (credits is None or cost <= credits):
+            return size, tiles
+    return 360, {(0, 0): box}
+
+
+def _covers(outer, inner):
+    return outer[0] <= inner[0] and outer[1] >= inner[1] and outer[2] <= inner[2] and outer[3] >= inner[3]
+
+
+def fetch_tiles(tiles, tile_deg=TILE_DEG, cache=None, collector=None, deadline=FETCH_DEADLINE):
+    """Aircraft for every tile, from the per-tile cache where it still covers the box, fetching the rest concurrently.
+
+    A tile that cannot be fetched serves its last good aircraft, even if its box has
+    since moved; while OpenSky's circuit is open nothing is requested at all, and while
+    it is half-open only one tile is.
+    """
+    collector = collector or AirTrafficDataCollector()
+    now = time.time()
+    results, missing, stale = {}, {}, {}
+    cache_key = lambda tile: f"aircraft_tile:{tile_deg:g}:{tile[0]}:{tile[1]}"
+    for tile, box in tiles.items():
+        item = cache.get(cache_key(tile)) if cache is not None else None
+        if item is not None:
+            if _covers(item[0]['box'], box) and now - item[1] < TILE_TTL:
+                Metrics.inc('windborne_cache_requests_total', cache='aircraft_tile', result='hit')
+                results[tile] = item[0]['aircraft']
+                continue
+            stale[tile] = item[0]['aircraft']
+        Metrics.inc('windborne_cache_requests_total', cache='aircraft_tile', result='stale' if tile in stale else 'miss')
+        missing[tile] = box
+
+    breaker = collector.client.breaker
+    if missing and breaker.is_open():
+        print(f"Air traffic: OpenSky circuit open, serving {len(stale)} of {len(missing)} tiles from cache")
+        results.update((tile, stale.get(tile, AircraftBatch.empty())) for tile in missing)
+    elif missing:
+        fetch = missing
+        if not breaker.is_closed():
+            # Only one tile tests whether OpenSky has recovered; the rest wait for the next refresh
+            trial = next(iter(missing))
+            fetch = {trial: missing[trial]}
+            results.update((tile, stale.get(tile, AircraftBatch.empty())) for tile in missing if tile != trial)
+        executor = ThreadPoolExecutor(max_workers=min(TILE_WORKERS, len(fetch)))
+        futures = {executor.submit(collector.fetch_area, *box): tile for tile, box in fetch.items()}
+        done, _ = wait(futures, timeout=deadline)
+        executor.shutdown(wait=False, cancel_futures=True)
+        failed = 0
+        for future, tile in futures.items():
+            try:
+                if future not in done:
+                    raise TimeoutError("deadline passed")
+                results[tile] = future.result()
+            except Exception:
+                failed += 1
+                # Serve what the tile had last time rather than dropping its aircraft
+                results[tile] = stale.get(tile, AircraftBatch.empty())
+                continue
+            if cache is not None:
+                cache.set(cache_key(tile), {'box': missing[tile], 'aircraft': results[tile]},
+                          ttl=STALE_TILE_TTL)
+        if failed:
+            print(f"Air traffic: {failed} of {len(fetch)} tiles failed")
+    return results
+
+
+def get_air_traffic_for_balloons(balloons_data, fetch_air_traffic=False, heads=None, cache=None):
     """Main function to get air traffic data for balloon areas"""
-    if not fetch_air_traffic:
-        return []
-    
-    collector = AirTrafficDataCollector()
-    
-    # Calculate bounding box for all balloons
-    if not balloons_data:
+    if not fetch_air_traffic or not balloons_data:
         return []
     
-    latitudes = []
-    longitudes = []
-    
-    for balloon in balloons_data:
-        if balloon['path'] and len(balloon['path']) > 0:
-            pos = balloon['path'][0]
-            latitudes.append(pos[0])
-            longitudes.append(pos[1])
-    
-    if not latitudes or not longitudes:
+    if heads is None:
+        heads = balloon_heads(balloons_data)
+    rows = heads.valid_indices()
+    credits = get_client().bucket.status()['tokens']
+    tile_deg, tiles = choose_tiles(heads.lat[rows], heads.lon[rows], credits=credits)
+    if not tiles:
         return []
     
-    # Add some buffer around the balloon area
-    lat_min = min(latitudes) - 1.0  # 1 degree buffer
-    lat_max = max(latitudes) + 1.0
-    lon_min = min(longitudes) - 1.0
-    lon_max = max(longitudes) + 1.0
-    
-    # Get aircraft in the area
-    aircraft_data = collector.get_aircraft_in_area(lat_min, lat_max, lon_min, lon_max)
-    
-    return aircraft_data
+    # Tiles overlap at their edges, so the same aircraft can come back more than once
+    return AircraftBatch.concatenate(fetch_tiles(tiles, tile_deg, cache).values()).latest()
 
-def analyze_air_traffic_safety(balloons_data, aircraft_data):
+def analyze_air_traffic_safety(balloons_data, aircraft_data, heads=None, motion=None, now=None, balloon_ids=None):
     """Analyze safety concerns between balloons and aircraft"""
     if not aircraft_data:
         return {}
     
     collector = AirTrafficDataCollector()
-    return collector.analyze_safety_concerns(balloons_data, aircraft_data)
+    return collector.analyze_safety_concerns(balloons_data, aircraft_data, heads, motion, now, balloon_ids)
 
+def analyze_heads_safety(heads, balloon_ids, aircraft_data, motion=None, now=None):
+    """analyze_air_traffic_safety from balloon columns, so a compute pool task ships arrays rather than records"""
+    if not aircraft_data:
+        return {}
+
+    collector = AirTrafficDataCollector()
+    return collector.analyze_heads(heads, balloon_ids, aircraft_data, motion, now)
@@ -0,0 +1,113 @@
+from operator import itemgetter
+import numpy as np
+
+# OpenSky state vector positions of the fields the map and the safety analysis use; the rest are dropped
+NUMBER_FIELDS = {'latitude': 6, 'longitude': 5, 'altitude': 7, 'geo_altitude': 13, 'velocity': 9,
+                 'true_track': 10, 'vertical_rate': 11, 'time_position': 3}
+FLAG_FIELDS = {'on_ground': 8}
+STRING_FIELDS = {'icao24': 0, 'callsign': 1, 'origin_country': 2}
+STATE_LENGTH = 17
+# Sent to the client; time_position is only used to pick the latest report of an aircraft
+RECORD_FIELDS = ('icao24', 'callsign', 'origin_country', 'latitude', 'longitude', 'altitude',
+                 'geo_altitude', 'velocity', 'true_track', 'vertical_rate', 'on_ground')
+
+_numbers = itemgetter(*NUMBER_FIELDS.values())
+_flags = itemgetter(*FLAG_FIELDS.values())
+
+
+class AircraftBatch:
+    """Aircraft from OpenSky stored as columns: float64 numbers (NaN for null), bool flags and string arrays.
+
+    Iterating gives record dicts with RECORD_FIELDS, built on demand so the batch itself
+    is all that is held in caches and payloads.
+    """
+
+    __slots__ = ('columns',)
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def empty(cls):
+        return cls.from_states([])
+
+    @classmethod
+    def from_states(cls, states, altitude_min=None, altitude_max=None):
+        """Parse /states/all vectors, keeping aircraft with a position and an altitude within the range"""
+        states = [state for state in states if len(state) >= STATE_LENGTH]
+        numbers = np.array([_numbers(state) for state in states], dtype=float).reshape(-1, len(NUMBER_FIELDS))
+        columns = {field: np.ascontiguousarray(numbers[:, i]) for i, field in enumerate(NUMBER_FIELDS)}
+        columns['on_ground'] = np.array([bool(_flags(state)) for state in states], dtype=bool)
+        for field, index in STRING_FIELDS.items():
+            columns[field] = np.array([state[index] for state in states], dtype=object)
+        batch = cls(columns)
+
+        altitude = batch.altitudes()
+        valid = np.isfinite(columns['latitude']) & np.isfinite(columns['longitude']) & np.isfinite(altitude)
+        if altitude_min is not None:
+            valid &= altitude >= altitude_min
+        if altitude_max is not None:
+            valid &= altitude <= altitude_max
+        return batch if valid.all() else batch.take(np.flatnonzero(valid))
+
+    @classmethod
+    def from_records(cls, records):
+        """Batch from aircraft dicts, such as tiles cached before batches existed"""
+        columns = {field: np.array([np.nan if r.get(field) is None else r[field] for r in records], dtype=float)
+                   for field in NUMBER_FIELDS}
+        columns.update((field, np.array([bool(r.get(field)) for r in records], dtype=bool)) for field in FLAG_FIELDS)
+        columns.update((field, np.array([r.get(field) for r in records], dtype=object)) for field in STRING_FIELDS)
+        return cls(columns)
+
+    @classmethod
+    def coerce(cls, aircraft):
+        """Return aircraft as a batch, converting a list of dicts"""
+        return aircraft if isinstance(aircraft, cls) else cls.from_records(aircraft)
+
+    @classmethod
+    def concatenate(cls, batches):
+        batches = [cls.coerce(batch) for batch in batches]
+        if not batches:
+            return cls.empty()
+        return cls({field: np.concatenate([batch.columns[field] for batch in batches]) for field in batches[0].columns})
+
+    def __len__(self):
+        return len(self.columns['latitude'])
+
+    def __iter__(self):
+        return iter(self.to_records())
+
+    def take(self, rows):
+        """Return the given rows as a new batch"""
+        return AircraftBatch({field: column[rows] for field, column in self.columns.items()})
+
+    def altitudes(self):
+        """altitude, falling back to geo_altitude when it is null or zero, as `altitude or geo_altitude`"""
+        altitude = self.columns['altitude']
+        return np.where(np.isnan(altitude) | (altitude == 0), self.columns['geo_altitude'], altitude)
+
+    def keys(self):
+        """icao24, or the callsign when it is missing, per aircraft"""
+        return [icao24 or callsign for icao24, callsign in zip(self.columns['icao24'].tolist(),
+                                                                self.columns['callsign'].tolist())]
+
+    def latest(self):
+        """One row per aircraft key, the one with the latest position report, in order of first appearance"""
+        times = np.nan_to_num(self.columns['time_position'], nan=0.0).tolist()
+        best = {}
+        for row, key in enumerate(self.keys()):
+            current = best.get(key)
+            if current is None or times[row] > times[current]:
+                best[key] = row
+        return self if len(best) == len(self) else self.take(np.array(list(best.values()), dtype=np.int64))
+
+    def to_records(self):
+        """Aircraft as dicts with RECORD_FIELDS, null where OpenSky had no value"""
+        values = []
+        for field in RECORD_FIELDS:
+            column = self.columns[field]
+            if column.dtype == float:
+                values.append([None if value != value else value for value in column.tolist()])
+            else:
+                values.append(column.tolist())
+        return [dict(zip(RECORD_FIELDS, row)) for row in zip(*values)]
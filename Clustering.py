@@ -0,0 +1,122 @@
+import math
+import numpy as np
+from AircraftBatch import AircraftBatch
+from Responses import EncodedPayload
+from TrackTiles import lon_ranges, MAX_MERCATOR_LAT
+
+MIN_ZOOM = 0
+MAX_ZOOM = 10  # Above this every point is served on its own
+RADIUS_PX = 40  # Cluster radius in screen pixels
+TILE_PX = 256
+
+
+def _project(lat, lon):
+    """Web Mercator x, y in [0, 1], so a pixel is 1 / (256 * 2**zoom) on both axes"""
+    x = (np.asarray(lon, dtype=float) + 180) / 360
+    lat = np.radians(np.clip(np.asarray(lat, dtype=float), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    y = 0.5 - np.log(np.tan(np.pi / 4 + lat / 2)) / (2 * np.pi)
+    return x, y
+
+
+def _unproject(x, y):
+    lon = x * 360 - 180
+    lat = np.degrees(2 * np.arctan(np.exp((0.5 - y) * 2 * np.pi)) - np.pi / 2)
+    return lat, lon
+
+
+def _cluster_level(x, y, count, origin, radius):
+    """One greedy pass in the style of supercluster: each unclaimed point absorbs its unclaimed neighbours.
+
+    Points are visited in order and a point's neighbours come from the 3x3 block of grid cells
+    of side `radius` around it. Returns the next level's x, y, count and origin (the member
+    index for single-point clusters, -1 otherwise), plus the cluster each point went into.
+    """
+    cells = {}
+    for i, cell in enumerate(zip(np.floor(x / radius).astype(np.int64).tolist(),
+                                 np.floor(y / radius).astype(np.int64).tolist())):
+        cells.setdefault(cell, []).append(i)
+
+    xs, ys, counts = x.tolist(), y.tolist(), count.tolist()
+    parent = [-1] * len(xs)
+    out_x, out_y, out_count, out_origin = [], [], [], []
+    radius_sq = radius * radius
+    for i in range(len(xs)):
+        if parent[i] >= 0:
+            continue
+        cluster = len(out_x)
+        parent[i] = cluster
+        cx, cy = int(xs[i] // radius), int(ys[i] // radius)
+        wx, wy, total = xs[i] * counts[i], ys[i] * counts[i], counts[i]
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in cells.get((cx + dx, cy + dy), ()):
+                    if parent[j] < 0 and (xs[j] - xs[i]) ** 2 + (ys[j] - ys[i]) ** 2 <= radius_sq:
+                        parent[j] = cluster
+                        wx += xs[j] * counts[j]
+                        wy += ys[j] * counts[j]
+                        total += counts[j]
+        out_x.append(wx / total)
+        out_y.append(wy / total)
+        out_count.append(total)
+        out_origin.append(int(origin[i]) if total == counts[i] else -1)
+    return (np.array(out_x), np.array(out_y), np.array(out_count, dtype=np.int64),
+            np.array(out_origin, dtype=np.int64), np.array(parent, dtype=np.int64))
+
+
+class ClusterIndex:
+    """Hierarchical greedy clustering of one layer's points, built once per refresh.
+
+    Level MAX_ZOOM + 1 holds the points themselves; each level below merges the one above
+    with a radius of RADIUS_PX at that zoom, so a query only filters one precomputed level
+    by the viewport. `keys` identify the points to the client (balloon ids or icao24).
+    """
+
+    def __init__(self, lat, lon, keys, version=None):
+        self.version = version
+        self.keys = list(keys)
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        x, y = _project(lat[valid], lon[valid])
+        origin = np.flatnonzero(valid)
+        count = np.ones(len(x), dtype=np.int64)
+
+        self.levels = {MAX_ZOOM + 1: (x, y, count, origin)}
+        for zoom in range(MAX_ZOOM, MIN_ZOOM - 1, -1):
+            x, y, count, origin, _ = _cluster_level(x, y, count, origin, RADIUS_PX / (TILE_PX * 2 ** zoom))
+            self.levels[zoom] = (x, y, count, origin)
+
+    def query(self, west, south, east, north, zoom):
+        """EncodedPayload with the clusters (and single points) in a viewport at a zoom level"""
+        level = min(max(int(math.floor(zoom)), MIN_ZOOM), MAX_ZOOM + 1)
+        x, y, count, origin = self.levels[level]
+        lat, lon = _unproject(x, y)
+        inside = np.zeros(len(x), dtype=bool)
+        for low, high in lon_ranges(west, east):
+            inside |= (lon >= low) & (lon <= high)
+        inside &= (lat >= south) & (lat <= north)
+
+        clusters, points = [], []
+        for i in np.flatnonzero(inside).tolist():
+            if origin[i] >= 0:
+                points.append(self.keys[origin[i]])
+            else:
+                clusters.append([round(float(lat[i]), 5), round(float(lon[i]), 5), int(count[i])])
+        return EncodedPayload({
+            'version': self.version,
+            'zoom': level,
+            'clusters': clusters,  # [lat, lon, count]
+            'points': points
+        })
+
+
+def balloon_clusters(balloons_data, version=None):
+    """ClusterIndex over each balloon's latest position"""
+    heads = [b['path'][0] if b['path'] else [math.nan, math.nan] for b in balloons_data]
+    return ClusterIndex([h[0] for h in heads], [h[1] for h in heads], [b['id'] for b in balloons_data], version)
+
+
+def aircraft_clusters(aircraft_data, version=None):
+    """ClusterIndex over aircraft positions, keyed by icao24"""
+    aircraft_data = AircraftBatch.coerce(aircraft_data)
+    return ClusterIndex(aircraft_data.columns['latitude'], aircraft_data.columns['longitude'], aircraft_data.keys(), version)
@@ -0,0 +1,76 @@
+"""Process pool for the CPU-bound refresh stages, so they do not hold the request threads' GIL.
+
+Tracking, constellation links and the balloon/aircraft safety analysis run here while the
+worker's threads keep answering /health and cached /api/data. Inputs travel as NumPy
+columns (Snapshot, AircraftBatch, TrackState's packed tracks), not nested lists. With
+WINDBORNE_COMPUTE_WORKERS=0, or if the pool breaks, tasks run inline in the caller.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Processes per app worker; by default one core is left for serving requests
+WORKERS = int(os.environ.get('WINDBORNE_COMPUTE_WORKERS', max(0, min(2, (os.cpu_count() or 1) - 1))))
+# Imported once by the fork server, so each pool process starts with them loaded
+PRELOAD = ['numpy', 'Tracking', 'Constellation', 'AirTrafficData']
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the shared process pool, or None when tasks should run inline"""
+    global _pool
+    if WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Never fork: the app's threads may be holding locks the children would inherit
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(PRELOAD)
+            else:
+                context = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=context)
+    return _pool
+
+
+def reset_pool():
+    """Drop a broken pool; the next task starts a new one"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class Task:
+    """fn(*args) running in the pool, or deferred until result() when there is no pool.
+
+    Exceptions raised by fn come out of result() either way. If a pool process dies the
+    pool is replaced and the task is computed inline, so a refresh never fails for it.
+    """
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+        self.future = None
+        pool = get_pool()
+        if pool is not None:
+            try:
+                self.future = pool.submit(fn, *args)
+            except (BrokenProcessPool, RuntimeError) as e:
+                print(f"Compute pool unavailable ({e}), running {fn.__name__} inline")
+                reset_pool()
+
+    def result(self):
+        if self.future is None:
+            return self.fn(*self.args)
+        try:
+            return self.future.result()
+        except BrokenProcessPool as e:
+            print(f"Compute pool failed ({e}), running {self.fn.__name__} inline")
+            reset_pool()
+            return self.fn(*self.args)
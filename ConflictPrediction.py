@@ -0,0 +1,193 @@
+"""Predicted balloon/aircraft conflicts over a look-ahead horizon.
+
+Balloons move along their latest tracked velocity at their reported altitude; aircraft
+along velocity, true_track and vertical_rate from their last position report. Both are
+first advanced to a common time, then:
+
+1. the horizon is cut into slices, and over each slice every object sweeps a short
+   segment, bounded by a sphere around its midpoint and by its altitude range. A
+   SphereGrid over the aircraft midpoints keeps only the pairs whose swept volumes come
+   within the separation minima in some slice.
+2. for the surviving pairs, relative motion in a local east/north plane gives, in
+   vectorised batches, the interval in which both minima are violated and the
+   horizontal closest approach.
+
+A conflict is a pair whose interval starts within the horizon; time_to_conflict is 0 for
+pairs that are already inside the minima.
+"""
+import math
+import os
+import time
+import numpy as np
+from AircraftBatch import AircraftBatch
+from Geodesy import KM_PER_DEGREE
+from SpatialIndex import SphereGrid
+
+HORIZON_MINUTES = float(os.environ.get('WINDBORNE_CONFLICT_HORIZON_MINUTES', 15))
+HORIZONTAL_SEPARATION_KM = 5  # The minima analyze_safety_concerns uses for a violation
+VERTICAL_SEPARATION_M = 300
+SLICE_SECONDS = 300  # Time step of the space-time index
+MAX_AIRCRAFT_SPEED = 350  # m/s; faster reports are treated as bad data and clipped
+MAX_EXTRAPOLATION_SECONDS = 3600  # Older positions are not advanced any further than this
+BATCH_PAIRS = 100000  # Candidate pairs solved per vectorised batch
+MAX_CONFLICTS = 100  # Conflicts listed in the payload, soonest first
+
+
+def balloon_motion(balloons_data):
+    """(speed km/h, direction degrees) arrays from each balloon's latest tracked velocity"""
+    motion = np.array([b['velocities'][0] if b['velocities'] else (0, 0) for b in balloons_data],
+                      dtype=float).reshape(-1, 2)
+    return motion[:, 0], motion[:, 1]
+
+
+def _advance(lat, lon, east, north, seconds):
+    """Positions after moving for seconds at east/north km/s, in a local flat-earth step"""
+    cos_lat = np.maximum(np.cos(np.radians(lat)), 0.01)
+    new_lat = np.clip(lat + north * seconds / KM_PER_DEGREE, -90, 90)
+    new_lon = (lon + east * seconds / (KM_PER_DEGREE * cos_lat) + 180) % 360 - 180
+    return new_lat, new_lon
+
+
+def _interval(offset, rate, limit):
+    """Times t at which |offset + rate * t| <= limit, as (start, end); empty when start > end"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        first = (-limit - offset) / rate
+        second = (limit - offset) / rate
+    inside = np.abs(offset) <= limit
+    moving = rate != 0
+    start = np.where(moving, np.minimum(first, second), np.where(inside, -np.inf, np.inf))
+    end = np.where(moving, np.maximum(first, second), np.where(inside, np.inf, -np.inf))
+    return start, end
+
+
+def predict(heads, speed_kmh, direction_deg, aircraft, now=None, horizon_minutes=HORIZON_MINUTES, balloon_ids=None):
+    """Conflicts within the horizon between balloon heads (altitudes in km) and aircraft.
+
+    speed_kmh, direction_deg and balloon_ids (the track ids, default the row numbers) hold
+    one entry per head row. Returns {'predicted_conflicts': [...], 'prediction': summary};
+    times are seconds from now, distances and altitudes metres, and balloon_id is the id
+    of the balloon in /api/data.
+    """
+    now = time.time() if now is None else now
+    horizon = horizon_minutes * 60
+    aircraft = AircraftBatch.coerce(aircraft)
+    timings = {}
+    stage_start = time.perf_counter()
+
+    # Balloons, advanced from the hour of their snapshot to now
+    rows = heads.valid_indices()
+    balloon_ids = np.arange(len(heads)) if balloon_ids is None else np.asarray(balloon_ids)
+    b_lat = heads.lat[rows].astype(float)
+    b_lon = heads.lon[rows].astype(float)
+    b_alt = heads.alt[rows].astype(float) * 1000
+    b_speed = np.nan_to_num(np.asarray(speed_kmh, dtype=float)[rows]) / 3600
+    heading = np.radians(np.nan_to_num(np.asarray(direction_deg, dtype=float)[rows]))
+    b_east, b_north = b_speed * np.sin(heading), b_speed * np.cos(heading)
+    if heads.key is not None:
+        b_lat, b_lon = _advance(b_lat, b_lon, b_east, b_north,
+                                min(max(now - heads.key * 3600, 0), MAX_EXTRAPOLATION_SECONDS))
+
+    # Aircraft with a position and altitude, advanced from their last report to now
+    altitudes = aircraft.altitudes()
+    columns = aircraft.columns
+    known = np.flatnonzero(np.isfinite(altitudes) & np.isfinite(columns['latitude'])
+                           & np.isfinite(columns['longitude']))
+    a_speed = np.clip(np.nan_to_num(columns['velocity'][known]), 0, MAX_AIRCRAFT_SPEED) / 1000
+    track = np.radians(np.nan_to_num(columns['true_track'][known]))
+    a_east, a_north = a_speed * np.sin(track), a_speed * np.cos(track)
+    a_climb = np.nan_to_num(columns['vertical_rate'][known])
+    age = np.clip(now - np.nan_to_num(columns['time_position'][known], nan=now), 0, MAX_EXTRAPOLATION_SECONDS)
+    a_lat, a_lon = _advance(columns['latitude'][known], columns['longitude'][known], a_east, a_north, age)
+    a_alt = np.maximum(altitudes[known] + a_climb * age, 0)
+    timings['extrapolate'] = time.perf_counter() - stage_start
+
+    # Space-time index: per slice, pairs whose swept spheres and altitude ranges come within the minima
+    stage_start = time.perf_counter()
+    slices = max(1, math.ceil(horizon / SLICE_SECONDS))
+    step = horizon / slices
+    fastest = (float(a_speed.max(initial=0)) + float(b_speed.max(initial=0))) * step / 2
+    found = []
+    if len(rows) and len(known):
+        for index in range(slices):
+            middle = (index + 0.5) * step
+            grid = SphereGrid(*_advance(a_lat, a_lon, a_east, a_north, middle), HORIZONTAL_SEPARATION_KM + fastest)
+            query, point, distances = grid.within(*_advance(b_lat, b_lon, b_east, b_north, middle))
+            reach = HORIZONTAL_SEPARATION_KM + (b_speed[query] + a_speed[point]) * step / 2
+            alt_start = a_alt[point] + a_climb[point] * index * step
+            alt_end = alt_start + a_climb[point] * step
+            overlap = ((np.minimum(alt_start, alt_end) - VERTICAL_SEPARATION_M <= b_alt[query])
+                       & (np.maximum(alt_start, alt_end) + VERTICAL_SEPARATION_M >= b_alt[query]))
+            keep = (distances <= reach) & overlap
+            found.append(query[keep] * len(known) + point[keep])
+    candidates = np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+    timings['index'] = time.perf_counter() - stage_start
+
+    # Closest approach and conflict interval for the candidates, in batches
+    stage_start = time.perf_counter()
+    parts = []
+    for first in range(0, len(candidates), BATCH_PAIRS):
+        batch = candidates[first:first + BATCH_PAIRS]
+        b, a = batch // len(known), batch % len(known)
+        # The aircraft relative to the balloon, in km east/north of it and metres above it
+        mid_lat = np.radians((b_lat[b] + a_lat[a]) / 2)
+        dx = ((a_lon[a] - b_lon[b] + 180) % 360 - 180) * KM_PER_DEGREE * np.cos(mid_lat)
+        dy = (a_lat[a] - b_lat[b]) * KM_PER_DEGREE
+        vx, vy = a_east[a] - b_east[b], a_north[a] - b_north[b]
+        dz, vz = a_alt[a] - b_alt[b], a_climb[a]
+
+        # Horizontal: |(dx, dy) + (vx, vy) t| <= separation is a quadratic in t
+        speed2 = vx * vx + vy * vy
+        moving = speed2 > 1e-12
+        half_b = dx * vx + dy * vy
+        c = dx * dx + dy * dy - HORIZONTAL_SEPARATION_KM ** 2
+        disc = half_b * half_b - speed2 * c
+        root = np.sqrt(np.maximum(disc, 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            h_start = np.where(moving, (-half_b - root) / speed2, np.where(c <= 0, -np.inf, np.inf))
+            h_end = np.where(moving, (-half_b + root) / speed2, np.where(c <= 0, np.inf, -np.inf))
+            cpa = np.clip(np.where(moving, -half_b / speed2, 0), 0, horizon)
+        h_start = np.where(moving & (disc < 0), np.inf, h_start)
+        v_start, v_end = _interval(dz, vz, VERTICAL_SEPARATION_M)
+
+        start = np.maximum(np.maximum(h_start, v_start), 0)
+        end = np.minimum(np.minimum(h_end, v_end), horizon)
+        hit = np.flatnonzero(start <= end)
+        parts.append((b[hit], a[hit], start[hit], end[hit], cpa[hit],
+                      np.hypot(dx[hit] + vx[hit] * cpa[hit], dy[hit] + vy[hit] * cpa[hit]) * 1000,
+                      np.abs(dz[hit] + vz[hit] * cpa[hit])))
+    timings['closest_approach'] = time.perf_counter() - stage_start
+
+    conflicts = []
+    if parts:
+        b, a, start, end, cpa, horizontal, vertical = (np.concatenate(column) for column in zip(*parts))
+        order = np.lexsort((a, b, start))
+        callsigns, icao24 = columns['callsign'], columns['icao24']
+        for i in order[:MAX_CONFLICTS].tolist():
+            aircraft_row = int(known[a[i]])
+            conflicts.append({
+                'balloon_id': int(balloon_ids[rows[b[i]]]),
+                'aircraft_callsign': callsigns[aircraft_row],
+                'aircraft_icao24': icao24[aircraft_row],
+                'time_to_conflict': round(float(start[i]), 1),
+                'conflict_ends': round(float(end[i]), 1),
+                'closest_approach_time': round(float(cpa[i]), 1),
+                'closest_horizontal_distance': round(float(horizontal[i]), 1),
+                'closest_vertical_distance': round(float(vertical[i]), 1),
+                'balloon_altitude': round(float(b_alt[b[i]]), 1),
+                'aircraft_altitude': round(float(a_alt[a[i]]), 1)
+            })
+        total = len(start)
+    else:
+        total = 0
+
+    return {
+        'predicted_conflicts': conflicts,
+        'prediction': {
+            'horizon_minutes': horizon_minutes,
+            'balloons': len(rows),
+            'aircraft': len(known),
+            'candidate_pairs': len(candidates),
+            'conflicts': total,
+            'timings_ms': {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+        }
+    }
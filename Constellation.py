@@ -0,0 +1,65 @@
+from functools import cached_property
+import numpy as np
+from SpatialIndex import SphereGrid
+
+LINK_KM = 500  # Balloons closer than this are considered linked
+
+
+class ConstellationGraph:
+    """Links between balloons whose current positions are within link_km of each other.
+
+    Built once per refresh from a Snapshot of balloon heads (row i is balloon i in
+    /api/data). Candidate pairs come from a SphereGrid with cells sized to the link
+    radius, so only neighbouring cells are compared; degree and connected components
+    are derived lazily from the same edge list.
+    """
+
+    def __init__(self, heads, link_km=LINK_KM):
+        self.size = len(heads)
+        self.link_km = link_km
+        rows = heads.valid_indices()
+        lat = heads.lat[rows].astype(float)
+        lon = heads.lon[rows].astype(float)
+
+        grid = SphereGrid(lat, lon, link_km)
+        query, point, distances = grid.within(lat, lon)
+        # Each pair is found from both ends (and every point finds itself); keep i < j once
+        keep = query < point
+        first, second = rows[query[keep]], rows[point[keep]]
+        order = np.lexsort((second, first))
+        self.pairs = np.column_stack((first[order], second[order])).astype(np.int64)
+        self.distances = distances[keep][order]
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def links(self):
+        """Linked index pairs [i, j] with i < j, in the order /api/data has always used"""
+        return self.pairs.tolist()
+
+    @cached_property
+    def degree(self):
+        """Number of links per balloon"""
+        return np.bincount(self.pairs.ravel(), minlength=self.size)
+
+    @cached_property
+    def components(self):
+        """Connected-component label per balloon; unlinked balloons are their own component"""
+        labels = np.arange(self.size)
+        if len(self.pairs) == 0:
+            return labels
+        first, second = self.pairs[:, 0], self.pairs[:, 1]
+        while True:
+            updated = labels.copy()
+            np.minimum.at(updated, first, labels[second])
+            np.minimum.at(updated, second, labels[first])
+            # Pointer jumping keeps long chains from needing one pass per hop
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                return labels
+            labels = updated
+
+    def cluster_sizes(self):
+        """Sizes of the linked clusters (components with more than one balloon), largest first"""
+        sizes = np.bincount(self.components, minlength=self.size)
+        return np.sort(sizes[sizes > 1])[::-1]
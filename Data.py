@@ -1,88 +1,316 @@
 import requests as req
 import json
-from datetime import datetime
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+import DataSource
+import Metrics
+import SharedCache
+import SnapshotArchive
+import SnapshotStore
+from Snapshot import Snapshot
 
-def parse_data(data_string):
-    # Clean the data
-    data_string = data_string.strip()
-    
-    # Replace NaN with null
-    data_string = data_string.replace('NaN', 'null')
-    
-    # Try parsing as-is first (for format 1 with brackets)
-    try:
-        return json.loads(data_string)
-    except json.JSONDecodeError:
-        pass
-    
-    # Try adding opening bracket (for format 2 missing opening bracket)
-    try:
-        return json.loads('[' + data_string)
-    except json.JSONDecodeError:
-        pass
-    
-    # Try adding both brackets (for format 3 missing both)
-    try:
-        return json.loads('[' + data_string + ']')
-    except json.JSONDecodeError:
-        # If all fail, try to extract valid JSON arrays from the corrupted data
+# Windborne publishes one file per hour: 00.json is the latest snapshot, 23.json is 23 hours ago
+TREASURE_URL = os.environ.get('WINDBORNE_TREASURE_URL', "https://a.windbornesystems.com/treasure/{hour:02}.json")
+MAX_HOURS = 24
+DEFAULT_HOURS = int(os.environ.get('WINDBORNE_HOURS', 6))
+HOUR_TIMEOUT = 10  # Seconds allowed for each hourly request
+FETCH_DEADLINE = 15  # Seconds allowed for the whole batch of hourly requests
+
+_session = None
+_store = None
+_archive = None
+_session_lock = threading.Lock()
+
+# Innermost [..] groups; outer brackets may be missing or unbalanced, records never nest
+RECORD_PATTERN = re.compile(r'\[([^\[\]]*)\]')
+# The outer list's own opening bracket, which valid JSON may space from the first record
+OPENING_BRACKETS = re.compile(r'\[\s*\[')
+EMPTY_LIST = re.compile(r'\[\s*\]')
+# Brackets only delimit records, so the number parser sees them as blanks
+BLANK_BRACKETS = str.maketrans('[]', '  ')
+
+def _valid_record(lat, lon, alt):
+    # NaN fails every comparison, so this also rejects NaN rows
+    return -90 <= lat <= 90 and -180 <= lon <= 180 and alt == alt
+
+def _scan_records(data_string):
+    """Pull every [lat, lon, alt] group out of a corrupted payload in a single regex scan"""
+    records = []
+    dropped = 0
+    last_end = 0
+    for match in RECORD_PATTERN.finditer(data_string):
+        last_end = match.end()
+        fields = match.group(1).split(',')
+        if len(fields) != 3:
+            dropped += 1
+            continue
         try:
-            # Look for array patterns in the corrupted data
-            import re
-            array_pattern = r'\[[^\]]*\]'
-            matches = re.findall(array_pattern, data_string)
-            if matches:
-                # Try to parse the first valid-looking array
-                for match in matches:
-                    try:
-                        return json.loads(match)
-                    except json.JSONDecodeError:
-                        continue
-        except:
-            pass
-        
-        # If all parsing attempts fail, return None
+            lat, lon, alt = float(fields[0]), float(fields[1]), float(fields[2])
+        except ValueError:
+            dropped += 1
+            continue
+        if not _valid_record(lat, lon, alt):
+            dropped += 1
+            continue
+        records.append([lat, lon, alt])
+
+    dropped += _truncated(data_string[last_end:])
+    return np.array(records, dtype=float).reshape(-1, 3), dropped
+
+def _truncated(tail):
+    """1 if the text after the last complete record holds a record cut off by truncation"""
+    return int('[' in tail and bool(tail[tail.rindex('[') + 1:].strip(' \t\r\n,')))
+
+def _split_records(body):
+    """Values of a payload whose records are all [a, b, c], as an (N, 3) array; None if any record is not.
+
+    The layout is checked on the raw bytes first (every record closed before the next
+    opens, two commas inside each), so a ragged record cannot shift the values after it.
+    """
+    raw = np.frombuffer(body.encode(), dtype=np.uint8)
+    opens = np.flatnonzero(raw == ord('['))
+    closes = np.flatnonzero(raw == ord(']'))
+    if OPENING_BRACKETS.match(body):
+        opens = opens[1:]
+    if len(closes) == len(opens) + 1:
+        closes = closes[:-1]  # The outer list's closing bracket
+    if len(opens) != len(closes):
+        return None
+    if len(opens) == 0:
+        return np.empty((0, 3))
+    if np.any(opens > closes) or np.any(closes[:-1] > opens[1:]):
+        return None
+    commas = np.flatnonzero(raw == ord(','))
+    if np.any(np.searchsorted(commas, closes) - np.searchsorted(commas, opens) != 2):
+        return None
+    try:
+        # Whitespace and NaN are accepted; any other token raises
+        values = np.array(body.translate(BLANK_BRACKETS).split(','), dtype=float)
+    except ValueError:
+        return None
+    if len(values) != 3 * len(opens):
+        return None
+    return values.reshape(-1, 3)
+
+def parse_records(data_string):
+    """Extract every valid [lat, lon, alt] record; returns ((N, 3) array, dropped).
+
+    A single pass over the payload: missing outer brackets and a record cut off at the
+    end need no retries, and numbers (NaN included) are converted by NumPy in one call. Only a payload with
+    a malformed record in the middle falls back to the per-record regex scan.
+    """
+    data_string = data_string.strip()
+    if EMPTY_LIST.fullmatch(data_string):
+        return np.empty((0, 3)), 0
+    end = data_string.rfind(']') + 1
+    rows = _split_records(data_string[:end])
+    if rows is None:
+        return _scan_records(data_string)
+    lat, lon, alt = rows[:, 0], rows[:, 1], rows[:, 2]
+    valid = (lat >= -90) & (lat <= 90) & (lon >= -180) & (lon <= 180) & (alt == alt)
+    return rows[valid], int(len(rows) - valid.sum()) + _truncated(data_string[end:])
+
+def _is_empty_list(data_string):
+    """Whether a payload is an empty snapshot rather than an unreadable one"""
+    data_string = data_string.strip()
+    return not data_string or EMPTY_LIST.fullmatch(data_string) is not None
+
+def parse_data(data_string):
+    """Parse a snapshot payload, tolerating missing brackets, NaN values and truncation"""
+    records, dropped = parse_records(data_string)
+    # Nothing recognisable at all, treat the file as unavailable
+    if not len(records) and not dropped and not _is_empty_list(data_string):
         return None
+    return records.tolist()
+
+def get_session():
+    """Return the shared keep-alive session used for all Windborne requests"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # One pooled connection per hour so concurrent fetches never wait on each other
+            _session = DataSource.mount(req.Session(), MAX_HOURS)
+    return _session
+
+def get_store():
+    """Return the shared per-hour snapshot store"""
+    global _store
+    with _session_lock:
+        if _store is None:
+            _store = SnapshotStore.SnapshotStore(cache=SharedCache.get_backend())
+    return _store
+
+def get_archive():
+    """Return the shared long-term snapshot archive"""
+    global _archive
+    with _session_lock:
+        if _archive is None:
+            _archive = SnapshotArchive.SnapshotArchive(cache=SharedCache.get_backend())
+    return _archive
 
-def fetch_data(url):
+def fetch_response(url, timeout=HOUR_TIMEOUT, etag=None, last_modified=None):
+    """GET a snapshot file, revalidating with any validators we already hold"""
+    # Problems are returned in 'dropped' and 'error' rather than printed, since many fetches run at once
+    result = {'status': None, 'data': None, 'etag': None, 'last_modified': None, 'dropped': 0, 'error': None}
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    started = time.perf_counter()
     try:
         # Add timeout to prevent hanging requests
-        response = req.get(url, timeout=10)
-        
+        response = get_session().get(url, timeout=timeout, headers=headers)
+        result['status'] = response.status_code
+        Metrics.observe('windborne_upstream_request_seconds', time.perf_counter() - started,
+                        source='windborne', status=response.status_code)
+        Metrics.observe('windborne_upstream_response_bytes', len(response.content), source='windborne')
+
+        # Unchanged since the validators were issued, the caller already has the data
+        if response.status_code == 304:
+            result['etag'] = etag
+            result['last_modified'] = last_modified
+            return result
+
         # Don't raise exception for 404s, just return None
         if response.status_code == 404:
-            return None
+            return result
             
         response.raise_for_status() # Raise an exception for other bad status codes
         
         # Check if response looks like HTML (error page)
         if response.text.strip().startswith('<html'):
-            return None
-            
-        return parse_data(response.text)
+            return result
+
+        records, dropped = parse_records(response.text)
+        Metrics.inc('windborne_records_parsed_total', len(records))
+        if dropped:
+            Metrics.inc('windborne_records_dropped_total', dropped)
+        if len(records) or dropped or _is_empty_list(response.text):
+            result['data'] = Snapshot.from_records(records)
+        result['dropped'] = dropped
+        result['etag'] = response.headers.get('ETag')
+        result['last_modified'] = response.headers.get('Last-Modified')
+        return result
     except req.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
-        return None
+        Metrics.observe('windborne_upstream_request_seconds', time.perf_counter() - started,
+                        source='windborne', status='error')
+        result['error'] = str(e)
+        return result
+
+def fetch_data(url, timeout=HOUR_TIMEOUT):
+    result = fetch_response(url, timeout)
+    if result['error']:
+        print(f"Request failed: {result['error']}")
+    return result['data']
+
+def _fetch_concurrently(hours, deadline, timeout, validators):
+    """Fetch hourly files in parallel, returning the responses that arrived before the deadline"""
+    if not hours:
+        return {}
+
+    executor = ThreadPoolExecutor(max_workers=len(hours), thread_name_prefix='windborne-fetch')
+    futures = {}
+    for hour in hours:
+        known = validators.get(hour, {})
+        future = executor.submit(fetch_response, TREASURE_URL.format(hour=hour), timeout,
+                                 known.get('etag'), known.get('last_modified'))
+        futures[future] = hour
+    done, not_done = wait(futures, timeout=max(0, deadline))
+
+    # Partial results: hours still in flight at the deadline are dropped, not waited for
+    executor.shutdown(wait=False, cancel_futures=True)
+    if not_done:
+        print(f"Fetch deadline reached, skipping hours: {sorted(futures[f] for f in not_done)}")
+
+    responses = {}
+    failed = {}
+    for future in done:
+        try:
+            responses[futures[future]] = future.result()
+        except Exception as e:
+            failed[futures[future]] = str(e)
+    # Reported once per batch from this thread, so lines from concurrent fetches never interleave
+    failed.update((hour, response['error']) for hour, response in responses.items() if response['error'])
+    dropped = {hour: response['dropped'] for hour, response in responses.items() if response['dropped']}
+    if dropped:
+        print(f"Dropped malformed records by hour: {dict(sorted(dropped.items()))}")
+    for hour, error in sorted(failed.items()):
+        print(f"Fetch for hour {hour} failed: {error}")
+    return responses
+
+def fetch_hours(hours, deadline=FETCH_DEADLINE, timeout=HOUR_TIMEOUT):
+    """Fetch several hourly snapshots, revalidating the newest and reusing stored older hours"""
+    store = get_store()
+    hours = sorted(set(hours))
+    deadline_at = time.monotonic() + deadline
+
+    # Only the newest files can change; with nothing stored yet everything is fetched in one round
+    if store.anchor_key is None:
+        revalidate = hours
+    else:
+        revalidate = sorted(set(h for h in hours if h < store.mutable_hours) | {0})
+    validators = {hour: store.get_validators(hour) for hour in revalidate}
+    responses = _fetch_concurrently(revalidate, deadline_at - time.monotonic(), timeout, validators)
+
+    # 00.json fixes which absolute hour "hours ago" counts from
+    latest = responses.get(0, {})
+    anchor = SnapshotStore.hour_key_from_http_date(latest.get('last_modified'))
+    if anchor is None:
+        anchor = store.anchor_key if latest.get('status') == 304 else None
+    if anchor is None:
+        anchor = SnapshotStore.current_hour_key()
 
-def get_24h_data():
     all_data = {}
-    successful_fetches = 0
-    
-    # Only fetch the most recent 6 hours to reduce API calls
-    current_hour = datetime.now().hour
-    hours_to_fetch = [(current_hour - i) % 24 for i in range(6)]
-    
-    for i in hours_to_fetch:
-        hour_str = f"{i:02}"
-        url = f"https://a.windbornesystems.com/treasure/{hour_str}.json"
-        data = fetch_data(url)
-        if data is not None:
-            all_data[i] = data
-            successful_fetches += 1
-    
-    # Return data even if some hours failed
+    refetch = []
+    for hour, response in responses.items():
+        if response['status'] == 304:
+            data = store.load(validators[hour].get('key'))
+            if data is None:
+                refetch.append(hour)
+            else:
+                all_data[hour] = data.at_hour(hour)
+        elif response['data'] is not None:
+            key = anchor - hour
+            store.save(key, response['data'])
+            store.set_validators(hour, response['etag'], response['last_modified'], key)
+            all_data[hour] = response['data'].at_hour(hour)
+
+    # Older hours are immutable: reuse them from the store and download only what is missing
+    for hour in hours:
+        if hour in responses:
+            continue
+        data = store.load(anchor - hour)
+        if data is None:
+            refetch.append(hour)
+        else:
+            all_data[hour] = data.at_hour(hour)
+
+    responses = _fetch_concurrently(refetch, deadline_at - time.monotonic(), timeout, {})
+    for hour, response in responses.items():
+        if response['data'] is not None:
+            key = anchor - hour
+            store.save(key, response['data'])
+            if hour < store.mutable_hours:
+                store.set_validators(hour, response['etag'], response['last_modified'], key)
+            all_data[hour] = response['data'].at_hour(hour)
+
+    # Hours past the mutable window are final, so they go into the long-term archive before they are pruned
+    get_archive().append_settled(all_data, store.mutable_hours)
+    store.prune()
     return all_data
 
+def get_24h_data(num_hours=DEFAULT_HOURS, deadline=FETCH_DEADLINE):
+    """Fetch the most recent hourly Snapshots, keyed by hours ago (0 is the latest)"""
+    num_hours = max(1, min(num_hours, MAX_HOURS))
+
+    # Return data even if some hours failed
+    return fetch_hours(range(num_hours), deadline=deadline)
+
 if __name__ == '__main__':
     full_data = get_24h_data()
-    print(json.dumps(full_data, indent=4))
+    print(json.dumps({hour: snapshot.to_records() for hour, snapshot in full_data.items()}, indent=4))
@@ -0,0 +1,273 @@
+"""Where upstream HTTP calls go: live, live while recording to disk, or a replayed stand-in.
+
+Data and OpenSkyClient build their sessions with `mount`, so the choice is one setting
+(WINDBORNE_DATA_SOURCE) and neither module changes between modes:
+
+    live    the real Windborne and OpenSky APIs
+    record  the real APIs, with every treasure/{HH}.json and states/all response saved under
+            WINDBORNE_RECORD_DIR
+    replay  no network; answers come from the recordings, or from Synthetic data where there
+            are none, with injected latency, 5xx errors, 404s and malformed treasure layouts
+
+The same stand-in can run as its own HTTP server for load tests against gunicorn:
+
+    python DataSource.py --port 8765 --latency-ms 50-400 --error-rate 0.05
+    WINDBORNE_TREASURE_URL='http://127.0.0.1:8765/treasure/{hour:02}.json' \\
+    WINDBORNE_OPENSKY_URL=http://127.0.0.1:8765/api gunicorn app:app ...
+"""
+import argparse
+import glob
+import hashlib
+import http.server
+import io
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from urllib.parse import parse_qs, urlparse
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+import numpy as np
+import Synthetic
+
+SOURCE = os.environ.get('WINDBORNE_DATA_SOURCE', 'live')
+RECORD_DIR = os.environ.get('WINDBORNE_RECORD_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recordings'))
+LATENCY_MS = os.environ.get('WINDBORNE_REPLAY_LATENCY_MS', '0')  # Fixed, or a uniform range such as "50-400"
+ERROR_RATE = float(os.environ.get('WINDBORNE_REPLAY_ERROR_RATE', 0))  # Fraction of requests answered 503
+MISSING_RATE = float(os.environ.get('WINDBORNE_REPLAY_MISSING_RATE', 0))  # Fraction of treasure files answered 404
+MALFORMED_RATE = float(os.environ.get('WINDBORNE_REPLAY_MALFORMED_RATE', 0))  # Fraction served in a broken layout
+SYNTHETIC_BALLOONS = int(os.environ.get('WINDBORNE_REPLAY_BALLOONS', 1000))
+SYNTHETIC_AIRCRAFT = int(os.environ.get('WINDBORNE_REPLAY_AIRCRAFT', 10000))
+
+TREASURE_PATH = re.compile(r'/treasure/(\d{2})\.json$')
+STATES_PATH = re.compile(r'/states/all$')
+
+
+def _kind(url):
+    """('treasure', hour), ('states', None) or (None, None) for a request URL"""
+    path = urlparse(url).path
+    match = TREASURE_PATH.search(path)
+    if match:
+        return 'treasure', int(match.group(1))
+    if STATES_PATH.search(path):
+        return 'states', None
+    return None, None
+
+
+def parse_latency(value):
+    """(low, high) seconds from "ms" or "low-high" milliseconds"""
+    low, _, high = str(value).partition('-')
+    low = float(low or 0) / 1000
+    return low, float(high) / 1000 if high else low
+
+
+class RecordingAdapter(HTTPAdapter):
+    """The normal transport, saving each upstream response it carries under record_dir"""
+
+    def __init__(self, record_dir=RECORD_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.record_dir = record_dir
+        self._sequence = itertools.count()
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        kind, hour = _kind(request.url)
+        if kind is not None and response.status_code == 200:
+            name = f"{hour:02}" if kind == 'treasure' else 'states'
+            directory = os.path.join(self.record_dir, kind)
+            os.makedirs(directory, exist_ok=True)
+            record = {'url': request.url, 'recorded_at': time.time(),
+                      'headers': {k: v for k, v in response.headers.items() if k.lower() in ('etag', 'last-modified')},
+                      'body': response.text}
+            # Tiles are fetched concurrently, so the time alone does not make a name unique
+            path = os.path.join(directory, f"{name}-{int(time.time() * 1000)}-{next(self._sequence):06}.json")
+            try:
+                with open(path, 'w') as f:
+                    json.dump(record, f)
+            except OSError as e:
+                print(f"Could not record {request.url}: {e}")
+        return response
+
+
+class Replay:
+    """Answers treasure/{HH}.json and states/all like the real upstreams, from recordings or Synthetic data.
+
+    A treasure hour is the newest recording of that file; states/all is the latest
+    recorded state of every aircraft, filtered to the requested box. Faults are drawn per
+    request. Validators behave like the real ones, so If-None-Match gets a 304.
+    """
+
+    def __init__(self, record_dir=RECORD_DIR, latency=LATENCY_MS, error_rate=ERROR_RATE, missing_rate=MISSING_RATE,
+                 malformed_rate=MALFORMED_RATE, balloons=SYNTHETIC_BALLOONS, aircraft=SYNTHETIC_AIRCRAFT, seed=None):
+        self.record_dir = record_dir
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.missing_rate = missing_rate
+        self.malformed_rate = malformed_rate
+        self.balloons = balloons
+        self.aircraft = aircraft
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._treasure = None
+        self._states = None
+
+    def _load_treasure(self):
+        with self._lock:
+            if self._treasure is None:
+                treasure = {}
+                for path in sorted(glob.glob(os.path.join(self.record_dir, 'treasure', '*.json'))):
+                    with open(path) as f:
+                        treasure[int(os.path.basename(path)[:2])] = json.load(f)['body']  # Sorted, so the newest wins
+                if not treasure:
+                    treasure = Synthetic.make_hours(self.balloons, 24)
+                self._treasure = treasure
+        return self._treasure
+
+    def _load_states(self):
+        with self._lock:
+            if self._states is None:
+                latest = {}
+                for path in sorted(glob.glob(os.path.join(self.record_dir, 'states', '*.json'))):
+                    with open(path) as f:
+                        for state in json.loads(json.load(f)['body']).get('states') or []:
+                            latest[state[0]] = state
+                states = list(latest.values())
+                if not states:
+                    lat, lon, _ = Synthetic.balloon_positions(self.balloons, 1)
+                    states = Synthetic.make_states(self.aircraft, lat[0].tolist(), lon[0].tolist())
+                self._states = (states, np.array([np.nan if s[6] is None else s[6] for s in states], dtype=float),
+                                np.array([np.nan if s[5] is None else s[5] for s in states], dtype=float))
+        return self._states
+
+    def respond(self, url, headers=None):
+        """(status, headers, body bytes) for a GET of url"""
+        headers = headers or {}
+        with self._lock:
+            delay = self._rng.uniform(*self.latency)
+            failing = self._rng.random() < self.error_rate
+            missing = self._rng.random() < self.missing_rate
+            malformed = self._rng.random() < self.malformed_rate
+            layout = self._rng.choice(Synthetic.FORMATS[1:])
+        if delay:
+            time.sleep(delay)
+        kind, hour = _kind(url)
+        if kind is None or (kind == 'treasure' and missing):
+            return 404, {}, b''
+        if failing:
+            return 503, {}, b''
+
+        if kind == 'states':
+            states, lat, lon = self._load_states()
+            query = {k: float(v[0]) for k, v in parse_qs(urlparse(url).query).items()}
+            inside = np.flatnonzero((lat >= query.get('lamin', -90)) & (lat <= query.get('lamax', 90))
+                                    & (lon >= query.get('lomin', -180)) & (lon <= query.get('lomax', 180)))
+            body = json.dumps({'time': int(time.time()), 'states': [states[i] for i in inside.tolist()]}).encode()
+            return 200, {'Content-Type': 'application/json'}, body
+
+        treasure = self._load_treasure()
+        if hour not in treasure:
+            return 404, {}, b''
+        body = treasure[hour]
+        if malformed:
+            body = Synthetic.apply_layout(body, layout)
+        etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:16] + '"'
+        if headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}, b''
+        modified = (int(time.time() // 3600) - hour) * 3600
+        return 200, {'Content-Type': 'application/json', 'ETag': etag,
+                     'Last-Modified': formatdate(modified, usegmt=True)}, body.encode()
+
+
+class ReplayAdapter(BaseAdapter):
+    """In-process transport that hands every request to a Replay instead of the network"""
+
+    def __init__(self, replay):
+        super().__init__()
+        self.replay = replay
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        status, headers, body = self.replay.respond(request.url, request.headers)
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.headers['Content-Length'] = str(len(body))
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        response.encoding = 'utf-8'
+        response.reason = http.server.BaseHTTPRequestHandler.responses.get(status, ('',))[0]
+        return response
+
+    def close(self):
+        pass
+
+
+_replay = None
+_replay_lock = threading.Lock()
+
+
+def get_replay():
+    """Return the process-wide stand-in, so every session replays from the same data"""
+    global _replay
+    with _replay_lock:
+        if _replay is None:
+            _replay = Replay()
+    return _replay
+
+
+def mount(session, pool_size, source=None):
+    """Install the transport for the configured data source on a requests session"""
+    source = source or SOURCE
+    if source == 'replay':
+        adapter = ReplayAdapter(get_replay())
+    elif source == 'record':
+        adapter = RecordingAdapter(pool_connections=1, pool_maxsize=pool_size)
+    else:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def serve(replay, host='127.0.0.1', port=8765):
+    """Run the stand-in as an HTTP server until interrupted"""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            status, headers, body = replay.respond(self.path, self.headers)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    print(f"Serving the upstream stand-in on http://{host}:{port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve recorded or synthetic treasure/{HH}.json and OpenSky states/all")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--record-dir', default=RECORD_DIR)
+    parser.add_argument('--latency-ms', default=LATENCY_MS, help='fixed, or a uniform range such as 50-400')
+    parser.add_argument('--error-rate', type=float, default=ERROR_RATE)
+    parser.add_argument('--missing-rate', type=float, default=MISSING_RATE)
+    parser.add_argument('--malformed-rate', type=float, default=MALFORMED_RATE)
+    parser.add_argument('--balloons', type=int, default=SYNTHETIC_BALLOONS)
+    parser.add_argument('--aircraft', type=int, default=SYNTHETIC_AIRCRAFT)
+    args = parser.parse_args()
+    serve(Replay(args.record_dir, args.latency_ms, args.error_rate, args.missing_rate, args.malformed_rate,
+                 args.balloons, args.aircraft), args.host, args.port)
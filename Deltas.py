@@ -0,0 +1,134 @@
+import threading
+from collections import OrderedDict
+from Responses import EncodedPayload
+
+HISTORY_SECONDS = 3600  # How far back a client can ask for changes before it gets the full payload
+MAX_CACHED_DELTAS = 32
+MAX_GENERATIONS = 12  # Payloads kept per dataset, whatever their age
+
+# Small top-level fields that are always sent whole
+SUMMARY_FIELDS = ('insights', 'data_quality', 'last_updated', 'air_traffic_enabled')
+
+
+def _patch_track(old, patch):
+    """Apply an extension patch to a track record, the same way static/js/main.js does"""
+    path = patch['path'] + old['path'][:patch['keep']]
+    velocities = patch['velocities'] + old['velocities'][:patch['keep']]
+    if patch['keep'] < len(old['path']) and velocities:
+        velocities[-1] = [0, 0]  # The oldest point has no step behind it
+    return {'id': old['id'], 'path': path, 'velocities': velocities}
+
+
+def _track_patch(old, new):
+    """Extension patch turning old into new: new points in front, oldest points trimmed; None if that cannot express it"""
+    if not old['path']:
+        return None
+    try:
+        prepended = new['path'].index(old['path'][0])
+    except ValueError:
+        return None
+    patch = {
+        'id': new['id'],
+        'path': new['path'][:prepended],
+        'velocities': new['velocities'][:prepended],
+        'keep': len(new['path']) - prepended
+    }
+    return patch if _patch_track(old, patch) == new else None
+
+
+def _aircraft_key(aircraft):
+    return aircraft.get('icao24') or aircraft.get('callsign')
+
+
+def diff_payloads(old, new):
+    """Changes between two /api/data payloads, or None if the client should just take the new one.
+
+    Tracks are matched by id. Tracks keep their order between refreshes (removed ones drop
+    out, new ones are appended), which lets constellation links keep referring to balloon
+    indices; if that does not hold (e.g. after the tracks were rebuilt) there is no delta.
+    """
+    old_balloons = {b['id']: b for b in old['balloons']}
+    new_ids = [b['id'] for b in new['balloons']]
+    present = set(new_ids)
+    removed = [i for i in old_balloons if i not in present]
+    kept = [i for i in old_balloons if i in present]
+    added = new['balloons'][len(kept):]
+    if new_ids[:len(kept)] != kept or any(b['id'] in old_balloons for b in added):
+        return None
+
+    extended, replaced = [], []
+    for balloon in new['balloons'][:len(kept)]:
+        previous = old_balloons[balloon['id']]
+        if previous == balloon:
+            continue
+        patch = _track_patch(previous, balloon)
+        if patch is None:
+            replaced.append(balloon)
+        else:
+            extended.append(patch)
+
+    old_aircraft = {_aircraft_key(a): a for a in old['aircraft']}
+    new_aircraft = {_aircraft_key(a): a for a in new['aircraft']}
+    delta = {
+        'delta': True,
+        'since': old['version'],
+        'version': new['version'],
+        'balloons': {'added': added, 'removed': removed, 'extended': extended, 'replaced': replaced},
+        'aircraft': {
+            'upserted': [a for key, a in new_aircraft.items() if old_aircraft.get(key) != a],
+            'removed': [key for key in old_aircraft if key not in new_aircraft]
+        }
+    }
+    for field in ('constellation', 'safety_analysis'):
+        if old[field] != new[field]:
+            delta[field] = new[field]
+    for field in SUMMARY_FIELDS:
+        delta[field] = new[field]
+    return delta
+
+
+class DeltaHistory:
+    """Recent payload generations kept in the shared cache so any worker can answer ?since=<version>.
+
+    Deltas are encoded once per (dataset, since, version) and reused, since every client
+    that was on the same generation asks for the same one.
+    """
+
+    def __init__(self, cache, retain_seconds=HISTORY_SECONDS):
+        self.cache = cache
+        self.retain_seconds = retain_seconds
+        self._lock = threading.Lock()
+        self._encoded = OrderedDict()
+
+    def record(self, key, data):
+        """Keep data as a generation of dataset `key`, dropping the oldest beyond MAX_GENERATIONS"""
+        # Each payload has its own key so a refresh writes only the new one; history:{key}
+        # lists the retained versions, oldest first. Only the refreshing worker records a dataset.
+        item = self.cache.get(f"history:{key}")
+        versions = (item[0] if item is not None else []) + [data['version']]
+        for version in versions[:-MAX_GENERATIONS]:
+            self.cache.delete(f"history:{key}:{version}")
+        versions = versions[-MAX_GENERATIONS:]
+        self.cache.set(f"history:{key}:{data['version']}", data, ttl=self.retain_seconds)
+        self.cache.set(f"history:{key}", versions, ttl=self.retain_seconds)
+
+    def delta(self, key, since, payload):
+        """EncodedPayload with the changes from generation `since` to payload, or None if `since` is unknown"""
+        cache_key = (key, since, payload['version'])
+        with self._lock:
+            if cache_key in self._encoded:
+                self._encoded.move_to_end(cache_key)
+                return self._encoded[cache_key]
+
+        item = self.cache.get(f"history:{key}:{since}")
+        if item is None:
+            return None
+        changes = diff_payloads(item[0], payload.data)
+        if changes is None:
+            return None
+        encoded = EncodedPayload(changes)
+        with self._lock:
+            self._encoded[cache_key] = encoded
+            while len(self._encoded) > MAX_CACHED_DELTAS:
+                self._encoded.popitem(last=False)
+        return encoded
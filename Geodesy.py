@@ -0,0 +1,74 @@
+"""Distance and bearing kernels shared by tracking, constellation links and safety analysis.
+
+All functions take latitude before longitude, in degrees, and return kilometres or degrees.
+The batched kernels broadcast over NumPy arrays; the *_scalar versions use plain math and
+are faster for a handful of pairs, where NumPy's per-call overhead dominates.
+"""
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+SCALAR_PAIRS = 16  # Below this many pairs the scalar kernels beat the batched ones
+
+
+def haversine_km_scalar(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between two points"""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def bearing_deg_scalar(lat1, lon1, lat2, lon2):
+    """Initial bearing in degrees (0-360) from point 1 towards point 2"""
+    lat1 = math.radians(lat1)
+    lat2 = math.radians(lat2)
+    dlon = math.radians(lon2 - lon1)
+    y = math.sin(dlon) * math.cos(lat2)
+    x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
+    return (math.degrees(math.atan2(y, x)) + 360) % 360
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km, elementwise; broadcasts over arrays"""
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def bearing_deg(lat1, lon1, lat2, lon2):
+    """Initial bearing in degrees (0-360) from point 1 towards point 2, elementwise"""
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlon = np.radians(np.subtract(lon2, lon1))
+    y = np.sin(dlon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return (np.degrees(np.arctan2(y, x)) + 360) % 360
+
+
+def distances_and_bearings(lat1, lon1, lat2, lon2):
+    """(km, degrees) lists for paired points, using the scalar kernels when there are only a few pairs"""
+    if len(lat1) < SCALAR_PAIRS:
+        pairs = list(zip(np.asarray(lat1, dtype=float).tolist(), np.asarray(lon1, dtype=float).tolist(),
+                         np.asarray(lat2, dtype=float).tolist(), np.asarray(lon2, dtype=float).tolist()))
+        return [haversine_km_scalar(*pair) for pair in pairs], [bearing_deg_scalar(*pair) for pair in pairs]
+    return haversine_km(lat1, lon1, lat2, lon2).tolist(), bearing_deg(lat1, lon1, lat2, lon2).tolist()
+
+
+def to_unit_vectors(lat, lon):
+    """Points in degrees as an (N, 3) array of xyz coordinates on the unit sphere"""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_length(distance_km):
+    """Straight-line distance through the unit sphere for a great-circle distance in km"""
+    return 2 * np.sin(np.minimum(distance_km / EARTH_RADIUS_KM, np.pi) / 2)
@@ -0,0 +1,128 @@
+"""In-process counters and latency histograms, rendered in the Prometheus text format for /metrics.
+
+Metrics are per process; with several gunicorn workers each scrape sees the worker that
+answered. Stage timings taken while a request is being handled are also kept for that
+request, so the app can report them in a Server-Timing header.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 3e5, 1e6, 3e6, 1e7)
+
+# Every metric the app records: name -> (type, help, histogram buckets)
+METRICS = {
+    'windborne_stage_seconds': ('histogram', "Time spent in each /api/data pipeline stage", LATENCY_BUCKETS),
+    'windborne_upstream_request_seconds': ('histogram', "Latency of upstream HTTP calls by source and status", LATENCY_BUCKETS),
+    'windborne_upstream_response_bytes': ('histogram', "Body size of upstream HTTP responses by source", SIZE_BUCKETS),
+    'windborne_records_parsed_total': ('counter', "Balloon records parsed from upstream files", None),
+    'windborne_records_dropped_total': ('counter', "Malformed balloon records dropped while parsing", None),
+    'windborne_cache_requests_total': ('counter', "Cache lookups by cache and result (hit, stale, miss)", None),
+    'windborne_errors_total': ('counter', "Errors caught and handled, by where they happened", None),
+    'windborne_http_request_seconds': ('histogram', "Latency of requests to this app by endpoint and status", LATENCY_BUCKETS),
+    'windborne_http_response_bytes': ('histogram', "Body size of responses from this app by endpoint", SIZE_BUCKETS),
+}
+
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class Registry:
+    """Counters and cumulative-bucket histograms keyed by metric name and label set"""
+
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._values = {}  # (name, labels) -> count, or [bucket counts, sum, count]
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted((label, str(text)) for label, text in labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        buckets = self.metrics[name][2]
+        key = (name, tuple(sorted((label, str(text)) for label, text in labels.items())))
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """Every series in the Prometheus text exposition format"""
+        with self._lock:
+            values = {key: (value if not isinstance(value, list) else [list(value[0]), value[1], value[2]])
+                      for key, value in self._values.items()}
+        lines = []
+        for name, (kind, help_text, buckets) in self.metrics.items():
+            series = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                if kind == 'counter':
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                counts, total, count = value
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {bucket_count}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+render = registry.render
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage into windborne_stage_seconds and the current request's Server-Timing"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe('windborne_stage_seconds', elapsed, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def start_request():
+    """Collect stage timings for the request being handled in this context"""
+    _request_timings.set([])
+
+
+def server_timing():
+    """Server-Timing header value for the stages timed during the current request, or None"""
+    timings = _request_timings.get()
+    if not timings:
+        return None
+    return ', '.join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in timings)
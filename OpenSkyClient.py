@@ -0,0 +1,229 @@
+import os
+import random
+import threading
+import time
+import requests
+import DataSource
+import Metrics
+
+BASE_URL = os.environ.get('WINDBORNE_OPENSKY_URL', "https://opensky-network.org/api")
+TIMEOUT = 5
+RETRIES = 2  # Extra attempts after a connection error or 5xx, with jittered exponential backoff
+BACKOFF_SECONDS = 0.5
+# Daily API credits: 400 for anonymous use, 4000 with an account
+DAILY_CREDITS = int(os.environ.get('WINDBORNE_OPENSKY_CREDITS', 400))
+FAILURE_THRESHOLD = 3  # Consecutive failures that open the circuit
+COOLDOWN_SECONDS = 30  # First open period; doubles on every failed trial, up to MAX_COOLDOWN_SECONDS
+MAX_COOLDOWN_SECONDS = 600
+
+
+class OpenSkyUnavailable(Exception):
+    """Raised without contacting OpenSky when the circuit is open or the request budget is spent"""
+
+
+def request_cost(lat_min, lat_max, lon_min, lon_max):
+    """API credits OpenSky charges for a /states/all query over this box"""
+    area = (lat_max - lat_min) * (lon_max - lon_min)
+    if area <= 25:
+        return 1
+    if area <= 100:
+        return 2
+    if area <= 400:
+        return 3
+    return 4
+
+
+class TokenBucket:
+    """Request budget in API credits, refilled evenly over the day and corrected by OpenSky's headers"""
+
+    def __init__(self, capacity=DAILY_CREDITS, refill_per_second=None):
+        self.capacity = capacity
+        self.refill_per_second = capacity / 86400 if refill_per_second is None else refill_per_second
+        self.tokens = float(capacity)
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def try_acquire(self, cost):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until or self.tokens < cost:
+                return False
+            self.tokens -= cost
+            return True
+
+    def observe(self, remaining=None, retry_after=None):
+        """Sync with X-Rate-Limit-Remaining, or stop until X-Rate-Limit-Retry-After-Seconds has passed"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+            if retry_after is not None:
+                self.tokens = 0.0
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def status(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {'tokens': round(self.tokens, 2), 'capacity': self.capacity,
+                    'blocked_for': round(max(0.0, self.blocked_until - now), 1)}
+
+
+class CircuitBreaker:
+    """Closed while OpenSky answers; opens after repeated failures and lets one trial through per cooldown"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN_SECONDS, max_cooldown=MAX_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._changed = threading.Condition()
+
+    def allow(self, timeout=TIMEOUT):
+        """Whether a request may go out; while a half-open trial is in flight, wait (up to timeout) for its outcome"""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                if self.state == 'closed':
+                    return True
+                if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                    self.state = 'half_open'
+                    self._trial = False
+                if self.state == 'half_open' and not self._trial:
+                    self._trial = True  # Exactly one request tests whether OpenSky has recovered
+                    return True
+                remaining = deadline - time.monotonic()
+                if self.state == 'open' or remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+
+    def is_open(self):
+        """True while requests are being refused, without claiming the half-open trial"""
+        with self._changed:
+            return self.state == 'open' and time.monotonic() - self.opened_at < self.cooldown
+
+    def is_closed(self):
+        """True while OpenSky is considered healthy, so requests need not wait for a recovery trial"""
+        with self._changed:
+            return self.state == 'closed'
+
+    def release(self):
+        """Hand back a half-open trial that ended without telling anything about OpenSky's health"""
+        with self._changed:
+            self._trial = False
+            self._changed.notify_all()
+
+    def record_success(self):
+        with self._changed:
+            self.state = 'closed'
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._changed.notify_all()
+
+    def record_failure(self):
+        with self._changed:
+            self.failures += 1
+            if self.state == 'half_open':
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+            self._changed.notify_all()
+
+    def status(self):
+        with self._changed:
+            reopens_in = None
+            if self.state == 'open':
+                reopens_in = round(max(0.0, self.cooldown - (time.monotonic() - self.opened_at)), 1)
+            return {'state': self.state, 'consecutive_failures': self.failures, 'reopens_in': reopens_in}
+
+
+class OpenSkyClient:
+    """Pooled session to the OpenSky API with retries, a credit budget and a circuit breaker.
+
+    `get_states` either returns the decoded /states/all response or raises: requests
+    exceptions when OpenSky fails, OpenSkyUnavailable when the call was not even attempted.
+    Callers keep serving their last good aircraft in both cases.
+    """
+
+    def __init__(self, base_url=BASE_URL, auth=None, pool_size=8, bucket=None, breaker=None):
+        self.base_url = base_url
+        self.auth = auth
+        self.bucket = bucket or TokenBucket(DAILY_CREDITS * (10 if auth else 1))
+        self.breaker = breaker or CircuitBreaker()
+        self.session = DataSource.mount(requests.Session(), pool_size)
+        self._lock = threading.Lock()
+        self.counts = {'requests': 0, 'failures': 0, 'retries': 0, 'throttled': 0, 'short_circuited': 0, 'over_budget': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def get_states(self, lat_min, lat_max, lon_min, lon_max, timeout=TIMEOUT):
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise OpenSkyUnavailable("OpenSky circuit is open")
+        if not self.bucket.try_acquire(request_cost(lat_min, lat_max, lon_min, lon_max)):
+            self._count('over_budget')
+            self.breaker.release()  # Not OpenSky's fault, so a half-open trial is handed back unused
+            raise OpenSkyUnavailable("OpenSky request budget spent")
+
+        params = {'lamin': lat_min, 'lamax': lat_max, 'lomin': lon_min, 'lomax': lon_max}
+        for attempt in range(RETRIES + 1):
+            self._count('requests')
+            started = time.perf_counter()
+            try:
+                try:
+                    response = self.session.get(f"{self.base_url}/states/all", params=params, auth=self.auth, timeout=timeout)
+                except requests.RequestException:
+                    Metrics.observe('windborne_upstream_request_seconds', time.perf_counter() - started,
+                                    source='opensky', status='error')
+                    raise
+                Metrics.observe('windborne_upstream_request_seconds', time.perf_counter() - started,
+                                source='opensky', status=response.status_code)
+                Metrics.observe('windborne_upstream_response_bytes', len(response.content), source='opensky')
+                remaining = response.headers.get('X-Rate-Limit-Remaining')
+                if response.status_code == 429:
+                    self._count('throttled')
+                    retry_after = response.headers.get('X-Rate-Limit-Retry-After-Seconds')
+                    self.bucket.observe(retry_after=float(retry_after) if retry_after else COOLDOWN_SECONDS)
+                    response.raise_for_status()
+                if remaining is not None:
+                    self.bucket.observe(remaining=float(remaining))
+                if response.status_code >= 500 and attempt < RETRIES:
+                    raise requests.HTTPError(f"{response.status_code} from OpenSky", response=response)
+                response.raise_for_status()
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                # Includes a body cut short or not JSON, so every attempt settles the breaker
+                status = getattr(getattr(e, 'response', None), 'status_code', None)
+                retryable = status is None or status >= 500
+                if retryable and attempt < RETRIES:
+                    self._count('retries')
+                    time.sleep(BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5))
+                    continue
+                self._count('failures')
+                if status == 429:
+                    self.breaker.release()  # Throttling is the budget's business, not a sign OpenSky is down
+                else:
+                    self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return data
+
+    def status(self):
+        """Breaker, budget and request counters, for /health"""
+        with self._lock:
+            counts = dict(self.counts)
+        return {'circuit': self.breaker.status(), 'budget': self.bucket.status(), 'counts': counts}
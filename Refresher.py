@@ -0,0 +1,184 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import Metrics
+import SharedCache
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; callers arriving meanwhile wait for its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+
+class RefreshScheduler:
+    """Stale-while-revalidate cache that recomputes datasets in the background before they expire.
+
+    `compute(key)` builds a dataset and returns None when there is nothing usable (the
+    previous copy is then kept). Requests get the last good copy immediately; only a
+    cold start or a forced refresh waits, and concurrent waiters share a single compute.
+
+    Datasets are published to a SharedCache backend. With a shared backend every worker
+    serves the same copy and a leased lock makes sure only one of them recomputes it; the
+    others keep serving the previous copy, or wait for the new one if they have none.
+    """
+
+    def __init__(self, compute, ttl, refresh_ahead=timedelta(minutes=1),
+                 idle_after=timedelta(minutes=30), poll_seconds=10, cache=None, lease_seconds=120):
+        self.compute = compute
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.idle_after = idle_after  # Stop refreshing datasets nobody has asked for in this long
+        self.poll_seconds = poll_seconds
+        self.cache = cache if cache is not None else SharedCache.MemoryBackend()
+        self.lease_seconds = lease_seconds  # Longest one compute may hold the cross-worker lock
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._local = {}  # key -> {'value', 'updated', 'stored_at'}, decoded copies of cache entries
+        self._last_requested = {}
+        self._last_attempt = {}
+        self._thread = None
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='refresh-scheduler', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            now = datetime.now()
+            with self._lock:
+                keys = [key for key, requested in self._last_requested.items()
+                        if now - requested < self.idle_after]
+            for key in keys:
+                # Cold datasets are built by the first request
+                age = self.age(key)
+                if age is not None and age >= self.ttl - self.refresh_ahead and not self._recently_tried(key):
+                    self.refresh(key, wait=False)
+
+    def _recently_tried(self, key):
+        # A failed refresh leaves the entry stale; back off for a few polls before trying again
+        return time.monotonic() - self._last_attempt.get(key, 0) < 3 * self.poll_seconds
+
+    def _cache_key(self, key):
+        return f"processed:{key}"
+
+    def _entry(self, key):
+        """The published entry for key, decoding it only when another worker has replaced it"""
+        stored_at = self.cache.stored_at(self._cache_key(key))
+        with self._lock:
+            entry = self._local.get(key)
+        if stored_at is None:
+            return None
+        if entry is not None and entry['stored_at'] == stored_at:
+            return entry
+        item = self.cache.get(self._cache_key(key))
+        if item is None:
+            return None
+        (value, updated), stored_at = item
+        entry = {'value': value, 'updated': updated, 'stored_at': stored_at}
+        with self._lock:
+            self._local[key] = entry
+        return entry
+
+    def _publish(self, key, value):
+        # Kept well past the TTL so a stale copy can still be served while a refresh runs
+        self.cache.set(self._cache_key(key), (value, datetime.now()),
+                       ttl=12 * self.ttl.total_seconds())
+
+    def _wait_for_publish(self, key, previous):
+        deadline = time.monotonic() + self.lease_seconds
+        while time.monotonic() < deadline:
+            time.sleep(0.25)
+            stored_at = self.cache.stored_at(self._cache_key(key))
+            if stored_at is not None and stored_at != previous:
+                return
+
+    def age(self, key):
+        entry = self._entry(key)
+        return None if entry is None else datetime.now() - entry['updated']
+
+    def refresh(self, key, wait=True):
+        """Recompute a dataset now (joining a refresh already in flight); returns the current copy.
+
+        If another worker holds the refresh lock, wait for its result when `wait` is set,
+        otherwise return straight away with the current copy.
+        """
+        def run():
+            self._last_attempt[key] = time.monotonic()
+            previous = self.cache.stored_at(self._cache_key(key))
+            owner = self.cache.acquire_lock(f"refresh:{key}", self.lease_seconds)
+            if owner is None:
+                if wait:
+                    self._wait_for_publish(key, previous)
+                return None
+            try:
+                value = self.compute(key)
+                if value is not None:
+                    self._publish(key, value)
+                return value
+            finally:
+                self.cache.release_lock(f"refresh:{key}", owner)
+
+        try:
+            self._flight.do(key, run)
+        except Exception as e:
+            Metrics.inc('windborne_errors_total', where='refresh')
+            print(f"Refresh of {key!r} failed: {e}")
+        entry = self._entry(key)
+        return None if entry is None else entry['value']
+
+    def refresh_async(self, key):
+        if not self._flight.in_flight(key):
+            threading.Thread(target=self.refresh, args=(key, False), name=f'refresh-{key}', daemon=True).start()
+
+    def get(self, key, force=False):
+        """Return the dataset for key, serving the last good copy while a refresh runs"""
+        with self._lock:
+            self._last_requested[key] = datetime.now()
+        entry = self._entry(key)
+        self._start()
+
+        if force or entry is None:
+            Metrics.inc('windborne_cache_requests_total', cache='dataset', result='miss')
+            return self.refresh(key)
+        if datetime.now() - entry['updated'] >= self.ttl - self.refresh_ahead:
+            Metrics.inc('windborne_cache_requests_total', cache='dataset', result='stale')
+            if not self._recently_tried(key):
+                self.refresh_async(key)
+        else:
+            Metrics.inc('windborne_cache_requests_total', cache='dataset', result='hit')
+        return entry['value']
@@ -0,0 +1,68 @@
+import gzip
+import hashlib
+import json
+import zlib
+from flask import Response
+
+try:
+    import brotli  # Optional; responses fall back to gzip/deflate without it
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _to_json(value):
+    """Serialize column-stored values such as AircraftBatch when the payload is encoded"""
+    if hasattr(value, 'to_records'):
+        return value.to_records()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class EncodedPayload:
+    """A JSON payload serialized and compressed once, then served as bytes to every request.
+
+    Built once per cache generation. Each encoding gets its own strong ETag, so a client
+    revalidating with If-None-Match gets a 304 without the body being touched, and a hit
+    only has to pick the right pre-built variant.
+    """
+
+    def __init__(self, data, body=None, mimetype='application/json'):
+        self.data = data
+        self.mimetype = mimetype
+        if body is None:
+            body = json.dumps(data, separators=(',', ':'), sort_keys=True, default=_to_json).encode()  # Same bytes jsonify produced
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.bodies = {
+            'identity': body,
+            'gzip': gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0),
+            'deflate': zlib.compress(body, GZIP_LEVEL)
+        }
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body, quality=BROTLI_QUALITY)
+        self.etags = {encoding: digest if encoding == 'identity' else f"{digest}-{encoding}"
+                      for encoding in self.bodies}
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def negotiate(self, request):
+        """Best encoding the client accepts, preferring the smallest"""
+        offered = [e for e in ('br', 'gzip', 'deflate') if e in self.bodies]
+        return request.accept_encodings.best_match(offered) or 'identity'
+
+    def response(self, request):
+        """Flask response for this request: 304 if the client's copy is current, otherwise the encoded bytes"""
+        encoding = self.negotiate(request)
+        etag = self.etags[encoding]
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.bodies[encoding], mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'  # Always revalidate; a match costs a 304
+        return response
@@ -0,0 +1,169 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+# With more than one gunicorn worker the in-process backend would give each worker its own copy
+DEFAULT_BACKEND = 'sqlite' if int(os.environ.get('WEB_CONCURRENCY', 1)) > 1 else 'memory'
+BACKEND = os.environ.get('WINDBORNE_CACHE_BACKEND', DEFAULT_BACKEND)
+DB_PATH = os.environ.get('WINDBORNE_CACHE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared_cache.db'))
+
+
+def _new_owner():
+    return f"{os.getpid()}:{uuid.uuid4().hex}"
+
+
+class MemoryBackend:
+    """In-process cache: values are shared by reference between the threads of one worker.
+
+    Every backend stores values with an optional TTL, reports when a key was last published
+    (so callers can keep a decoded copy until it changes) and offers leased locks for
+    coordinating refreshes.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}  # key -> (value, stored_at, expires_at)
+        self._locks = {}  # name -> (owner, expires_at)
+
+    def get(self, key):
+        """Return (value, stored_at) or None if the key is missing or expired"""
+        with self._lock:
+            item = self._values.get(key)
+            if item is not None and item[2] is not None and item[2] <= time.time():
+                del self._values[key]
+                item = None
+        if item is None:
+            return None
+        return item[0], item[1]
+
+    def stored_at(self, key):
+        item = self.get(key)
+        return None if item is None else item[1]
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        with self._lock:
+            # Expired entries are otherwise only hidden from reads; drop them while the lock is held
+            for expired in [k for k, item in self._values.items() if item[2] is not None and item[2] <= now]:
+                del self._values[expired]
+            self._values[key] = (value, now, None if ttl is None else now + ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def clear(self, prefix=''):
+        with self._lock:
+            for key in [k for k in self._values if k.startswith(prefix)]:
+                del self._values[key]
+
+    def acquire_lock(self, name, lease):
+        """Take a lock for at most `lease` seconds; returns an owner token, or None if it is held"""
+        now = time.time()
+        with self._lock:
+            held = self._locks.get(name)
+            if held is not None and held[1] > now:
+                return None
+            owner = _new_owner()
+            self._locks[name] = (owner, now + lease)
+            return owner
+
+    def release_lock(self, name, owner):
+        with self._lock:
+            if self._locks.get(name, (None,))[0] == owner:
+                del self._locks[name]
+
+
+class SQLiteBackend:
+    """Cache shared by every process on the host through one SQLite database in WAL mode.
+
+    Values are pickled. A publish is a single INSERT OR REPLACE, so readers in other
+    workers see either the old or the new value, never a partial one; WAL lets them keep
+    reading while a writer commits. Locks are rows with an expiry, so a crashed worker
+    cannot hold a refresh lock forever.
+    """
+
+    shared = True
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, stored_at REAL, expires_at REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, owner TEXT, expires_at REAL)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value, stored_at FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0]), row[1]
+
+    def stored_at(self, key):
+        row = self._conn().execute(
+            "SELECT stored_at FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())).fetchone()
+        return None if row is None else row[0]
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._conn()
+        # Expired rows are otherwise only hidden from reads, as expired locks are in acquire_lock
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        conn.execute("INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                             (key, blob, now, None if ttl is None else now + ttl))
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self, prefix=''):
+        self._conn().execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def acquire_lock(self, name, lease):
+        conn = self._conn()
+        now = time.time()
+        owner = _new_owner()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM locks WHERE name = ? AND expires_at <= ?", (name, now))
+            cursor = conn.execute("INSERT OR IGNORE INTO locks (name, owner, expires_at) VALUES (?, ?, ?)",
+                                  (name, owner, now + lease))
+            acquired = cursor.rowcount == 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return owner if acquired else None
+
+    def release_lock(self, name, owner):
+        self._conn().execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, owner))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide cache backend selected by WINDBORNE_CACHE_BACKEND"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = SQLiteBackend() if BACKEND == 'sqlite' else MemoryBackend()
+    return _backend
@@ -0,0 +1,70 @@
+import os
+import numpy as np
+
+# float32 halves memory at ~1 m precision, float64 keeps the upstream values exactly
+DTYPE = np.dtype(os.environ.get('WINDBORNE_SNAPSHOT_DTYPE', 'float64'))
+
+
+class Snapshot:
+    """One hourly balloon snapshot stored as contiguous lat/lon/alt columns.
+
+    `hour` is hours ago (0 is the latest file) and changes as time passes, `key` is the
+    absolute hour the snapshot was taken and never changes. `valid` marks rows whose
+    coordinates are all finite and in range. Data.parse_records already drops malformed and
+    out-of-range records, so row numbers count valid records, not lines of the upstream file.
+    """
+
+    __slots__ = ('hour', 'key', 'lat', 'lon', 'alt', 'valid')
+
+    def __init__(self, lat, lon, alt, hour=0, key=None, valid=None):
+        self.lat = lat
+        self.lon = lon
+        self.alt = alt
+        self.hour = hour
+        self.key = key
+        if valid is None:
+            valid = (np.isfinite(lat) & np.isfinite(lon) & np.isfinite(alt)
+                     & (np.abs(lat) <= 90) & (np.abs(lon) <= 180))
+        self.valid = valid
+
+    @classmethod
+    def from_records(cls, records, hour=0, key=None, dtype=DTYPE):
+        """Build a snapshot from parsed [lat, lon, alt] records"""
+        if len(records) == 0:
+            empty = np.empty(0, dtype=dtype)
+            return cls(empty, empty.copy(), empty.copy(), hour=hour, key=key)
+        columns = np.array(records, dtype=dtype).reshape(-1, 3)
+        # Copy each column so it is contiguous rather than a strided view of the rows
+        return cls(np.ascontiguousarray(columns[:, 0]), np.ascontiguousarray(columns[:, 1]),
+                   np.ascontiguousarray(columns[:, 2]), hour=hour, key=key)
+
+    def __len__(self):
+        return len(self.lat)
+
+    def at_hour(self, hour):
+        """Return a view of this snapshot labelled with a different hours-ago index"""
+        return Snapshot(self.lat, self.lon, self.alt, hour=hour, key=self.key, valid=self.valid)
+
+    def valid_indices(self):
+        return np.flatnonzero(self.valid)
+
+    def take(self, rows):
+        """Return the given rows as a new snapshot"""
+        return Snapshot(self.lat[rows], self.lon[rows], self.alt[rows], hour=self.hour,
+                        key=self.key, valid=self.valid[rows])
+
+    def to_records(self):
+        """Valid rows as [lat, lon, alt] lists, the format the upstream files use"""
+        rows = self.valid
+        return np.column_stack((self.lat[rows], self.lon[rows], self.alt[rows])).tolist()
+
+    def save(self, file):
+        np.savez(file, lat=self.lat, lon=self.lon, alt=self.alt, valid=self.valid,
+                 key=np.int64(-1 if self.key is None else self.key))
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file) as arrays:
+            key = int(arrays['key'])
+            return cls(arrays['lat'], arrays['lon'], arrays['alt'],
+                       key=None if key < 0 else key, valid=arrays['valid'])
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+import numpy as np
+import SharedCache
+from TrackTiles import lon_ranges
+
+ARCHIVE_DIR = os.environ.get('WINDBORNE_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot_archive'))
+INDEX_FILE = 'index.json'
+# One flat little-endian file per column, so a partition can be memory-mapped without parsing
+COLUMNS = {'lat': '<f8', 'lon': '<f8', 'alt': '<f8', 'row': '<i4'}
+LOCK_LEASE = 60  # Seconds one worker may hold the append lock
+MAX_OPEN_PARTITIONS = 32
+
+
+def partition_name(key):
+    """UTC day (YYYY-MM-DD) an absolute hour belongs to"""
+    return datetime.fromtimestamp(key * 3600, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+class Partition:
+    """One day of archived hours: memory-mapped columns plus the index of committed hours.
+
+    `hours` maps an absolute hour to [first row, row count, south, north, west, east]. Rows
+    within an hour are sorted by longitude, so a bounding box becomes a binary search and a
+    latitude mask over one slice. Only rows listed in the index are mapped; anything past
+    them is an append that never committed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(os.path.join(path, INDEX_FILE)) as f:
+                self.hours = {int(key): entry for key, entry in json.load(f)['hours'].items()}
+        except (OSError, ValueError, KeyError):
+            self.hours = {}
+        self.rows = sum(entry[1] for entry in self.hours.values())
+        self.columns = {name: np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode='r', shape=(self.rows,))
+                        if self.rows else np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+    def query(self, key, bbox=None):
+        """Columns of one hour as views into the mapped files, filtered by (west, south, east, north) if given"""
+        start, count, south, north, west, east = self.hours[key]
+        if bbox is None:
+            return {name: column[start:start + count] for name, column in self.columns.items()}
+        if bbox[1] > north or bbox[3] < south:
+            return None
+        pieces = []
+        lon = self.columns['lon'][start:start + count]
+        for low, high in lon_ranges(bbox[0], bbox[2]):
+            if low > east or high < west:
+                continue
+            first, last = np.searchsorted(lon, low, side='left'), np.searchsorted(lon, high, side='right')
+            lat = self.columns['lat'][start + first:start + last]
+            pieces.append(start + first + np.flatnonzero((lat >= bbox[1]) & (lat <= bbox[3])))
+        if not pieces:
+            return None
+        rows = np.concatenate(pieces)
+        return {name: column[rows] for name, column in self.columns.items()}
+
+
+class SnapshotArchive:
+    """Append-only archive of every settled hourly snapshot, partitioned by UTC day.
+
+    The upstream only serves the last 24 hours; the archive keeps what falls out of that
+    window so longer ranges can be queried without re-scraping. Appends write the column
+    files first and then replace the partition index, so readers (in any worker) only ever
+    see whole hours. Partitions are mapped read-only and shared by queries until they change.
+    """
+
+    def __init__(self, archive_dir=ARCHIVE_DIR, cache=None):
+        self.archive_dir = archive_dir
+        self.cache = cache if cache is not None else SharedCache.MemoryBackend()
+        self._lock = threading.Lock()
+        self._partitions = OrderedDict()
+
+    def _partition_path(self, name):
+        return os.path.join(self.archive_dir, name)
+
+    def partition(self, name):
+        """Mapped partition for a day, reopened when its index has changed since it was mapped"""
+        path = self._partition_path(name)
+        try:
+            modified = os.stat(os.path.join(path, INDEX_FILE)).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._partitions.get(name)
+            if cached is not None and cached[0] == modified:
+                self._partitions.move_to_end(name)
+                return cached[1]
+        partition = Partition(path)
+        with self._lock:
+            self._partitions[name] = (modified, partition)
+            while len(self._partitions) > MAX_OPEN_PARTITIONS:
+                self._partitions.popitem(last=False)
+        return partition
+
+    def has(self, key):
+        partition = self.partition(partition_name(key))
+        return partition is not None and key in partition.hours
+
+    def append(self, key, snapshot):
+        """Archive the valid rows of a snapshot under its absolute hour; returns False if it was already there"""
+        name = partition_name(key)
+        path = self._partition_path(name)
+        owner = self.cache.acquire_lock(f'archive:{name}', LOCK_LEASE)
+        if owner is None:
+            return False  # Another worker is appending to this day; the hour is retried on the next refresh
+        try:
+            partition = Partition(path)
+            if key in partition.hours:
+                return False
+            rows = snapshot.valid_indices()
+            order = rows[np.argsort(snapshot.lon[rows], kind='stable')]
+            columns = {'lat': snapshot.lat[order], 'lon': snapshot.lon[order], 'alt': snapshot.alt[order], 'row': order}
+            os.makedirs(path, exist_ok=True)
+            for column, dtype in COLUMNS.items():
+                with open(os.path.join(path, f"{column}.bin"), 'ab') as f:
+                    f.truncate(partition.rows * np.dtype(dtype).itemsize)  # Drop rows of an append that never committed
+                    f.write(np.ascontiguousarray(columns[column], dtype=dtype).tobytes())
+            bounds = ([float(columns['lat'].min()), float(columns['lat'].max()),
+                       float(columns['lon'].min()), float(columns['lon'].max())] if len(order) else [0.0, -1.0, 0.0, -1.0])
+            hours = dict(partition.hours)
+            hours[key] = [partition.rows, len(order)] + bounds
+            index_path = os.path.join(path, INDEX_FILE)
+            tmp_path = f"{index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'hours': {str(k): v for k, v in sorted(hours.items())}}, f)
+            os.replace(tmp_path, index_path)
+            return True
+        finally:
+            self.cache.release_lock(f'archive:{name}', owner)
+
+    def append_settled(self, snapshots, mutable_hours):
+        """Archive snapshots (keyed by hours ago) that are old enough not to change upstream any more"""
+        for hour, snapshot in snapshots.items():
+            if hour >= mutable_hours and snapshot.key is not None and not self.has(snapshot.key):
+                try:
+                    self.append(snapshot.key, snapshot)
+                except OSError as e:
+                    print(f"Could not archive snapshot {snapshot.key}: {e}")
+
+    def query(self, start_key, end_key, bbox=None):
+        """Yield (absolute hour, columns) for archived hours in [start_key, end_key], oldest first"""
+        for name in self.partition_names(start_key - start_key % 24, end_key):
+            partition = self.partition(name)
+            if partition is None:
+                continue
+            for key in sorted(k for k in partition.hours if start_key <= k <= end_key):
+                columns = partition.query(key, bbox)
+                if columns is not None and len(columns['lat']):
+                    yield key, columns
+
+    def partition_names(self, start_key, end_key):
+        """Days that have a partition on disk and start within [start_key, end_key], oldest first"""
+        try:
+            entries = os.listdir(self.archive_dir)
+        except OSError:
+            return []
+        names = []
+        for name in entries:
+            try:
+                day = datetime.strptime(name, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+            except ValueError:
+                continue
+            if start_key <= int(day.timestamp()) // 3600 <= end_key:
+                names.append(name)
+        return sorted(names)
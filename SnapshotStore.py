@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import SharedCache
+from Snapshot import Snapshot
+
+CACHE_DIR = os.environ.get('WINDBORNE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot_cache'))
+MUTABLE_HOURS = int(os.environ.get('WINDBORNE_MUTABLE_HOURS', 1))  # Newest hours that can still change upstream
+RETAIN_HOURS = 24  # Snapshots older than the upstream window are pruned
+VALIDATORS_FILE = 'validators.json'
+
+
+def current_hour_key():
+    """Absolute hour number (hours since the epoch) for the current clock time"""
+    return int(time.time() // 3600)
+
+
+def hour_key_from_http_date(value):
+    """Convert a Last-Modified header into an absolute hour number, or None if it cannot be parsed"""
+    if not value:
+        return None
+    try:
+        return int(parsedate_to_datetime(value).timestamp() // 3600)
+    except (TypeError, ValueError):
+        return None
+
+
+class SnapshotStore:
+    """Parsed hourly snapshots kept in the shared cache and on disk, keyed by absolute upstream hour.
+
+    Upstream files are addressed by hours ago (00.json is the latest), so the same snapshot
+    moves to a new file every hour. Storing it under its absolute hour means an hour that has
+    already been downloaded never needs to be fetched again, only the newest ones are revalidated.
+    The cache backend makes snapshots and validators visible to every worker; the files on
+    disk survive restarts.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, mutable_hours=MUTABLE_HOURS, cache=None):
+        self.cache_dir = cache_dir
+        self.mutable_hours = max(1, mutable_hours)
+        self.cache = cache if cache is not None else SharedCache.MemoryBackend()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _write_atomic(self, path, write):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    def _validators(self):
+        """{'anchor_key', 'hours': {hours ago: {'etag', 'last_modified', 'key'}}}"""
+        item = self.cache.get('snapshot:validators')
+        if item is not None:
+            return item[0]
+        try:
+            with open(os.path.join(self.cache_dir, VALIDATORS_FILE)) as f:
+                saved = json.load(f)
+            state = {'anchor_key': saved.get('anchor_key'),
+                     'hours': {int(hour): v for hour, v in saved.get('hours', {}).items()}}
+        except (OSError, ValueError):
+            state = {'anchor_key': None, 'hours': {}}
+        self.cache.set('snapshot:validators', state)
+        return state
+
+    @property
+    def anchor_key(self):
+        """Absolute hour of 00.json as of the last revalidation"""
+        return self._validators()['anchor_key']
+
+    def get_validators(self, hour):
+        """Return the validators remembered for an hourly file, or an empty dict"""
+        return dict(self._validators()['hours'].get(hour, {}))
+
+    def set_validators(self, hour, etag, last_modified, key):
+        with self._lock:
+            current = self._validators()
+            state = {'anchor_key': key if hour == 0 else current['anchor_key'], 'hours': dict(current['hours'])}
+            state['hours'][hour] = {'etag': etag, 'last_modified': last_modified, 'key': key}
+            self.cache.set('snapshot:validators', state)
+        payload = json.dumps(state).encode()
+        try:
+            self._write_atomic(os.path.join(self.cache_dir, VALIDATORS_FILE), lambda f: f.write(payload))
+        except OSError as e:
+            print(f"Could not persist snapshot validators: {e}")
+
+    def load(self, key):
+        """Return the snapshot stored for an absolute hour, reading it from disk if needed"""
+        item = self.cache.get(f'snapshot:{key}')
+        if item is not None:
+            return item[0]
+        try:
+            snapshot = Snapshot.load(self._path(key))
+        except (OSError, ValueError, KeyError):
+            return None
+        self.cache.set(f'snapshot:{key}', snapshot, ttl=RETAIN_HOURS * 3600)
+        return snapshot
+
+    def save(self, key, snapshot):
+        """Store a parsed snapshot under its absolute hour, in the cache and on disk"""
+        snapshot.key = key
+        self.cache.set(f'snapshot:{key}', snapshot, ttl=RETAIN_HOURS * 3600)
+        try:
+            self._write_atomic(self._path(key), snapshot.save)
+        except OSError as e:
+            print(f"Could not persist snapshot {key}: {e}")
+
+    def prune(self):
+        """Drop snapshot files that have fallen out of the upstream window (cached copies expire on their own)"""
+        anchor_key = self.anchor_key
+        if anchor_key is None:
+            return
+        oldest = anchor_key - RETAIN_HOURS
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            if ext == '.npz' and stem.lstrip('-').isdigit() and int(stem) <= oldest:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
@@ -0,0 +1,76 @@
+import numpy as np
+import Geodesy
+
+# Cell coordinates are packed 21 bits per axis into one int64 key
+_BIAS = 1 << 20
+_OFFSETS = np.array([(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)], dtype=np.int64)
+
+
+def _pack(cells):
+    cells = cells + _BIAS
+    return (cells[:, 0] << 42) | (cells[:, 1] << 21) | cells[:, 2]
+
+
+class SphereGrid:
+    """Fixed-radius neighbour index: a uniform grid of cubes over unit-sphere coordinates.
+
+    Points that are close on the globe are close in xyz as well, so unlike a lat/lon grid
+    there are no special cases at the poles or across the antimeridian. Cells are as wide
+    as the chord of the search radius, so every match lies in one of the 27 cells around
+    the query point.
+    """
+
+    def __init__(self, lat, lon, radius_km):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.radius_km = radius_km
+        self.cell_size = max(float(Geodesy.chord_length(radius_km)), 1e-6)
+
+        keys = _pack(self._cells(self.lat, self.lon))
+        self.order = np.argsort(keys, kind='stable')
+        self.keys, self.starts, self.counts = np.unique(keys[self.order], return_index=True, return_counts=True)
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _cells(self, lat, lon):
+        return np.floor(Geodesy.to_unit_vectors(lat, lon) / self.cell_size).astype(np.int64)
+
+    def candidates(self, lat, lon):
+        """Pairs (query index, point index) that share a neighbourhood, before any distance check"""
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        if len(lat) == 0 or len(self.keys) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        cells = self._cells(lat, lon)
+        query_parts, point_parts = [], []
+        for offset in _OFFSETS:
+            keys = _pack(cells + offset)
+            pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+            hit = np.flatnonzero(self.keys[pos] == keys)
+            if len(hit) == 0:
+                continue
+            counts = self.counts[pos[hit]]
+            starts = self.starts[pos[hit]]
+            # Expand each hit cell into one pair per point stored in it
+            first = np.repeat(np.cumsum(counts) - counts, counts)
+            within = np.arange(counts.sum()) - first
+            query_parts.append(np.repeat(hit, counts))
+            point_parts.append(self.order[np.repeat(starts, counts) + within])
+
+        if not query_parts:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(query_parts), np.concatenate(point_parts)
+
+    def within(self, lat, lon, radius_km=None):
+        """Pairs closer than radius_km (default: the index radius) with their distances in km"""
+        radius_km = self.radius_km if radius_km is None else min(radius_km, self.radius_km)
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        query, point = self.candidates(lat, lon)
+        distances = Geodesy.haversine_km(lat[query], lon[query], self.lat[point], self.lon[point])
+        close = distances < radius_km
+        return query[close], point[close], distances[close]
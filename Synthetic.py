@@ -0,0 +1,87 @@
+"""Seeded synthetic Windborne snapshots and OpenSky states, for the benchmarks and the replay stand-in.
+
+Balloons start uniformly between 70S and 70N and drift with a steady per-balloon wind
+plus hourly jitter, so consecutive hours associate the way real files do. Each hourly
+body uses one of the upstream's malformed layouts in turn and carries NaN rows.
+"""
+import json
+import random
+
+import numpy as np
+
+# Layouts seen upstream; every hour uses the next one in this order
+FORMATS = ('brackets', 'missing_opening', 'missing_both', 'truncated')
+BALLOON_ALTITUDE_M = 20000  # AirTrafficData assumes this for every balloon
+
+
+def balloon_positions(balloons, hours, seed=1):
+    """(lat, lon, alt) arrays of shape (hours, balloons); row 0 is the latest hour"""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-70, 70, balloons)
+    lon = rng.uniform(-180, 180, balloons)
+    alt = rng.uniform(5, 25, balloons)
+    wind = rng.normal(0, [0.15, 0.5], (balloons, 2))  # Degrees per hour, mostly zonal
+    lats, lons, alts = [], [], []
+    for _ in range(hours):
+        lats.append(lat.copy())
+        lons.append(lon.copy())
+        alts.append(alt.copy())
+        # Step back one hour
+        lat = np.clip(lat - wind[:, 0] - rng.normal(0, 0.05, balloons), -89, 89)
+        lon = (lon - wind[:, 1] - rng.normal(0, 0.1, balloons) + 180) % 360 - 180
+        alt = np.clip(alt + rng.normal(0, 0.3, balloons), 0, 30)
+    return np.array(lats), np.array(lons), np.array(alts)
+
+
+def apply_layout(body, layout):
+    """Re-serve a well-formed '[[...],...]' body in one of the upstream's malformed layouts"""
+    body = body.strip()
+    inner = body[1:-1] if body.startswith('[') and body.endswith(']') else body
+    if layout == 'brackets':
+        return '[' + inner + ']'
+    if layout == 'missing_opening':
+        return inner + ']'
+    if layout == 'missing_both':
+        return inner
+    return '[' + inner[:len(inner) * 49 // 50]  # Cut off mid-record near the end
+
+
+def hour_body(lat, lon, alt, layout, nan_rate=0.01, seed=1):
+    """One hourly file as the upstream might serve it"""
+    rng = random.Random(seed)
+    rows = []
+    for record in zip(lat.tolist(), lon.tolist(), alt.tolist()):
+        if rng.random() < nan_rate:
+            record = list(record)
+            record[rng.randrange(3)] = float('nan')
+        rows.append('[' + ','.join('NaN' if v != v else repr(v) for v in record) + ']')
+    return apply_layout('[' + ','.join(rows) + ']', layout)
+
+
+def make_hours(balloons, hours, seed=1, nan_rate=0.01):
+    """{hours ago: body string} for a constellation of the given size"""
+    lat, lon, alt = balloon_positions(balloons, hours, seed)
+    return {hour: hour_body(lat[hour], lon[hour], alt[hour], FORMATS[hour % len(FORMATS)], nan_rate, seed + hour)
+            for hour in range(hours)}
+
+
+def make_states(aircraft, near_lat=(), near_lon=(), near_fraction=0.1, seed=1):
+    """OpenSky /states/all vectors; near_fraction of them fly close to the given positions at balloon altitude"""
+    rng = random.Random(seed)
+    near = list(zip(near_lat, near_lon))
+    states = []
+    for i in range(aircraft):
+        if near and rng.random() < near_fraction:
+            lat, lon = rng.choice(near)
+            lat, lon = lat + rng.uniform(-0.05, 0.05), lon + rng.uniform(-0.05, 0.05)
+            altitude = BALLOON_ALTITUDE_M + rng.uniform(-400, 400)
+        else:
+            lat, lon = rng.uniform(-60, 70), rng.uniform(-180, 180)
+            altitude = rng.uniform(300, 13000)
+        on_ground = rng.random() < 0.05
+        baro = None if on_ground or rng.random() < 0.02 else altitude
+        states.append([f"{i:06x}", f"CS{i:<6}", "Country", 1700000000 + rng.randrange(60), 1700000000,
+                       lon, lat, baro, on_ground, rng.uniform(0, 260), rng.uniform(0, 360),
+                       rng.uniform(-10, 10), None, None if on_ground else altitude + 50, "1000", False, 0])
+    # Round-trip through JSON so values have the types requests would hand back
+    return json.loads(json.dumps(states))
@@ -0,0 +1,191 @@
+import json
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+from Responses import EncodedPayload
+
+LOD_ZOOMS = (2, 4, 6, 8, 10)  # Zoom levels paths are simplified for; closer in, paths are served whole
+TOLERANCE_PX = 1.0  # Simplification tolerance in screen pixels at the level's zoom
+SEGMENT_PAD_DEG = 3.0  # One hourly step is at most ~300 km, so tiles are padded to catch segments crossing them
+MAX_TILES = 64
+MAX_ZOOM = 22  # Deepest tile zoom; viewports asking for more are served from this one
+MAX_CACHED_RESPONSES = 64
+MAX_CACHED_TILES = 1024
+MAX_MERCATOR_LAT = 85.0511
+
+
+def pixel_degrees(zoom):
+    """Width of one 256px-tile screen pixel in degrees of longitude at a zoom level"""
+    return 360 / (256 * 2 ** zoom)
+
+
+def _mercator_y(lat):
+    """Web Mercator y in the same units as longitude degrees, so distances match what the map draws"""
+    lat = np.radians(np.clip(lat, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    return np.degrees(np.log(np.tan(np.pi / 4 + lat / 2)))
+
+
+def significance(lat, lon):
+    """Douglas-Peucker significance of each point of a path.
+
+    A point survives simplification at tolerance t exactly when its significance is above
+    t, so one pass serves every zoom level. Endpoints are always kept. Paths are at most a
+    day of hourly points, so plain floats are faster here than NumPy slices.
+    """
+    n = len(lat)
+    result = [math.inf] * n
+    if n <= 2:
+        return np.array(result)
+    x = np.degrees(np.unwrap(np.radians(lon))).tolist()  # Keep paths continuous across the antimeridian
+    y = _mercator_y(np.asarray(lat, dtype=float)).tolist()
+    stack = [(0, n - 1, math.inf)]
+    while stack:
+        first, last, parent = stack.pop()
+        if last - first < 2:
+            continue
+        x0, y0 = x[first], y[first]
+        dx, dy = x[last] - x0, y[last] - y0
+        length = math.hypot(dx, dy)
+        best, split = -1.0, first + 1
+        for i in range(first + 1, last):
+            if length == 0:
+                distance = math.hypot(x[i] - x0, y[i] - y0)
+            else:
+                distance = abs((x[i] - x0) * dy - (y[i] - y0) * dx) / length
+            if distance > best:
+                best, split = distance, i
+        # A point can never outlive the split that made it a segment end
+        result[split] = min(best, parent)
+        stack.append((first, split, result[split]))
+        stack.append((split, last, result[split]))
+    return np.array(result)
+
+
+def lod_level(zoom):
+    """Index into LOD_ZOOMS for a map zoom, or None when paths should not be simplified"""
+    for index, level in enumerate(LOD_ZOOMS):
+        if zoom <= level:
+            return index
+    return None
+
+
+def lon_ranges(west, east):
+    """Split a viewport's longitude span into ranges within [-180, 180]; west > east crosses the antimeridian"""
+    span = east - west
+    if span < 0:
+        span += 360
+    if span >= 360:
+        return [(-180.0, 180.0)]
+    west = (west + 180) % 360 - 180
+    east = west + span
+    if east <= 180:
+        return [(west, east)]
+    return [(west, 180.0), (-180.0, east - 360)]
+
+
+class TrackTiles:
+    """Viewport queries over one generation of balloon tracks, with paths pre-simplified per zoom level.
+
+    Every path point is indexed by longitude, so a tile lookup is a binary search plus a
+    latitude mask. The most recently used tiles are cached by (tile zoom, x, y), and every track's JSON is encoded
+    once per level, so a response is a join of cached fragments.
+    """
+
+    def __init__(self, balloons_data, version=None):
+        self.version = version
+        self._lock = threading.Lock()
+        self._tiles = OrderedDict()
+        self._responses = OrderedDict()
+
+        lats, lons, owners = [], [], []
+        self._fragments = [[] for _ in range(len(LOD_ZOOMS) + 1)]
+        for index, balloon in enumerate(balloons_data):
+            path = np.asarray(balloon['path'], dtype=float).reshape(-1, 2)
+            lats.append(path[:, 0])
+            lons.append(path[:, 1])
+            owners.append(np.full(len(path), index))
+            weights = significance(path[:, 0], path[:, 1])
+            head = json.dumps({'id': balloon['id'], 'points': len(path),
+                               'velocity': balloon['velocities'][0] if balloon['velocities'] else [0, 0]},
+                              separators=(',', ':'))[:-1]
+            # JSON floats are Python reprs, so each point is encoded once and shared by every level
+            points = [f"[{lat!r},{lon!r}]" for lat, lon in balloon['path']]
+            fragment, kept = None, None
+            for level, zoom in enumerate(LOD_ZOOMS + (None,)):
+                keep = np.flatnonzero(weights > TOLERANCE_PX * pixel_degrees(zoom)) if zoom is not None else range(len(points))
+                if kept is None or len(keep) != len(kept):
+                    fragment = f'{head},"path":[{",".join(points[i] for i in keep)}]}}'.encode()
+                    kept = keep
+                self._fragments[level].append(fragment)
+
+        lat = np.concatenate(lats) if lats else np.empty(0)
+        lon = np.concatenate(lons) if lons else np.empty(0)
+        owner = np.concatenate(owners) if owners else np.empty(0, dtype=np.int64)
+        order = np.argsort(lon, kind='stable')
+        self._lat, self._lon, self._owner = lat[order], lon[order], owner[order]
+
+    def _tile_tracks(self, tile_zoom, x, y):
+        """Indices of tracks with a point in (or a step through) one tile"""
+        key = (tile_zoom, x, y)
+        with self._lock:
+            cached = self._tiles.get(key)
+            if cached is not None:
+                self._tiles.move_to_end(key)
+                return cached
+        span = 360 / 2 ** tile_zoom
+        west, south = x * span - 180, y * span - 90
+        found = []
+        for low, high in lon_ranges(west - SEGMENT_PAD_DEG, west + span + SEGMENT_PAD_DEG):
+            start = np.searchsorted(self._lon, low, side='left')
+            stop = np.searchsorted(self._lon, high, side='right')
+            inside = ((self._lat[start:stop] >= south - SEGMENT_PAD_DEG)
+                      & (self._lat[start:stop] <= south + span + SEGMENT_PAD_DEG))
+            found.append(self._owner[start:stop][inside])
+        tracks = np.unique(np.concatenate(found))
+        with self._lock:
+            self._tiles[key] = tracks
+            while len(self._tiles) > MAX_CACHED_TILES:
+                self._tiles.popitem(last=False)
+        return tracks
+
+    def _tiles_for(self, west, south, east, north, zoom):
+        """Tile zoom and (x, y) tiles covering a viewport, coarsening until there are at most MAX_TILES"""
+        south, north = max(south, -90.0), min(north, 90.0)
+        tile_zoom = min(max(0, int(zoom)), MAX_ZOOM) if math.isfinite(zoom) else 0
+        while True:
+            count = 2 ** tile_zoom
+            span = 360 / count
+            rows = range(max(0, math.floor((south + 90) / span)), min(max(1, count // 2), math.floor((north + 90) / span) + 1))
+            spans = [range(math.floor((low + 180) / span), min(count, math.floor((high + 180) / span) + 1))
+                     for low, high in lon_ranges(west, east)]
+            # Count the tiles from the range lengths first, so a deep zoom never builds huge lists
+            if len(rows) * sum(len(columns) for columns in spans) <= MAX_TILES or tile_zoom == 0:
+                columns = sorted(set().union(*spans))
+                return tile_zoom, [(x, y) for x in columns for y in rows]
+            tile_zoom -= 1
+
+    def query(self, west, south, east, north, zoom):
+        """EncodedPayload with the tracks crossing the viewport, simplified for the zoom"""
+        level = lod_level(zoom)
+        tile_zoom, tiles = self._tiles_for(west, south, east, north, zoom)
+        key = (level, tile_zoom, tuple(tiles))
+        with self._lock:
+            if key in self._responses:
+                self._responses.move_to_end(key)
+                return self._responses[key]
+
+        tracks = np.unique(np.concatenate([self._tile_tracks(tile_zoom, x, y) for x, y in tiles] or [np.empty(0, dtype=np.int64)]))
+        fragments = self._fragments[-1 if level is None else level]
+        body = b''.join([
+            b'{"version":', json.dumps(self.version).encode(),
+            b',"lod_zoom":', json.dumps(None if level is None else LOD_ZOOMS[level]).encode(),
+            b',"tolerance_deg":', json.dumps(None if level is None else TOLERANCE_PX * pixel_degrees(LOD_ZOOMS[level])).encode(),
+            b',"balloons":[', b','.join(fragments[i] for i in tracks.tolist()), b']}'
+        ])
+        payload = EncodedPayload(None, body=body)
+        with self._lock:
+            self._responses[key] = payload
+            while len(self._responses) > MAX_CACHED_RESPONSES:
+                self._responses.popitem(last=False)
+        return payload
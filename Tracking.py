@@ -0,0 +1,372 @@
+import os
+import threading
+import numpy as np
+import Geodesy
+from Snapshot import Snapshot
+from SpatialIndex import SphereGrid
+
+GATE_KM = 300  # Furthest a balloon is expected to drift in one hour
+METHOD = os.environ.get('WINDBORNE_TRACKING', 'optimal')  # 'optimal' or 'greedy'
+
+
+def _assign_greedy(query, point, distances):
+    """Each head in order takes its nearest free candidate, as the original tracker did"""
+    order = np.lexsort((distances, query))
+    taken = set()
+    matched_heads, matched_points = [], []
+    last_head = -1
+    for head, candidate in zip(query[order].tolist(), point[order].tolist()):
+        if head == last_head or candidate in taken:
+            continue
+        last_head = head
+        taken.add(candidate)
+        matched_heads.append(head)
+        matched_points.append(candidate)
+    return np.array(matched_heads, dtype=np.int64), np.array(matched_points, dtype=np.int64)
+
+
+def _hungarian(cost):
+    """Minimum-cost assignment for a dense cost matrix with rows <= columns; returns the column per row"""
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)  # p[j]: row (1-based) assigned to column j, 0 if free
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        # Flip the augmenting path back to the root
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    assignment = np.full(n, -1, dtype=np.int64)
+    columns = np.flatnonzero(p[1:])
+    assignment[p[1:][columns] - 1] = columns
+    return assignment
+
+
+def _components(query, point):
+    """Label connected components of the head/candidate graph by propagating minimum labels"""
+    heads, query = np.unique(query, return_inverse=True)
+    points, point = np.unique(point, return_inverse=True)
+    head_label = np.arange(len(heads))
+    point_label = np.full(len(points), len(heads))
+    while True:
+        np.minimum.at(point_label, point, head_label[query])
+        updated = head_label.copy()
+        np.minimum.at(updated, query, point_label[point])
+        if np.array_equal(updated, head_label):
+            return head_label[query]
+        head_label = updated
+
+
+def _assign_optimal(query, point, distances, gate_km):
+    """Globally minimise total distance, solving each independent cluster of candidates separately"""
+    matched_heads, matched_points = [], []
+    labels = _components(query, point)
+    order = np.argsort(labels, kind='stable')
+    query, point, distances = query[order], point[order], distances[order]
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+    for edges in np.split(np.arange(len(order)), bounds):
+        if len(edges) == 1:
+            matched_heads.append(int(query[edges[0]]))
+            matched_points.append(int(point[edges[0]]))
+            continue
+        heads, head_index = np.unique(query[edges], return_inverse=True)
+        points, point_index = np.unique(point[edges], return_inverse=True)
+        if len(heads) == 1 or len(points) == 1:
+            # Trivial cluster: the single closest pair is optimal
+            best = np.argmin(distances[edges])
+            matched_heads.append(int(heads[head_index[best]]))
+            matched_points.append(int(points[point_index[best]]))
+            continue
+
+        # Pairs outside the gate cost as much as leaving the head unmatched
+        cost = np.full((len(heads), len(points)), float(gate_km))
+        cost[head_index, point_index] = distances[edges]
+        transpose = len(heads) > len(points)
+        assignment = _hungarian(cost.T if transpose else cost)
+        rows = np.flatnonzero(assignment >= 0)
+        if transpose:
+            head_rows, point_rows = assignment[rows], rows
+        else:
+            head_rows, point_rows = rows, assignment[rows]
+        keep = cost[head_rows, point_rows] < gate_km
+        matched_heads.extend(heads[head_rows[keep]].tolist())
+        matched_points.extend(points[point_rows[keep]].tolist())
+    return np.array(matched_heads, dtype=np.int64), np.array(matched_points, dtype=np.int64)
+
+
+def associate(head_lat, head_lon, lat, lon, gate_km=GATE_KM, method=METHOD):
+    """Match track heads to the next hour's balloons; returns (head indices, balloon indices)"""
+    grid = SphereGrid(lat, lon, gate_km)
+    query, point, distances = grid.within(head_lat, head_lon)
+    if len(query) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    if method == 'greedy':
+        return _assign_greedy(query, point, distances)
+    return _assign_optimal(query, point, distances, gate_km)
+
+
+class Track:
+    """One balloon's recent history, newest point first, in the shape /api/data serves"""
+
+    __slots__ = ('id', 'keys', 'path', 'alts', 'velocities')
+
+    def __init__(self, track_id, key, lat, lon, alt):
+        self.id = track_id
+        self.keys = [key]
+        self.path = [[lat, lon]]
+        self.alts = [alt]
+        self.velocities = [[0, 0]]
+
+    def extend(self, key, lat, lon, alt, speed, direction):
+        self.keys.insert(0, key)
+        self.path.insert(0, [lat, lon])
+        self.alts.insert(0, alt)
+        self.velocities.insert(0, [speed, direction])
+
+    def retract(self):
+        """Drop the newest point, e.g. when that hour is re-ingested with new data"""
+        for points in (self.keys, self.path, self.alts, self.velocities):
+            points.pop(0)
+
+    def age_out(self, oldest_key):
+        """Drop points older than oldest_key; returns True if anything was removed"""
+        removed = False
+        while self.keys and self.keys[-1] < oldest_key:
+            for points in (self.keys, self.path, self.alts, self.velocities):
+                points.pop()
+            removed = True
+        if removed and self.velocities:
+            self.velocities[-1] = [0, 0]
+        return removed
+
+
+class TrackState:
+    """Balloon tracks kept between refreshes and extended one hourly Snapshot at a time.
+
+    Snapshots are identified by their absolute hour key, so a refresh only associates the
+    hours that were not seen before against the current track heads, then drops points that
+    have left the window. Track ids are assigned once and stay stable across refreshes.
+    """
+
+    def __init__(self, window=24, gate_km=GATE_KM, method=METHOD):
+        self.window = window
+        self.gate_km = gate_km
+        self.method = method
+        self.version = 0  # Bumped whenever the tracks change
+        # Never rewound, not even by a reset, so an id always names the same balloon
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def __getstate__(self):
+        # Shared between workers through the cache and sent to the compute pool, so the tracks
+        # travel as flat columns rather than nested lists; the lock is per process
+        state = self.__dict__.copy()
+        del state['_lock']
+        tracks = state.pop('tracks')
+        state['track_columns'] = {
+            'id': np.array([t.id for t in tracks], dtype=np.int64),
+            'length': np.array([len(t.keys) for t in tracks], dtype=np.int64),
+            'key': np.array([k for t in tracks for k in t.keys], dtype=np.int64),
+            'lat': np.array([p[0] for t in tracks for p in t.path], dtype=float),
+            'lon': np.array([p[1] for t in tracks for p in t.path], dtype=float),
+            'alt': np.array([a for t in tracks for a in t.alts], dtype=float),
+            'speed': np.array([v[0] for t in tracks for v in t.velocities], dtype=float),
+            'direction': np.array([v[1] for t in tracks for v in t.velocities], dtype=float),
+        }
+        return state
+
+    def __setstate__(self, state):
+        columns = state.pop('track_columns', None)
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        if columns is None:
+            return  # Pickled before tracks were packed
+        keys, lat, lon, alt = (columns[name].tolist() for name in ('key', 'lat', 'lon', 'alt'))
+        speed, direction = columns['speed'].tolist(), columns['direction'].tolist()
+        self.tracks = []
+        start = 0
+        for track_id, length in zip(columns['id'].tolist(), columns['length'].tolist()):
+            end = start + length
+            track = Track.__new__(Track)
+            track.id = track_id
+            track.keys = keys[start:end]
+            track.path = [[la, lo] for la, lo in zip(lat[start:end], lon[start:end])]
+            track.alts = alt[start:end]
+            # The oldest point never has a velocity; keep it as the [0, 0] the payload always had
+            track.velocities = [[sp, di] for sp, di in zip(speed[start:end - 1], direction[start:end - 1])] + [[0, 0]]
+            self.tracks.append(track)
+            start = end
+
+    def _reset(self):
+        self.tracks = []
+        self.latest_key = None
+        # key -> lat column of the Snapshot ingested for that hour, to notice replaced data
+        self._ingested = {}
+        self._refresh_heads()
+
+    def _refresh_heads(self):
+        self._head_lat = np.array([t.path[0][0] for t in self.tracks], dtype=float)
+        self._head_lon = np.array([t.path[0][1] for t in self.tracks], dtype=float)
+        self._head_alt = np.array([t.alts[0] for t in self.tracks], dtype=float)
+
+    def _new_track(self, key, lat, lon, alt):
+        track = Track(self._next_id, key, lat, lon, alt)
+        self._next_id += 1
+        return track
+
+    def _ingest(self, key, snapshot):
+        rows = snapshot.valid_indices()
+        lat = snapshot.lat[rows].astype(float)
+        lon = snapshot.lon[rows].astype(float)
+        alt = snapshot.alt[rows].astype(float)
+
+        heads, matches = associate(self._head_lat, self._head_lon, lat, lon, self.gate_km, self.method)
+        if len(heads):
+            speeds, directions = Geodesy.distances_and_bearings(self._head_lat[heads], self._head_lon[heads],
+                                                                lat[matches], lon[matches])
+            for head, match, speed, direction in zip(heads.tolist(), matches.tolist(), speeds, directions):
+                self.tracks[head].extend(key, float(lat[match]), float(lon[match]), float(alt[match]), speed, direction)
+
+        # The remaining unmatched balloons are new tracks
+        unmatched = np.ones(len(rows), dtype=bool)
+        unmatched[matches] = False
+        for index in np.flatnonzero(unmatched).tolist():
+            self.tracks.append(self._new_track(key, float(lat[index]), float(lon[index]), float(alt[index])))
+
+        self._ingested[key] = snapshot.lat
+        self.latest_key = key if self.latest_key is None else max(self.latest_key, key)
+        self._refresh_heads()
+
+    def _retract(self, key):
+        for track in self.tracks:
+            if track.keys[0] == key:
+                track.retract()
+        self.tracks = [t for t in self.tracks if t.keys]
+        del self._ingested[key]
+        self._refresh_heads()
+
+    def _age_out(self):
+        oldest_key = self.latest_key - self.window + 1
+        removed = False
+        for track in self.tracks:
+            removed |= track.age_out(oldest_key)
+        if removed:
+            self.tracks = [t for t in self.tracks if t.keys]
+            self._refresh_heads()
+        for key in [k for k in self._ingested if k < oldest_key]:
+            del self._ingested[key]
+        return removed
+
+    def _behind(self, newest):
+        """True if the newest hour offered is older than the heads but still inside the window.
+
+        That happens when the latest file fails to fetch for a refresh; the tracks already hold
+        everything it could add, so they are kept rather than rebuilt under new ids.
+        """
+        return self.latest_key is not None and 0 < self.latest_key - newest < self.window
+
+    @staticmethod
+    def _by_key(data_24h):
+        """{absolute hour: Snapshot}; snapshots without one are placed relative to the newest"""
+        anchor = max((s.key + h for h, s in data_24h.items() if s.key is not None), default=0)
+        return {s.key if s.key is not None else anchor - h: s for h, s in data_24h.items()}
+
+    def needs_update(self, data_24h):
+        """True if update() would change anything, so callers can skip shipping the state elsewhere"""
+        if not data_24h:
+            return False
+        snapshots = self._by_key(data_24h)
+        with self._lock:
+            if self._behind(max(snapshots)):
+                return False
+            if self.latest_key is None or max(snapshots) != self.latest_key:
+                return True
+            # Hours behind the heads are never re-associated; only the newest one can change
+            ingested = self._ingested.get(self.latest_key)
+            latest = snapshots[self.latest_key].lat
+            return ingested is None or not (ingested is latest or np.array_equal(ingested, latest, equal_nan=True))
+
+    def update(self, data_24h):
+        """Bring the tracks up to date with {hours ago: Snapshot}; returns True if anything changed"""
+        if not data_24h:
+            return False
+        snapshots = self._by_key(data_24h)
+
+        with self._lock:
+            newest = max(snapshots)
+            if self._behind(newest):
+                return False
+            if self.latest_key is None or abs(newest - self.latest_key) >= self.window:
+                self._reset()
+
+            changed = False
+            for key in sorted(snapshots):
+                snapshot = snapshots[key]
+                if self.latest_key is not None and key < self.latest_key and key not in self._ingested:
+                    # An older hour that was missing earlier cannot be slotted in behind the heads
+                    continue
+                if key in self._ingested:
+                    # Only the newest hour can still change upstream and be re-associated
+                    ingested = self._ingested[key]
+                    if key != self.latest_key or ingested is snapshot.lat or np.array_equal(ingested, snapshot.lat, equal_nan=True):
+                        continue
+                    self._retract(key)
+                self._ingest(key, snapshot)
+                changed = True
+
+            if self.latest_key is not None:
+                changed |= self._age_out()
+            if changed:
+                self.version += 1
+            return changed
+
+    def balloons(self):
+        """Balloon records for /api/data and a Snapshot of each balloon's current position"""
+        with self._lock:
+            balloons_data = [{
+                "id": track.id,
+                "path": list(track.path),
+                "velocities": list(track.velocities)
+            } for track in self.tracks]
+            heads = Snapshot(self._head_lat.copy(), self._head_lon.copy(), self._head_alt.copy(),
+                             key=self.latest_key)
+        return balloons_data, heads
+
+
+def track_balloons(data_24h, gate_km=GATE_KM, method=METHOD):
+    """Build tracks for the given hourly Snapshots from scratch"""
+    state = TrackState(window=max(data_24h, default=0) + 1, gate_km=gate_km, method=method)
+    state.update(data_24h)
+    return state
+
+
+def update_state(state, data_24h):
+    """state.update(data_24h) as a compute-pool task; returns (state, changed)"""
+    changed = state.update(data_24h)
+    return state, changed
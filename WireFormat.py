@@ -0,0 +1,125 @@
+"""Compact binary encoding of the /api/data payload, decoded by static/js/main.js.
+
+Layout (little-endian, the byte order of every browser's typed arrays):
+
+    b'WBT1' | uint32 header length | header JSON | columns
+
+The header holds the small nested fields (insights, safety analysis, ...), the aircraft
+strings and, for every column, its dtype, byte offset and length. Offsets count from the
+first 8-byte boundary after the header, and every column starts on such a boundary, so
+the client can view them as typed arrays without copying.
+
+Track points are quantised to 1e-5 degrees (about a metre) and delta-encoded within each
+track, which keeps the int32 columns small once gzip is applied. Velocities and aircraft
+numbers are float32, with NaN standing in for null.
+"""
+import json
+import struct
+import numpy as np
+from AircraftBatch import AircraftBatch
+
+MEDIA_TYPE = 'application/x-windborne-tracks'
+MAGIC = b'WBT1'
+SCALE = 100000  # Coordinate units per degree
+ALIGN = 8
+
+# Aircraft fields sent as float32 columns and as flags; the rest of an OpenSky state is not used by the map
+AIRCRAFT_NUMBERS = ('latitude', 'longitude', 'altitude', 'geo_altitude', 'velocity', 'true_track', 'vertical_rate')
+AIRCRAFT_FLAGS = ('on_ground',)
+AIRCRAFT_STRINGS = ('icao24', 'callsign', 'origin_country')
+HEADER_FIELDS = ('version', 'insights', 'safety_analysis', 'data_quality', 'last_updated', 'air_traffic_enabled')
+
+
+def encode(data):
+    """Binary body for an /api/data payload dict"""
+    balloons = data['balloons']
+    lengths = np.array([len(b['path']) for b in balloons], dtype=np.int64)
+    offsets = np.zeros(len(balloons) + 1, dtype='<u4')
+    np.cumsum(lengths, out=offsets[1:])
+    points = np.array([p for b in balloons for p in b['path']], dtype=float).reshape(-1, 2)
+    velocities = np.array([v for b in balloons for v in b['velocities']], dtype=float).reshape(-1, 2)
+
+    # Absolute first point per track, then steps; deltas never cross track boundaries
+    quantised = np.rint(points * SCALE).astype(np.int64)
+    deltas = np.diff(quantised, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    starts = offsets[:-1][lengths > 0].astype(np.int64)
+    deltas[starts] = quantised[starts]
+
+    aircraft = AircraftBatch.coerce(data['aircraft'])
+    columns = {
+        'balloon_ids': np.array([b['id'] for b in balloons], dtype='<i4'),
+        'track_offsets': offsets,
+        'lat': deltas[:, 0].astype('<i4'),
+        'lon': deltas[:, 1].astype('<i4'),
+        'speed': velocities[:, 0].astype('<f4'),
+        'direction': velocities[:, 1].astype('<f4'),
+        'constellation': np.array(data['constellation'], dtype='<i4').reshape(-1),
+    }
+    for field in AIRCRAFT_NUMBERS:
+        columns[f'aircraft_{field}'] = aircraft.columns[field].astype('<f4')
+    for field in AIRCRAFT_FLAGS:
+        columns[f'aircraft_{field}'] = aircraft.columns[field].astype('u1')
+
+    header = {field: data.get(field) for field in HEADER_FIELDS}
+    header['scale'] = SCALE
+    header['aircraft_strings'] = {field: aircraft.columns[field].tolist() for field in AIRCRAFT_STRINGS}
+    header['columns'] = {}
+    position = 0
+    for name, column in columns.items():
+        header['columns'][name] = [column.dtype.str, position, len(column)]
+        position += _aligned(column.nbytes)
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+
+    start = _aligned(len(MAGIC) + 4 + len(header_bytes))
+    body = bytearray(start + position)
+    body[:len(MAGIC)] = MAGIC
+    body[len(MAGIC):len(MAGIC) + 4] = struct.pack('<I', len(header_bytes))
+    body[len(MAGIC) + 4:len(MAGIC) + 4 + len(header_bytes)] = header_bytes
+    for name, column in columns.items():
+        offset = start + header['columns'][name][1]
+        body[offset:offset + column.nbytes] = column.tobytes()
+    return bytes(body)
+
+
+def decode(body):
+    """Rebuild the payload dict from a binary body (coordinates rounded to the wire precision)"""
+    if body[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a Windborne tracks body")
+    header_length = struct.unpack_from('<I', body, len(MAGIC))[0]
+    header = json.loads(body[len(MAGIC) + 4:len(MAGIC) + 4 + header_length])
+    start = _aligned(len(MAGIC) + 4 + header_length)
+    columns = {name: np.frombuffer(body, dtype=dtype, count=count, offset=start + offset)
+               for name, (dtype, offset, count) in header['columns'].items()}
+
+    offsets = columns['track_offsets'].astype(np.int64)
+    lengths = np.diff(offsets)
+    # One running sum over all tracks, less what earlier tracks contributed
+    steps = np.column_stack((columns['lat'], columns['lon'])).astype(np.int64)
+    totals = np.cumsum(steps, axis=0)
+    before = np.vstack((np.zeros((1, 2), dtype=np.int64), totals))[offsets[:-1]]
+    path = ((totals - np.repeat(before, lengths, axis=0)) / header['scale']).tolist()
+    velocities = np.column_stack((columns['speed'], columns['direction'])).astype(float).tolist()
+    offsets = offsets.tolist()
+    balloons = [{'id': balloon_id, 'path': path[offsets[i]:offsets[i + 1]],
+                 'velocities': velocities[offsets[i]:offsets[i + 1]]}
+                for i, balloon_id in enumerate(columns['balloon_ids'].tolist())]
+
+    aircraft = []
+    for i in range(len(columns['aircraft_latitude'])):
+        record = {field: values[i] for field, values in header['aircraft_strings'].items()}
+        for field in AIRCRAFT_NUMBERS:
+            value = float(columns[f'aircraft_{field}'][i])
+            record[field] = None if value != value else value
+        for field in AIRCRAFT_FLAGS:
+            record[field] = bool(columns[f'aircraft_{field}'][i])
+        aircraft.append(record)
+
+    data = {field: header[field] for field in HEADER_FIELDS}
+    data['balloons'] = balloons
+    data['constellation'] = columns['constellation'].reshape(-1, 2).tolist()
+    data['aircraft'] = aircraft
+    return data
+
+
+def _aligned(size):
+    return -(-size // ALIGN) * ALIGN
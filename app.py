@@ -1,121 +1,102 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context, g
 import Data
 import AirTrafficData
+import Tracking
+import Constellation
+import ConflictPrediction
+import Refresher
+import SharedCache
+import Responses
+import Deltas
+import TrackTiles
+import WireFormat
+import Clustering
+import Metrics
+import ComputePool
 import math
 import os
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
 
 app = Flask(__name__)
 
 # Global cache for data
 data_cache = {
-    'balloons_data': None,
-    'aircraft_data': None,
-    'aircraft_cache_time': None,
-    'last_updated': None,
     'cache_duration': timedelta(minutes=5),  # Cache for 5 minutes
-    'aircraft_cache_duration': timedelta(minutes=2)  # Aircraft cache for 2 minutes
+    'refresh_ahead': timedelta(minutes=1)  # Start background refresh this long before expiry
 }
 
-# Add CORS headers for cross-origin requests
-@app.after_request
-def after_request(response):
-    response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-    return response
+# Datasets, aircraft and snapshots are shared by every worker when the backend allows it
+shared_cache = SharedCache.get_backend()
 
-def is_cache_valid():
-    """Check if cached data is still valid"""
-    if data_cache['last_updated'] is None:
-        return False
-    return datetime.now() - data_cache['last_updated'] < data_cache['cache_duration']
-
-def clear_cache():
-    """Clear the data cache"""
-    data_cache['balloons_data'] = None
-    data_cache['aircraft_data'] = None
-    data_cache['aircraft_cache_time'] = None
-    data_cache['last_updated'] = None
-
-def is_aircraft_cache_valid():
-    """Check if aircraft cache is still valid"""
-    if data_cache['aircraft_cache_time'] is None:
-        return False
-    return datetime.now() - data_cache['aircraft_cache_time'] < data_cache['aircraft_cache_duration']
-
-def haversine(lon1, lat1, lon2, lat2):
-    R = 6371  # Radius of Earth in kilometers
-    dLat = math.radians(lat2 - lat1)
-    dLon = math.radians(lon2 - lon1)
-    a = math.sin(dLat / 2) * math.sin(dLat / 2) + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dLon / 2) * math.sin(dLon / 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    distance = R * c
-    return distance
-
-def calculate_bearing(lon1, lat1, lon2, lat2):
-    dLon = math.radians(lon2 - lon1)
-    lat1 = math.radians(lat1)
-    lat2 = math.radians(lat2)
-    y = math.sin(dLon) * math.cos(lat2)
-    x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dLon)
-    bearing = math.degrees(math.atan2(y, x))
-    return (bearing + 360) % 360
-
-def track_balloons(data_24h):
-    tracks = []
-    if not data_24h or 0 not in data_24h:
-        return []
-
-    # Initialize tracks with the most recent data (hour 0)
-    for balloon_data in data_24h[0]:
-        tracks.append([balloon_data])
-
-    # Process hours 1-23 as in original algorithm
-    for h in range(1, 24):
-        if h not in data_24h:
-            continue
-
-        unmatched_balloons_current_hour = list(data_24h[h])
-        if not unmatched_balloons_current_hour:
-            continue
-
-        new_tracks = []
-        for track in tracks:
-            if not track:
-                continue
-            last_balloon_in_track = track[-1]
-            lon1, lat1 = last_balloon_in_track[2], last_balloon_in_track[1]
-            
-            closest_balloon_index = -1
-            min_dist = float('inf')
+# Server-Sent Events stream settings
+STREAM_SECONDS = int(os.environ.get('WINDBORNE_STREAM_SECONDS', 60))
+# Open streams each hold a worker thread (the Procfile gives 8); past this many, clients poll instead
+STREAM_MAX_OPEN = int(os.environ.get('WINDBORNE_STREAM_MAX_OPEN', 2))
+STREAM_POLL_SECONDS = 5
+STREAM_KEEPALIVE_SECONDS = 25
+STREAM_RETRY_MS = 5000
 
-            for i, balloon in enumerate(unmatched_balloons_current_hour):
-                lon2, lat2 = balloon[2], balloon[1]
-                dist = haversine(lon1, lat1, lon2, lat2)
+# Points one /api/history response may carry before it is cut short
+HISTORY_MAX_POINTS = int(os.environ.get('WINDBORNE_HISTORY_MAX_POINTS', 500000))
+# Widest range one /api/history request may ask for
+HISTORY_MAX_HOURS = int(os.environ.get('WINDBORNE_HISTORY_MAX_DAYS', 31)) * 24
 
-                if dist < min_dist:
-                    min_dist = dist
-                    closest_balloon_index = i
+# Balloon tracks persist across refreshes so only new hours need associating
+track_state = Tracking.TrackState(window=Data.DEFAULT_HOURS)
+track_state_stored_at = None
+track_state_lock = threading.Lock()
+open_streams = threading.BoundedSemaphore(STREAM_MAX_OPEN)
 
-            # Use original distance threshold to preserve data integrity
-            if min_dist < 300: # Original threshold: 300 km/h for one hour
-                matched_balloon = unmatched_balloons_current_hour.pop(closest_balloon_index)
-                track.append(matched_balloon)
-                new_tracks.append(track)
-            else:
-                # If no match found, we keep the track as is
-                new_tracks.append(track)
+# Report the pipeline stages a request waited for in a Server-Timing header
+SERVER_TIMING = os.environ.get('WINDBORNE_SERVER_TIMING', 'false').lower() == 'true'
 
-        # The remaining unmatched balloons are new tracks
-        for balloon in unmatched_balloons_current_hour:
-            new_tracks.append([balloon])
+@app.before_request
+def before_request():
+    g.request_started = time.perf_counter()
+    Metrics.start_request()
 
-        tracks = new_tracks
+# Add CORS headers for cross-origin requests
+@app.after_request
+def after_request(response):
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
 
-    return tracks
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    elapsed = time.perf_counter() - g.get('request_started', time.perf_counter())
+    Metrics.observe('windborne_http_request_seconds', elapsed, endpoint=endpoint, status=response.status_code)
+    if response.content_length is not None:
+        Metrics.observe('windborne_http_response_bytes', response.content_length, endpoint=endpoint)
+    if SERVER_TIMING:
+        timing = Metrics.server_timing()
+        response.headers['Server-Timing'] = f"{timing + ', ' if timing else ''}total;dur={elapsed * 1000:.1f}"
+    return response
 
-def analyze_flight_patterns(balloons_data):
+def update_track_state(data_24h):
+    """Extend the tracks with new hours, starting from the copy another worker published if it is newer"""
+    global track_state, track_state_stored_at
+    if shared_cache.shared:
+        stored_at = shared_cache.stored_at('track_state')
+        if stored_at is not None and stored_at != track_state_stored_at:
+            item = shared_cache.get('track_state')
+            if item is not None:
+                track_state, track_state_stored_at = item
+    if not track_state.needs_update(data_24h):
+        return track_state
+    with track_state_lock:
+        # Both datasets refresh from the same hours; the second one finds the tracks current
+        if not track_state.needs_update(data_24h):
+            return track_state
+        track_state, changed = ComputePool.Task(Tracking.update_state, track_state, data_24h).result()
+    if changed and shared_cache.shared:
+        shared_cache.set('track_state', track_state)
+        track_state_stored_at = shared_cache.stored_at('track_state')
+    return track_state
+
+def analyze_flight_patterns(balloons_data, constellation=None):
     """Analyze flight patterns and provide insights"""
     insights = {
         'total_balloons': len(balloons_data),
@@ -172,6 +153,12 @@ def analyze_flight_patterns(balloons_data):
                     insights['geographic_spread']['east'] += 1
                 else:
                     insights['geographic_spread']['west'] += 1
+
+    # Reuse the link graph rather than recomputing distances
+    if constellation is not None and constellation.size > 0:
+        insights['constellation_links'] = len(constellation)
+        insights['constellation_density'] = float(constellation.degree.mean())
+        insights['constellation_clusters'] = len(constellation.cluster_sizes())
     
     return insights
 
@@ -185,7 +172,141 @@ def index():
 
 @app.route('/health')
 def health_check():
-    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()}), 200
+    # The app keeps serving cached aircraft while OpenSky is unhealthy, so its state is reported, not failed on
+    return jsonify({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "opensky": AirTrafficData.get_client().status()
+    }), 200
+
+@app.route('/metrics')
+def metrics():
+    """Counters and latency histograms of this worker, in the Prometheus text format"""
+    return Response(Metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def compute_processed_data(fetch_air_traffic):
+    """Run the full pipeline; returns the /api/data payload, or None if no balloon data arrived"""
+    # Fetch new data
+    with Metrics.stage('fetch'):
+        data_24h = Data.get_24h_data()
+    
+    # Continue even if some data is missing
+    if not data_24h or len(data_24h) == 0:
+        return None
+    
+    # Only hours the track state has not seen yet are associated
+    with Metrics.stage('track'):
+        balloons_data, heads = update_track_state(data_24h).balloons()
+    # Links do not depend on aircraft, so they are computed while air traffic is fetched
+    constellation_task = ComputePool.Task(Constellation.ConstellationGraph, heads)
+    
+    # Get air traffic data only if requested
+    # Aircraft are cached per tile around the balloons (AirTrafficData.TILE_TTL)
+    if fetch_air_traffic:
+        try:
+            with Metrics.stage('air_traffic'):
+                aircraft_data = AirTrafficData.get_air_traffic_for_balloons(balloons_data, fetch_air_traffic, heads,
+                                                                            cache=shared_cache)
+        except Exception as e:
+            Metrics.inc('windborne_errors_total', where='air_traffic')
+            print(f"Air traffic failed: {e}")
+            aircraft_data = []
+    else:
+        aircraft_data = []
+    
+    with Metrics.stage('constellation'):
+        constellation = constellation_task.result()
+        constellation_links = constellation.links()
+    
+    # Analyze air traffic safety if aircraft data is available, alongside the flight patterns
+    safety_task = None
+    if fetch_air_traffic and aircraft_data:
+        # Only balloon columns go to the pool: current positions, track ids and velocities
+        balloon_ids = np.array([b['id'] for b in balloons_data], dtype=np.int64)
+        safety_task = ComputePool.Task(AirTrafficData.analyze_heads_safety, heads, balloon_ids, aircraft_data,
+                                       ConflictPrediction.balloon_motion(balloons_data))
+    
+    # Analyze flight patterns
+    with Metrics.stage('insights'):
+        insights = analyze_flight_patterns(balloons_data, constellation)
+    
+    safety_analysis = {}
+    if safety_task is not None:
+        with Metrics.stage('safety'):
+            safety_analysis = safety_task.result()
+    
+    # Serialized and compressed once here; every request until the next refresh reuses the bytes
+    with Metrics.stage('encode'):
+        payload = Responses.EncodedPayload({
+            "version": int(time.time() * 1000),  # Generation id clients pass back as ?since=
+            "balloons": balloons_data,
+            "constellation": constellation_links,
+            "aircraft": aircraft_data,
+            "insights": insights,
+            "safety_analysis": safety_analysis,
+            "last_updated": datetime.now().isoformat(),
+            "air_traffic_enabled": fetch_air_traffic,
+            "data_quality": {
+                "total_balloons": len(balloons_data),
+                "total_aircraft": len(aircraft_data),
+                "constellation_links": len(constellation_links)
+            }
+        })
+    with Metrics.stage('history'):
+        history.record(fetch_air_traffic, payload.data)
+    # Simplify paths and cluster markers now rather than on the first viewport request
+    with Metrics.stage('derive'):
+        get_track_tiles(fetch_air_traffic, payload)
+        get_clusters(fetch_air_traffic, payload, 'balloons')
+        get_clusters(fetch_air_traffic, payload, 'aircraft')
+    return payload
+
+# Structures derived from the current generation of each dataset, built once per worker
+derived = {}
+
+def per_generation(name, fetch_air_traffic, payload, build):
+    """Return build(payload) for the payload's generation, reusing it until a new one is published"""
+    version, value = derived.get((name, fetch_air_traffic), (None, None))
+    if value is None or version != payload['version']:
+        value = build(payload)
+        derived[(name, fetch_air_traffic)] = (payload['version'], value)
+    return value
+
+def get_track_tiles(fetch_air_traffic, payload):
+    """Viewport index and simplified paths"""
+    return per_generation('tiles', fetch_air_traffic, payload,
+                          lambda p: TrackTiles.TrackTiles(p['balloons'], p['version']))
+
+def get_binary_payload(fetch_air_traffic, payload):
+    """EncodedPayload of the WireFormat body"""
+    return per_generation('binary', fetch_air_traffic, payload,
+                          lambda p: Responses.EncodedPayload(None, body=WireFormat.encode(p.data),
+                                                             mimetype=WireFormat.MEDIA_TYPE))
+
+def get_clusters(fetch_air_traffic, payload, layer):
+    """ClusterIndex for the balloon or aircraft layer"""
+    if layer == 'aircraft':
+        return per_generation('aircraft_clusters', fetch_air_traffic, payload,
+                              lambda p: Clustering.aircraft_clusters(p['aircraft'], p['version']))
+    return per_generation('balloon_clusters', fetch_air_traffic, payload,
+                          lambda p: Clustering.balloon_clusters(p['balloons'], p['version']))
+
+def wants_binary():
+    """True if the client asked for WireFormat with ?format=binary or its Accept header"""
+    if request.args.get('format') == 'binary':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', WireFormat.MEDIA_TYPE]) == WireFormat.MEDIA_TYPE
+
+# Recent generations, so clients can fetch only what changed since the one they have
+history = Deltas.DeltaHistory(shared_cache)
+
+# One dataset per air-traffic setting, refreshed in the background before it expires
+refresher = Refresher.RefreshScheduler(
+    compute_processed_data,
+    ttl=data_cache['cache_duration'],
+    refresh_ahead=data_cache['refresh_ahead'],
+    cache=shared_cache
+)
 
 @app.route('/api/data')
 def get_data():
@@ -193,19 +314,12 @@ def get_data():
         # Check if air traffic data is requested
         fetch_air_traffic = request.args.get('air_traffic', 'false').lower() == 'true'
         force_refresh = request.args.get('refresh', 'false').lower() == 'true'
+        since = request.args.get('since', type=int)
         
-        # Check cache first (unless force refresh is requested)
-        if not force_refresh and is_cache_valid():
-            cached_data = data_cache['balloons_data'].copy()
-            cached_data['air_traffic_enabled'] = fetch_air_traffic
-            cached_data['last_updated'] = data_cache['last_updated'].isoformat()
-            return jsonify(cached_data)
+        # Serves the last good copy; only a cold cache or a forced refresh waits for the pipeline
+        processed_data = refresher.get(fetch_air_traffic, force=force_refresh)
         
-        # Fetch new data
-        data_24h = Data.get_24h_data()
-        
-        # Continue even if some data is missing
-        if not data_24h or len(data_24h) == 0:
+        if processed_data is None:
             return jsonify({
                 "error": "Unable to fetch balloon data",
                 "balloons": [],
@@ -217,103 +331,21 @@ def get_data():
                 "air_traffic_enabled": fetch_air_traffic,
                 "data_quality": {"total_balloons": 0, "total_aircraft": 0, "constellation_links": 0}
             }), 200
-        
-        tracks = track_balloons(data_24h)
-
-        balloons_data = []
-        for i, track in enumerate(tracks):
-            path = []
-            velocities = []
-            for j in range(len(track) - 1):
-                current_point = track[j]
-                previous_point = track[j+1]
-
-                # Note: Windborne API format is [lat, lon, alt]
-                lat1, lon1 = current_point[0], current_point[1]
-                lat2, lon2 = previous_point[0], previous_point[1]
-
-                path.append([lat1, lon1])
-
-                distance = haversine(lon1, lat1, lon2, lat2)
-                speed = distance
-                direction = calculate_bearing(lon2, lat2, lon1, lat1)
-                velocities.append([speed, direction])
-            
-            if track:
-                last_point = track[-1]
-                path.append([last_point[0], last_point[1]])  # [lat, lon]
-                velocities.append([0, 0])
-
-            balloons_data.append({
-                "id": i,
-                "path": path,
-                "velocities": velocities
-            })
-
-        constellation_links = []
-        latest_positions = []
-        for balloon in balloons_data:
-            if balloon['path']:
-                latest_positions.append(balloon['path'][0])
-            else:
-                latest_positions.append(None)
-
-        for i in range(len(latest_positions)):
-            for j in range(i + 1, len(latest_positions)):
-                pos_i = latest_positions[i]
-                pos_j = latest_positions[j]
-                if pos_i and pos_j:
-                    dist = haversine(pos_i[1], pos_i[0], pos_j[1], pos_j[0])
-                    if dist < 500: # 500 km threshold for constellation link
-                        constellation_links.append([i, j])
-        
-        # Get air traffic data only if requested
-        # Check aircraft cache first
-        if fetch_air_traffic and is_aircraft_cache_valid():
-            aircraft_data = data_cache['aircraft_data']
-        elif fetch_air_traffic:
-            try:
-                aircraft_data = AirTrafficData.get_air_traffic_for_balloons(balloons_data, fetch_air_traffic)
-                
-                # Cache the aircraft data
-                data_cache['aircraft_data'] = aircraft_data
-                data_cache['aircraft_cache_time'] = datetime.now()
-            except Exception as e:
-                aircraft_data = []
-        else:
-            aircraft_data = []
-        
-        # Analyze flight patterns
-        insights = analyze_flight_patterns(balloons_data)
-        
-        # Analyze air traffic safety if aircraft data is available
-        safety_analysis = {}
-        if fetch_air_traffic and aircraft_data:
-            safety_analysis = AirTrafficData.analyze_air_traffic_safety(balloons_data, aircraft_data)
-        
-        processed_data = {
-            "balloons": balloons_data,
-            "constellation": constellation_links,
-            "aircraft": aircraft_data,
-            "insights": insights,
-            "safety_analysis": safety_analysis,
-            "last_updated": datetime.now().isoformat(),
-            "air_traffic_enabled": fetch_air_traffic,
-            "data_quality": {
-                "total_balloons": len(balloons_data),
-                "total_aircraft": len(aircraft_data),
-                "constellation_links": len(constellation_links)
-            }
-        }
 
-        # Cache the processed data
-        data_cache['balloons_data'] = processed_data
-        data_cache['aircraft_data'] = aircraft_data
-        data_cache['last_updated'] = datetime.now()
-
-        return jsonify(processed_data)
+        # Clients that already have a recent generation only get the changes
+        if since is not None:
+            changes = history.delta(fetch_air_traffic, since, processed_data)
+            if changes is not None:
+                return changes.response(request)
+
+        if wants_binary():
+            processed_data = get_binary_payload(fetch_air_traffic, processed_data)
+        response = processed_data.response(request)
+        response.vary.add('Accept')
+        return response
         
     except Exception as e:
+        Metrics.inc('windborne_errors_total', where='api_data')
         print(f"Error in /api/data: {str(e)}")
         return jsonify({
             "error": "Internal server error",
@@ -328,7 +360,152 @@ def get_data():
         }), 500
 
 
-
+def viewport_args():
+    """(west, south, east, north) from ?bbox=, or None if it is malformed"""
+    try:
+        west, south, east, north = (float(v) for v in request.args.get('bbox', '-180,-90,180,90').split(','))
+    except ValueError:
+        return None
+    if not all(math.isfinite(v) for v in (west, south, east, north)):
+        return None
+    return west, south, east, north
+
+def zoom_arg():
+    """?zoom= clamped to the zoom levels tiles are built for, or None if it is not a finite number"""
+    zoom = request.args.get('zoom', 2, type=float)
+    if zoom is None or not math.isfinite(zoom):
+        return None
+    return min(max(zoom, 0.0), float(TrackTiles.MAX_ZOOM))
+
+@app.route('/api/balloons')
+def get_balloons():
+    """Tracks crossing a viewport, with paths simplified for the zoom level"""
+    fetch_air_traffic = request.args.get('air_traffic', 'false').lower() == 'true'
+    zoom = zoom_arg()
+    bbox = viewport_args()
+    if bbox is None or zoom is None:
+        return jsonify({"error": "bbox must be west,south,east,north and zoom a number"}), 400
+
+    payload = refresher.get(fetch_air_traffic)
+    if payload is None:
+        return jsonify({"error": "Unable to fetch balloon data", "balloons": []}), 200
+    tiles = get_track_tiles(fetch_air_traffic, payload)
+    return tiles.query(*bbox, zoom).response(request)
+
+
+@app.route('/api/clusters')
+def get_cluster_markers():
+    """Balloon or aircraft markers in a viewport, grouped into clusters below the highest zooms"""
+    fetch_air_traffic = request.args.get('air_traffic', 'false').lower() == 'true'
+    layer = request.args.get('layer', 'balloons')
+    zoom = zoom_arg()
+    bbox = viewport_args()
+    if bbox is None or zoom is None or layer not in ('balloons', 'aircraft'):
+        return jsonify({"error": "layer must be balloons or aircraft, bbox west,south,east,north and zoom a number"}), 400
+
+    payload = refresher.get(fetch_air_traffic)
+    if payload is None:
+        return jsonify({"error": "Unable to fetch balloon data", "clusters": [], "points": []}), 200
+    return get_clusters(fetch_air_traffic, payload, layer).query(*bbox, zoom).response(request)
+
+
+def history_time(name, default):
+    """Absolute hour from an ISO 8601 time or Unix seconds in ?name=, the default if absent, None if malformed or out of range"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        seconds = moment.timestamp()
+    if not math.isfinite(seconds):
+        return None
+    hour = int(seconds // 3600)
+    try:
+        datetime.fromtimestamp(hour * 3600, tz=timezone.utc)  # The response echoes it back as a time
+    except (OverflowError, OSError, ValueError):
+        return None
+    return hour
+
+@app.route('/api/history')
+def get_history():
+    """Archived hourly positions between ?start= and ?end= (default: the last day), optionally within ?bbox="""
+    end = history_time('end', int(time.time() // 3600))
+    start = history_time('start', None if end is None else end - 24)
+    bbox = viewport_args() if 'bbox' in request.args else None
+    if start is None or end is None or ('bbox' in request.args and bbox is None):
+        return jsonify({"error": "start and end must be ISO 8601 times or Unix seconds, bbox west,south,east,north"}), 400
+    if end - start > HISTORY_MAX_HOURS:
+        return jsonify({"error": f"start and end may be at most {HISTORY_MAX_HOURS // 24} days apart"}), 400
+
+    hours, points, truncated = [], 0, False
+    for key, columns in Data.get_archive().query(start, end, bbox):
+        if points + len(columns['lat']) > HISTORY_MAX_POINTS:
+            truncated = True
+            break
+        points += len(columns['lat'])
+        hours.append({
+            "time": datetime.fromtimestamp(key * 3600, tz=timezone.utc).isoformat(),
+            "lat": np.round(columns['lat'], 5).tolist(),
+            "lon": np.round(columns['lon'], 5).tolist(),
+            "alt": np.round(columns['alt'], 3).tolist(),
+            "row": columns['row'].tolist()  # Index among that hour's valid records; malformed ones are dropped before numbering
+        })
+    return Responses.EncodedPayload({
+        "start": datetime.fromtimestamp(start * 3600, tz=timezone.utc).isoformat(),
+        "end": datetime.fromtimestamp(end * 3600, tz=timezone.utc).isoformat(),
+        "hours": hours,
+        "points": points,
+        "truncated": truncated  # HISTORY_MAX_POINTS reached; narrow the range or bbox for the rest
+    }).response(request)
+
+
+@app.route('/api/stream')
+def stream_data():
+    """Server-Sent Events: pushes a delta (or the full payload) whenever a new generation is published"""
+    fetch_air_traffic = request.args.get('air_traffic', 'false').lower() == 'true'
+    # EventSource sends the id of the last event it saw when it reconnects
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+
+    def events():
+        version = since
+        started = time.monotonic()
+        last_sent = started
+        # Each open stream holds a worker thread for up to STREAM_SECONDS. Beyond STREAM_MAX_OPEN
+        # the stream sends what is new and ends, and the browser reconnects after `retry`
+        held = open_streams.acquire(blocking=False)
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            while True:
+                payload = refresher.get(fetch_air_traffic)
+                if payload is not None and payload['version'] != version:
+                    changes = history.delta(fetch_air_traffic, version, payload) if version is not None else None
+                    body = (changes or payload).bodies['identity'].decode()
+                    yield f"id: {payload['version']}\nevent: {'delta' if changes else 'full'}\ndata: {body}\n\n"
+                    version = payload['version']
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= STREAM_KEEPALIVE_SECONDS:
+                    yield ": keep-alive\n\n"
+                    last_sent = time.monotonic()
+                if not held or time.monotonic() - started >= STREAM_SECONDS:
+                    break
+                time.sleep(STREAM_POLL_SECONDS)
+        finally:
+            if held:
+                open_streams.release()
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let a proxy hold events back
+    return response
 
 
 # Add 404 error handler
@@ -336,7 +513,7 @@ def get_data():
 def not_found(error):
     return jsonify({
         "error": "Route not found",
-        "available_routes": ["/", "/health", "/test", "/api/data", "/debug"],
+        "available_routes": ["/", "/health", "/test", "/api/data", "/api/balloons", "/api/clusters", "/api/history", "/api/stream", "/metrics", "/debug"],
         "timestamp": datetime.now().isoformat()
     }), 404
 
@@ -0,0 +1,87 @@
+"""Compare AircraftBatch with the per-aircraft dicts AirTrafficData used to build.
+
+Parses synthetic /states/all vectors both ways and reports parse time, the memory the
+parsed aircraft hold (tracemalloc) and their pickled size in the shared cache.
+
+Run from the repository root: python benchmarks/bench_aircraft.py [states]
+"""
+import json
+import os
+import pickle
+import random
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AircraftBatch import AircraftBatch
+
+
+def legacy_parse(states, altitude_min=0, altitude_max=50000):
+    """The 17-key dicts and per-aircraft checks fetch_area used before AircraftBatch"""
+    aircraft_list = []
+    for state in states:
+        if len(state) < 17:
+            continue
+        aircraft = {
+            'icao24': state[0], 'callsign': state[1], 'origin_country': state[2],
+            'time_position': state[3], 'time_velocity': state[4], 'longitude': state[5],
+            'latitude': state[6], 'altitude': state[7], 'on_ground': state[8], 'velocity': state[9],
+            'true_track': state[10], 'vertical_rate': state[11], 'sensors': state[12],
+            'geo_altitude': state[13], 'squawk': state[14], 'spi': state[15], 'position_source': state[16]
+        }
+        if aircraft.get('latitude') is None or aircraft.get('longitude') is None:
+            continue
+        altitude = aircraft.get('altitude') or aircraft.get('geo_altitude')
+        if altitude is None or not altitude_min <= altitude <= altitude_max:
+            continue
+        aircraft_list.append(aircraft)
+    return aircraft_list
+
+
+def make_states(count, seed=5):
+    rng = random.Random(seed)
+    states = []
+    for i in range(count):
+        on_ground = rng.random() < 0.1
+        states.append([f"{i:06x}", f"CS{i:<6}", "Country", 1700000000 + rng.randrange(60), 1700000000,
+                       rng.uniform(-180, 180), rng.uniform(-60, 70),
+                       None if on_ground else rng.uniform(300, 13000), on_ground, rng.uniform(0, 260),
+                       rng.uniform(0, 360), rng.uniform(-10, 10), None,
+                       None if on_ground else rng.uniform(300, 13000), "1000", False, 0])
+    return states
+
+
+def held_kb(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size / 1024
+
+
+def best_ms(fn, repeat=5):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    # Parse from decoded JSON, the way the states arrive from requests
+    states = json.loads(json.dumps(make_states(count)))
+    legacy = legacy_parse(states)
+    batch = AircraftBatch.from_states(states, 0, 50000)
+    assert len(legacy) == len(batch)
+    print(f"{count} states, {len(batch)} aircraft kept")
+
+    print(f"{'format':<8} {'parse ms':>9} {'held KB':>9} {'pickle KB':>10} {'records ms':>11}")
+    print(f"{'dicts':<8} {best_ms(lambda: legacy_parse(states)):>9.1f} {held_kb(lambda: legacy_parse(states)):>9.0f} "
+          f"{len(pickle.dumps(legacy)) / 1024:>10.0f} {'-':>11}")
+    print(f"{'batch':<8} {best_ms(lambda: AircraftBatch.from_states(states, 0, 50000)):>9.1f} "
+          f"{held_kb(lambda: AircraftBatch.from_states(states, 0, 50000)):>9.0f} "
+          f"{len(pickle.dumps(batch)) / 1024:>10.0f} {best_ms(batch.to_records):>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
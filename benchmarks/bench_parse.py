@@ -0,0 +1,91 @@
+"""Compare Data.parse_records with the previous retry-cascade parser.
+
+Run from the repository root: python benchmarks/bench_parse.py [records]
+"""
+import json
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Data
+from Snapshot import Snapshot
+
+
+def legacy_parse_data(data_string):
+    """The parser Data.parse_data used before the single-pass rewrite"""
+    data_string = data_string.strip()
+    data_string = data_string.replace('NaN', 'null')
+    try:
+        return json.loads(data_string)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads('[' + data_string)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads('[' + data_string + ']')
+    except json.JSONDecodeError:
+        try:
+            matches = re.findall(r'\[[^\]]*\]', data_string)
+            for match in matches:
+                try:
+                    return json.loads(match)
+                except json.JSONDecodeError:
+                    continue
+        except:
+            pass
+        return None
+
+
+def make_records(count, nan_rate=0.01, seed=7):
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        record = [rng.uniform(-90, 90), rng.uniform(-180, 180), rng.uniform(0, 25)]
+        if rng.random() < nan_rate:
+            record[rng.randrange(3)] = float('nan')
+        records.append(record)
+    return records
+
+
+def make_payloads(count):
+    body = ','.join('[' + ','.join('NaN' if v != v else repr(v) for v in r) + ']' for r in make_records(count))
+    return {
+        'brackets': '[' + body + ']',
+        'missing_opening': body + ']',
+        'missing_both': body,
+        # Truncated mid-record: the legacy parser only recovers the first record here
+        'truncated': '[' + body[:len(body) * 2 // 3],
+    }
+
+
+def count_records(result):
+    return len(result) if result is not None else 0
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    payloads = make_payloads(count)
+    print(f"{count} records per payload")
+    print(f"{'format':<16} {'size MB':>8} {'legacy ms':>10} {'legacy n':>9} {'new ms':>8} {'new n':>7} {'dropped':>8} "
+          f"{'legacy->snapshot':>17} {'new->snapshot':>14}")
+    for name, payload in payloads.items():
+        legacy_time = min(timeit.repeat(lambda: legacy_parse_data(payload), number=1, repeat=5))
+        new_time = min(timeit.repeat(lambda: Data.parse_records(payload), number=1, repeat=5))
+        # What the pipeline pays: parsed records turned into Snapshot columns
+        legacy_snapshot = min(timeit.repeat(lambda: Snapshot.from_records(legacy_parse_data(payload) or []),
+                                            number=1, repeat=5))
+        new_snapshot = min(timeit.repeat(lambda: Snapshot.from_records(Data.parse_records(payload)[0]),
+                                         number=1, repeat=5))
+        records, dropped = Data.parse_records(payload)
+        print(f"{name:<16} {len(payload) / 1e6:>8.2f} {legacy_time * 1000:>10.1f} "
+              f"{count_records(legacy_parse_data(payload)):>9} {new_time * 1000:>8.1f} "
+              f"{len(records):>7} {dropped:>8} {legacy_snapshot * 1000:>17.1f} {new_snapshot * 1000:>14.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""Time every stage of the /api/data pipeline on a synthetic constellation, then the app end to end.
+
+Stages run on data from Synthetic.py: parsing the hourly files, tracking,
+the velocity computation, constellation links, flight-pattern insights, aircraft
+parsing, the safety analysis and conflict prediction. The end-to-end cases serve the
+same files and aircraft from local HTTP servers and go through the Flask test client.
+
+Results are written as JSON (stdout, or --output); --compare prints each stage's time
+against an earlier results file.
+
+Run from the repository root:
+    python benchmarks/bench_pipeline.py --balloons 1000 --hours 24 --aircraft 5000 --output run.json
+"""
+import argparse
+import contextlib
+import http.server
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import Synthetic
+
+
+def measure(fn, repeat):
+    """Run fn repeat times; returns (timings in ms, last result)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, result
+
+
+def summary(timings, **extra):
+    return dict(best_ms=round(min(timings), 3), median_ms=round(statistics.median(timings), 3),
+                runs=len(timings), **extra)
+
+
+def serve(handler):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def upstream_handler(bodies):
+    """Serves treasure/{HH}.json with the validators the real upstream sends"""
+    now = time.time()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            hour = int(os.path.basename(urlparse(self.path).path)[:2])
+            etag = f'"hour-{hour}"'
+            if hour not in bodies:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = bodies[hour].encode()
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', formatdate(now - hour * 3600, usegmt=True))
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def opensky_handler(states):
+    """Serves /states/all filtered to the requested box"""
+    lat = np.array([s[6] for s in states], dtype=float)
+    lon = np.array([s[5] for s in states], dtype=float)
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            query = {k: float(v[0]) for k, v in parse_qs(urlparse(self.path).query).items()}
+            inside = np.flatnonzero((lat >= query['lamin']) & (lat <= query['lamax'])
+                                    & (lon >= query['lomin']) & (lon <= query['lomax']))
+            body = json.dumps({'time': int(time.time()), 'states': [states[i] for i in inside.tolist()]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def bench_stages(args, bodies, results):
+    import AirTrafficData
+    import ConflictPrediction
+    import Constellation
+    import Data
+    import Geodesy
+    import Tracking
+    import app
+    from AircraftBatch import AircraftBatch
+    from Snapshot import Snapshot
+
+    def parse():
+        snapshots = {}
+        for hour, body in bodies.items():
+            records, _ = Data.parse_records(body)
+            snapshots[hour] = Snapshot.from_records(records, hour=hour, key=1000 - hour)
+        return snapshots
+
+    timings, data = measure(parse, args.repeat)
+    results['parse'] = summary(timings, items=sum(len(s) for s in data.values()),
+                               bytes=sum(len(b) for b in bodies.values()))
+
+    timings, state = measure(lambda: Tracking.track_balloons(data), args.repeat)
+    results['track'] = summary(timings, items=len(state.tracks))
+
+    # The per-step speed and bearing the tracker computes, over every hour-to-hour step of the synthetic tracks
+    lat, lon, _ = Synthetic.balloon_positions(args.balloons, args.hours, args.seed)
+    timings, _ = measure(lambda: (Geodesy.haversine_km(lat[1:], lon[1:], lat[:-1], lon[:-1]),
+                                  Geodesy.bearing_deg(lat[1:], lon[1:], lat[:-1], lon[:-1])), args.repeat)
+    results['velocities'] = summary(timings, items=int(lat[1:].size))
+
+    timings, (balloons_data, heads) = measure(state.balloons, args.repeat)
+    results['balloons'] = summary(timings, items=len(balloons_data))
+
+    timings, constellation = measure(lambda: Constellation.ConstellationGraph(heads), args.repeat)
+    results['constellation'] = summary(timings, items=len(constellation))
+
+    timings, _ = measure(lambda: app.analyze_flight_patterns(balloons_data, constellation), args.repeat)
+    results['flight_patterns'] = summary(timings, items=len(balloons_data))
+
+    rows = heads.valid_indices()
+    states = Synthetic.make_states(args.aircraft, heads.lat[rows].tolist(), heads.lon[rows].tolist(), seed=args.seed)
+    timings, aircraft = measure(lambda: AircraftBatch.from_states(states, 0, 50000), args.repeat)
+    results['aircraft_parse'] = summary(timings, items=len(aircraft))
+
+    timings, safety = measure(lambda: AirTrafficData.analyze_air_traffic_safety(balloons_data, aircraft, heads),
+                              args.repeat)
+    results['safety'] = summary(timings, items=safety.get('candidate_pairs'),
+                                violations=safety.get('safety_zones_violated'))
+
+    # Synthetic hour keys and aircraft report times are unrelated clocks; predict from the heads
+    # as they are and from a minute after the newest aircraft report
+    speed, direction = ConflictPrediction.balloon_motion(balloons_data)
+    current = Snapshot(heads.lat, heads.lon, heads.alt)
+    now = float(np.nanmax(aircraft.columns['time_position'])) + 60
+    timings, prediction = measure(lambda: ConflictPrediction.predict(current, speed, direction, aircraft, now),
+                                  args.repeat)
+    results['conflict_prediction'] = summary(timings, items=prediction['prediction']['candidate_pairs'],
+                                             conflicts=prediction['prediction']['conflicts'])
+    return states
+
+
+def bench_end_to_end(args, bodies, states, results):
+    import AirTrafficData
+    import Data
+    import OpenSkyClient
+    import app
+
+    upstream = serve(upstream_handler(bodies))
+    opensky = serve(opensky_handler(states))
+    Data.TREASURE_URL = f"http://127.0.0.1:{upstream.server_port}/treasure/{{hour:02}}.json"
+    AirTrafficData._client = OpenSkyClient.OpenSkyClient(base_url=f"http://127.0.0.1:{opensky.server_port}",
+                                                         bucket=OpenSkyClient.TokenBucket(10 ** 9))
+    client = app.app.test_client()
+
+    def get(url, **kwargs):
+        response = client.get(url, **kwargs)
+        assert response.status_code in (200, 304), (url, response.status_code)
+        return response
+
+    timings, response = measure(lambda: get('/api/data'), 1)
+    results['e2e_first_request'] = summary(timings, bytes=len(response.data))
+    timings, response = measure(lambda: get('/api/data?refresh=true'), args.repeat)
+    results['e2e_refresh'] = summary(timings, bytes=len(response.data))
+    timings, response = measure(lambda: get('/api/data', headers={'Accept-Encoding': 'gzip'}), args.repeat * 4)
+    results['e2e_cached_gzip'] = summary(timings, bytes=len(response.data))
+    etag = response.headers['ETag'].strip('"')
+    timings, _ = measure(lambda: get('/api/data', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etag}"'}),
+                         args.repeat * 4)
+    results['e2e_not_modified'] = summary(timings)
+    timings, response = measure(lambda: get('/api/balloons?bbox=-30,-30,30,30&zoom=4'), args.repeat * 4)
+    results['e2e_viewport'] = summary(timings, bytes=len(response.data))
+
+    if args.aircraft:
+        timings, response = measure(lambda: get('/api/data?air_traffic=true&refresh=true'), args.repeat)
+        results['e2e_refresh_air_traffic'] = summary(timings, bytes=len(response.data),
+                                                     aircraft=len(response.get_json()['aircraft']))
+    upstream.shutdown()
+    opensky.shutdown()
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(current, previous):
+    if current['parameters'] != previous.get('parameters'):
+        print(f"Note: parameters differ from the earlier run ({previous.get('parameters')})", file=sys.stderr)
+    print(f"{'stage':<26} {'before ms':>10} {'after ms':>10} {'ratio':>7}", file=sys.stderr)
+    for stage, result in current['stages'].items():
+        before = previous.get('stages', {}).get(stage)
+        if before is None:
+            continue
+        ratio = result['best_ms'] / before['best_ms'] if before['best_ms'] else float('nan')
+        print(f"{stage:<26} {before['best_ms']:>10.2f} {result['best_ms']:>10.2f} {ratio:>7.2f}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--balloons', type=int, default=1000)
+    parser.add_argument('--hours', type=int, default=24)
+    parser.add_argument('--aircraft', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-e2e', dest='e2e', action='store_false', help='skip the Flask end-to-end cases')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    # Keep the app's caches, archive and settings away from the real ones; set before the app is imported
+    scratch = tempfile.mkdtemp(prefix='windborne-bench-')
+    os.environ.update({
+        'WINDBORNE_CACHE_DIR': os.path.join(scratch, 'snapshots'),
+        'WINDBORNE_ARCHIVE_DIR': os.path.join(scratch, 'archive'),
+        'WINDBORNE_CACHE_BACKEND': 'memory',
+        'WINDBORNE_HOURS': str(args.hours),
+    })
+
+    bodies = Synthetic.make_hours(args.balloons, args.hours, args.seed)
+    results = {}
+    # The app logs dropped records and failures with print; keep stdout for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        states = bench_stages(args, bodies, results)
+        if args.e2e:
+            bench_end_to_end(args, bodies, states, results)
+
+    output = {
+        'benchmark': 'pipeline',
+        'parameters': {'balloons': args.balloons, 'hours': args.hours, 'aircraft': args.aircraft,
+                       'repeat': args.repeat, 'seed': args.seed},
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'platform': platform.platform(), 'revision': git_revision()},
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'stages': results
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(output, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
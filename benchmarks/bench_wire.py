@@ -0,0 +1,75 @@
+"""Compare the JSON and WireFormat encodings of one /api/data payload.
+
+Both encodings are built from the same payload (one cache generation), tracked from
+synthetic hourly snapshots the way the app builds it.
+
+Run from the repository root: python benchmarks/bench_wire.py [balloons] [hours]
+"""
+import gzip
+import json
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Constellation
+import Tracking
+import WireFormat
+from Snapshot import Snapshot
+
+
+def make_payload(balloons, hours, seed=3):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-70, 70, balloons)
+    lon = rng.uniform(-180, 180, balloons)
+    drift = rng.uniform(-1, 1, (balloons, 2))
+    data_24h = {}
+    for hour in range(hours):
+        data_24h[hour] = Snapshot(lat - drift[:, 0] * hour, (lon - drift[:, 1] * hour + 180) % 360 - 180,
+                                  rng.uniform(0, 25, balloons), key=1000 - hour)
+    balloons_data, heads = Tracking.track_balloons(data_24h).balloons()
+    constellation = Constellation.ConstellationGraph(heads)
+    return {
+        'version': 1,
+        'balloons': balloons_data,
+        'constellation': constellation.links(),
+        'aircraft': [],
+        'insights': {'total_balloons': len(balloons_data)},
+        'safety_analysis': {},
+        'data_quality': {'total_balloons': len(balloons_data), 'total_aircraft': 0,
+                         'constellation_links': len(constellation)},
+        'last_updated': '2025-01-01T00:00:00',
+        'air_traffic_enabled': False
+    }
+
+
+def encode_json(data):
+    return json.dumps(data, separators=(',', ':'), sort_keys=True).encode()
+
+
+def best_ms(fn, repeat=5):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    balloons = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    hours = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    data = make_payload(balloons, hours)
+    points = sum(len(b['path']) for b in data['balloons'])
+    print(f"{len(data['balloons'])} tracks, {points} points, {len(data['constellation'])} links")
+
+    json_body = encode_json(data)
+    wire_body = WireFormat.encode(data)
+    print(f"{'format':<8} {'size KB':>8} {'gzip KB':>8} {'encode ms':>10} {'decode ms':>10}")
+    for name, body, encode, decode in (
+            ('json', json_body, encode_json, json.loads),
+            ('binary', wire_body, WireFormat.encode, WireFormat.decode)):
+        print(f"{name:<8} {len(body) / 1024:>8.1f} {len(gzip.compress(body, 6)) / 1024:>8.1f} "
+              f"{best_ms(lambda: encode(data)):>10.1f} {best_ms(lambda: decode(body)):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
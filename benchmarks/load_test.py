@@ -0,0 +1,90 @@
+"""Drive a running app with concurrent clients and report throughput and tail latency.
+
+Start the upstream stand-in and the app first, for example:
+    python DataSource.py --port 8765 --latency-ms 50-400 --error-rate 0.05
+    WINDBORNE_TREASURE_URL='http://127.0.0.1:8765/treasure/{hour:02}.json' \\
+        WINDBORNE_OPENSKY_URL=http://127.0.0.1:8765/api gunicorn -w 4 -b 127.0.0.1:8000 app:app
+then:
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --clients 32 --duration 30 --output load.json
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import requests
+
+# (path, weight): mostly cached reads, a few viewport queries and forced refreshes
+DEFAULT_MIX = (('/api/data', 8), ('/api/balloons?bbox=-30,-30,30,30&zoom=4', 3), ('/health', 1),
+               ('/api/data?refresh=true', 1))
+
+
+def worker(base_url, paths, deadline, seed, samples, lock):
+    rng = np.random.default_rng(seed)
+    session = requests.Session()
+    local = []
+    while time.perf_counter() < deadline:
+        path = paths[rng.integers(len(paths))]
+        started = time.perf_counter()
+        try:
+            response = session.get(base_url + path, headers={'Accept-Encoding': 'gzip'}, timeout=60)
+            status = response.status_code
+        except requests.exceptions.RequestException:
+            status = 'error'
+        local.append((path, status, time.perf_counter() - started))
+    with lock:
+        samples.extend(local)
+
+
+def percentiles(latencies):
+    values = np.array(latencies) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(values, p)), 1) for p in (50, 95, 99)} | \
+        {'max_ms': round(float(values.max()), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--path', action='append', help='request only these paths (repeatable)')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    args = parser.parse_args()
+
+    paths = args.path or [path for path, weight in DEFAULT_MIX for _ in range(weight)]
+    samples, lock = [], threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=worker, args=(args.url.rstrip('/'), paths, deadline, i, samples, lock))
+               for i in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for path in sorted({path for path, _, _ in samples}):
+        latencies = [latency for p, _, latency in samples if p == path]
+        endpoints[path] = dict(requests=len(latencies), **percentiles(latencies))
+    output = {
+        'benchmark': 'load',
+        'parameters': {'url': args.url, 'clients': args.clients, 'duration': args.duration},
+        'requests': len(samples),
+        'requests_per_second': round(len(samples) / elapsed, 1),
+        'statuses': {str(status): count for status, count in Counter(s for _, s, _ in samples).items()},
+        'latency': percentiles([latency for _, _, latency in samples]) if samples else {},
+        'endpoints': endpoints
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,16 +7,25 @@ document.addEventListener('DOMContentLoaded', function () {
     }).addTo(mymap);
 
     // Global variables
-    let balloonMarkers = [];
+    let balloonMarkers = new Map();  // balloon id -> marker
     let constellationLines = [];
-    let aircraftMarkers = [];
+    let aircraftMarkers = new Map();  // icao24 -> marker
     let airTrafficEnabled = false;
     let lastAircraftData = [];
     let lastBalloonsData = [];
     let lastConstellationData = [];
+    let lastSafetyAnalysis = {};
+    let lastData = null;
+    let currentVersion = null;  // Generation of the data on the map; the server sends changes since it
+    let stream = null;
+    const WIRE_FORMAT = 'application/x-windborne-tracks';
+    let trackLayer = L.layerGroup().addTo(mymap);  // Balloon paths for the current viewport
+    let tracksRequest = null;
+    let clusterLayer = L.layerGroup().addTo(mymap);  // Cluster markers for the current viewport and zoom
+    let markersRequest = null;
 
     // Load initial data
-    loadData();
+    loadData().then(startStream);
 
     // Set up refresh button
     document.getElementById('refreshBtn').addEventListener('click', function() {
@@ -29,49 +38,32 @@ document.addEventListener('DOMContentLoaded', function () {
     // Set up controls
     setupControls();
 
+    // Paths and markers are fetched per viewport: simplified paths and clustered markers for the zoom level
+    mymap.on('moveend', loadTracks);
+    mymap.on('moveend', renderMarkers);
+
 
 
     function loadData(forceRefresh = false) {
         const params = new URLSearchParams();
         if (airTrafficEnabled) params.append('air_traffic', 'true');
         if (forceRefresh) params.append('refresh', 'true');
+        if (currentVersion !== null) params.append('since', currentVersion);
         const queryString = params.toString() ? `?${params.toString()}` : '';
         
-        return fetch(`/api/data${queryString}`)
-        .then(response => response.json())
+        // Full payloads come back in the compact binary format; deltas stay JSON
+        return fetch(`/api/data${queryString}`, {
+            headers: { 'Accept': `${WIRE_FORMAT}, application/json;q=0.9` }
+        })
+        .then(response => {
+            if ((response.headers.get('Content-Type') || '').startsWith(WIRE_FORMAT)) {
+                return response.arrayBuffer().then(decodeTracks);
+            }
+            return response.json();
+        })
         .then(data => {
                 console.log('Data loaded:', data);
-                
-                // Update last updated time
-                const lastUpdated = new Date(data.last_updated);
-                document.getElementById('lastUpdated').textContent = 
-                    `Last updated: ${lastUpdated.toLocaleTimeString()}`;
-                
-                // Clear existing markers and lines
-                clearMap();
-                
-                // Store data for later use
-                lastBalloonsData = data.balloons;
-                lastAircraftData = data.aircraft;
-                lastConstellationData = data.constellation;
-                
-                // Process balloons
-                processBalloons(data.balloons);
-                
-                // Process constellation links
-                processConstellationLinks(data.constellation, data.balloons);
-                
-                // Process air traffic data
-                processAirTrafficData(data.aircraft, data.safety_analysis);
-                
-                // Update insights
-                updateInsights(data.insights);
-                
-                // Update air traffic safety summary
-                updateAirTrafficSummary(data.safety_analysis);
-                
-                // Update flight analysis
-                updateFlightAnalysis(data);
+                applyData(data);
             })
             .catch(error => {
                 console.error('Error loading data:', error);
@@ -79,81 +71,393 @@ document.addEventListener('DOMContentLoaded', function () {
             });
     }
 
+    function startStream() {
+        // Push updates as the server refreshes; the 15 minute poll below stays as a fallback
+        if (!window.EventSource) return;
+        if (stream) stream.close();
+        const params = new URLSearchParams();
+        if (airTrafficEnabled) params.append('air_traffic', 'true');
+        if (currentVersion !== null) params.append('since', currentVersion);
+        stream = new EventSource(`/api/stream?${params.toString()}`);
+        const onEvent = event => applyData(JSON.parse(event.data));
+        stream.addEventListener('delta', onEvent);
+        stream.addEventListener('full', onEvent);
+    }
+
+    function decodeTracks(buffer) {
+        // Mirrors WireFormat.py: magic, header length, JSON header, then 8-byte aligned columns
+        const view = new DataView(buffer);
+        const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+        if (magic !== 'WBT1') throw new Error(`Unexpected tracks format ${magic}`);
+        const headerLength = view.getUint32(4, true);
+        const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+        const start = Math.ceil((8 + headerLength) / 8) * 8;
+        const arrayTypes = { '<i4': Int32Array, '<u4': Uint32Array, '<f4': Float32Array, '|u1': Uint8Array };
+        const columns = {};
+        Object.entries(header.columns).forEach(([name, [dtype, offset, count]]) => {
+            columns[name] = new arrayTypes[dtype](buffer, start + offset, count);
+        });
+
+        const offsets = columns.track_offsets;
+        const balloons = Array.from(columns.balloon_ids, (id, i) => {
+            const path = [];
+            const velocities = [];
+            let lat = 0;
+            let lon = 0;
+            for (let j = offsets[i]; j < offsets[i + 1]; j++) {
+                // First point of a track is absolute, the rest are steps from the previous one
+                lat = j === offsets[i] ? columns.lat[j] : lat + columns.lat[j];
+                lon = j === offsets[i] ? columns.lon[j] : lon + columns.lon[j];
+                path.push([lat / header.scale, lon / header.scale]);
+                velocities.push([columns.speed[j], columns.direction[j]]);
+            }
+            return { id: id, path: path, velocities: velocities };
+        });
+
+        const constellation = [];
+        for (let i = 0; i < columns.constellation.length; i += 2) {
+            constellation.push([columns.constellation[i], columns.constellation[i + 1]]);
+        }
+
+        const aircraft = Array.from(columns.aircraft_latitude, (_, i) => {
+            const record = {};
+            Object.entries(header.aircraft_strings).forEach(([field, values]) => { record[field] = values[i]; });
+            Object.keys(columns).filter(name => name.startsWith('aircraft_')).forEach(name => {
+                const value = columns[name][i];
+                const field = name.slice('aircraft_'.length);
+                record[field] = columns[name] instanceof Uint8Array ? value === 1 : (Number.isNaN(value) ? null : value);
+            });
+            return record;
+        });
+
+        return {
+            version: header.version,
+            balloons: balloons,
+            constellation: constellation,
+            aircraft: aircraft,
+            insights: header.insights,
+            safety_analysis: header.safety_analysis,
+            data_quality: header.data_quality,
+            last_updated: header.last_updated,
+            air_traffic_enabled: header.air_traffic_enabled
+        };
+    }
+
+    function applyData(data) {
+        if (data.delta) {
+            // A delta only applies on top of the generation it was computed from
+            if (data.since !== currentVersion) return loadData();
+            applyDelta(data);
+        } else {
+            applyFull(data);
+        }
+        currentVersion = data.version === undefined ? null : data.version;
+        lastData = {
+            balloons: lastBalloonsData,
+            aircraft: lastAircraftData,
+            constellation: lastConstellationData,
+            insights: data.insights,
+            safety_analysis: lastSafetyAnalysis,
+            air_traffic_enabled: data.air_traffic_enabled
+        };
+        
+        // Update last updated time
+        const lastUpdated = new Date(data.last_updated);
+        document.getElementById('lastUpdated').textContent = 
+            `Last updated: ${lastUpdated.toLocaleTimeString()}`;
+        
+        // Update insights
+        updateInsights(data.insights);
+        
+        // Update air traffic safety summary
+        updateAirTrafficSummary(lastSafetyAnalysis);
+        
+        // Update flight analysis
+        updateFlightAnalysis(lastData);
+        
+        // Paths and markers changed with the new generation
+        loadTracks();
+        renderMarkers();
+    }
+
+    function viewportParams() {
+        const bounds = mymap.getBounds();
+        const params = new URLSearchParams({
+            bbox: [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()].map(v => v.toFixed(3)).join(','),
+            zoom: mymap.getZoom()
+        });
+        if (airTrafficEnabled) params.append('air_traffic', 'true');
+        return params;
+    }
+
+    function renderMarkers() {
+        // The server groups dense markers into clusters; only unclustered points get a marker of their own
+        if (markersRequest) markersRequest.abort();
+        markersRequest = new AbortController();
+        const layers = ['balloons'];
+        if (lastAircraftData.length > 0 && document.getElementById('showAirTraffic').checked) layers.push('aircraft');
+        
+        return Promise.all(layers.map(layer => {
+            const params = viewportParams();
+            params.append('layer', layer);
+            return fetch(`/api/clusters?${params.toString()}`, { signal: markersRequest.signal })
+                .then(response => response.json());
+        }))
+        .then(([balloonClusters, aircraftClusters]) => {
+                clusterLayer.clearLayers();
+                showBalloons(new Set(balloonClusters.points || []));
+                drawClusters(balloonClusters.clusters || [], '#e74c3c');
+                showAircraft(new Set(aircraftClusters ? aircraftClusters.points || [] : []));
+                if (aircraftClusters) drawClusters(aircraftClusters.clusters || [], '#2196f3');
+            })
+            .catch(error => {
+                if (error.name !== 'AbortError') console.error('Error loading markers:', error);
+            });
+    }
+
+    function drawClusters(clusters, color) {
+        clusters.forEach(([lat, lon, count]) => {
+            const size = count < 10 ? 24 : count < 100 ? 30 : 38;
+            const icon = L.divIcon({
+                className: 'cluster-marker',
+                html: `<div style="
+                    width: ${size}px; 
+                    height: ${size}px; 
+                    line-height: ${size}px; 
+                    background: ${color}; 
+                    opacity: 0.85; 
+                    border-radius: 50%; 
+                    border: 2px solid white;
+                    box-shadow: 0 1px 3px rgba(0,0,0,0.3);
+                    color: white;
+                    font-size: 11px;
+                    font-weight: bold;
+                    text-align: center;
+                ">${count}</div>`,
+                iconSize: [size, size],
+                iconAnchor: [size / 2, size / 2]
+            });
+            L.marker([lat, lon], { icon: icon })
+                .on('click', () => mymap.setView([lat, lon], mymap.getZoom() + 2))
+                .addTo(clusterLayer);
+        });
+    }
+
+    function showBalloons(ids) {
+        balloonMarkers.forEach((marker, id) => {
+            if (!ids.has(id)) {
+                mymap.removeLayer(marker);
+                balloonMarkers.delete(id);
+            }
+        });
+        processBalloons(lastBalloonsData.filter(balloon => ids.has(balloon.id) && !balloonMarkers.has(balloon.id)));
+    }
+
+    function showAircraft(keys) {
+        aircraftMarkers.forEach((marker, key) => {
+            if (!keys.has(key)) removeAircraftMarker(key);
+        });
+        processAirTrafficData(lastAircraftData.filter(aircraft =>
+            keys.has(aircraftKey(aircraft)) && !aircraftMarkers.has(aircraftKey(aircraft))), lastSafetyAnalysis);
+    }
+
+    function loadTracks() {
+        if (tracksRequest) tracksRequest.abort();
+        if (!document.getElementById('showTracks').checked) {
+            trackLayer.clearLayers();
+            return;
+        }
+        const params = viewportParams();
+        tracksRequest = new AbortController();
+        
+        return fetch(`/api/balloons?${params.toString()}`, { signal: tracksRequest.signal })
+        .then(response => response.json())
+        .then(data => {
+                trackLayer.clearLayers();
+                data.balloons.forEach(balloon => {
+                    if (balloon.path.length > 1) {
+                        L.polyline(unwrapPath(balloon.path), {
+                            color: '#e74c3c',
+                            weight: 1.5,
+                            opacity: 0.5
+                        }).addTo(trackLayer);
+                    }
+                });
+            })
+            .catch(error => {
+                if (error.name !== 'AbortError') console.error('Error loading paths:', error);
+            });
+    }
+
+    function unwrapPath(path) {
+        // Keep lines that cross the antimeridian from being drawn the long way round the map
+        const unwrapped = [path[0]];
+        for (let i = 1; i < path.length; i++) {
+            let lon = path[i][1];
+            const previous = unwrapped[i - 1][1];
+            while (lon - previous > 180) lon -= 360;
+            while (lon - previous < -180) lon += 360;
+            unwrapped.push([path[i][0], lon]);
+        }
+        return unwrapped;
+    }
+
+    function applyFull(data) {
+        // Clear existing markers and lines
+        clearMap();
+        
+        // Store data for later use
+        lastBalloonsData = data.balloons;
+        lastAircraftData = data.aircraft;
+        lastConstellationData = data.constellation;
+        lastSafetyAnalysis = data.safety_analysis || {};
+        
+        // Process constellation links; markers are placed by renderMarkers
+        processConstellationLinks(data.constellation, data.balloons);
+    }
+
+    function applyDelta(delta) {
+        // Patch only the balloons and aircraft that changed; everything else stays on the map
+        const byId = new Map(lastBalloonsData.map(balloon => [balloon.id, balloon]));
+        delta.balloons.removed.forEach(id => {
+            byId.delete(id);
+            const marker = balloonMarkers.get(id);
+            if (marker) mymap.removeLayer(marker);
+            balloonMarkers.delete(id);
+        });
+        delta.balloons.extended.forEach(patch => {
+            const balloon = patchTrack(byId.get(patch.id), patch);
+            byId.set(balloon.id, balloon);
+            updateBalloonMarker(balloon);
+        });
+        delta.balloons.replaced.forEach(balloon => {
+            byId.set(balloon.id, balloon);
+            updateBalloonMarker(balloon);
+        });
+        // Removed tracks drop out and new ones are appended, keeping the indices links refer to
+        lastBalloonsData = lastBalloonsData.filter(balloon => byId.has(balloon.id))
+            .map(balloon => byId.get(balloon.id))
+            .concat(delta.balloons.added);
+
+        if (delta.constellation !== undefined) lastConstellationData = delta.constellation;
+        processConstellationLinks(lastConstellationData, lastBalloonsData);
+
+        const aircraftByKey = new Map(lastAircraftData.map(aircraft => [aircraftKey(aircraft), aircraft]));
+        delta.aircraft.removed.forEach(key => aircraftByKey.delete(key));
+        delta.aircraft.upserted.forEach(aircraft => aircraftByKey.set(aircraftKey(aircraft), aircraft));
+        lastAircraftData = Array.from(aircraftByKey.values());
+        delta.aircraft.removed.forEach(removeAircraftMarker);
+        if (delta.safety_analysis !== undefined) {
+            // Risk colours may have changed for any aircraft on the map
+            lastSafetyAnalysis = delta.safety_analysis;
+            processAirTrafficData(lastAircraftData.filter(aircraft => aircraftMarkers.has(aircraftKey(aircraft))), lastSafetyAnalysis);
+        } else {
+            processAirTrafficData(delta.aircraft.upserted.filter(aircraft => aircraftMarkers.has(aircraftKey(aircraft))), lastSafetyAnalysis);
+        }
+    }
+
+    function patchTrack(balloon, patch) {
+        // Mirrors _patch_track in Deltas.py: new points in front, the oldest trimmed
+        const path = patch.path.concat(balloon.path.slice(0, patch.keep));
+        const velocities = patch.velocities.concat(balloon.velocities.slice(0, patch.keep));
+        if (patch.keep < balloon.path.length && velocities.length > 0) {
+            velocities[velocities.length - 1] = [0, 0];
+        }
+        return { id: balloon.id, path: path, velocities: velocities };
+    }
+
+    function aircraftKey(aircraft) {
+        return aircraft.icao24 || aircraft.callsign;
+    }
+
     function clearMap() {
         balloonMarkers.forEach(marker => mymap.removeLayer(marker));
         constellationLines.forEach(line => mymap.removeLayer(line));
         aircraftMarkers.forEach(marker => mymap.removeLayer(marker));
         
-        balloonMarkers = [];
+        clusterLayer.clearLayers();
+        
+        balloonMarkers = new Map();
         constellationLines = [];
-        aircraftMarkers = [];
+        aircraftMarkers = new Map();
     }
 
     function processBalloons(balloons) {
-            balloons.forEach(balloon => {
-                const path = balloon.path;
-                if (path.length > 0) {
-                    // Add a marker for the latest position
-                    const latestPosition = path[0];
-                    const latestVelocity = balloon.velocities[0];
-                    const speed = latestVelocity[0];
-                    const direction = latestVelocity[1];
-
-                // Create custom balloon icon
-                const balloonIcon = L.divIcon({
-                    className: 'balloon-marker',
-                    html: `<div style="
-                        width: 10px; 
-                        height: 10px; 
-                        background: #e74c3c; 
-                        border-radius: 50%; 
-                        border: 1.5px solid white;
-                        box-shadow: 0 1px 3px rgba(0,0,0,0.3);
-                        transform: rotate(${direction}deg);
-                    "></div>`,
-                    iconSize: [10, 10],
-                    iconAnchor: [5, 5]
-                });
-
-                const marker = L.marker(latestPosition, { icon: balloonIcon }).addTo(mymap);
-                
-                // Create popup content
-                const popupContent = `
-                    <h3>Balloon ${balloon.id}</h3>
-                    <div class="popup-item">
-                        <span class="popup-label">Speed:</span>
-                        <span class="popup-value">${speed.toFixed(2)} km/h</span>
-                    </div>
-                    <div class="popup-item">
-                        <span class="popup-label">Direction:</span>
-                        <span class="popup-value">${direction.toFixed(1)}°</span>
-                    </div>
-                    <div class="popup-item">
-                        <span class="popup-label">Position:</span>
-                        <span class="popup-value">${latestPosition[0].toFixed(4)}, ${latestPosition[1].toFixed(4)}</span>
-                    </div>
-                    <div class="popup-item">
-                        <span class="popup-label">Path Length:</span>
-                        <span class="popup-value">${path.length} points</span>
-                    </div>
-                `;
-                
-                marker.bindPopup(popupContent);
-                balloonMarkers.push(marker);
+        balloons.forEach(balloon => {
+            if (balloon.path.length > 0) {
+                const marker = L.marker(balloon.path[0], { icon: balloonIcon(balloon) }).addTo(mymap);
+                marker.bindPopup(balloonPopup(balloon));
+                balloonMarkers.set(balloon.id, marker);
             }
         });
     }
 
+    function updateBalloonMarker(balloon) {
+        // Balloons inside a cluster have no marker; renderMarkers places them when they come out
+        const marker = balloonMarkers.get(balloon.id);
+        if (!marker || balloon.path.length === 0) return;
+        marker.setLatLng(balloon.path[0]);
+        marker.setIcon(balloonIcon(balloon));
+        marker.setPopupContent(balloonPopup(balloon));
+    }
+
+    function balloonIcon(balloon) {
+        // Create custom balloon icon
+        const direction = balloon.velocities[0][1];
+        return L.divIcon({
+            className: 'balloon-marker',
+            html: `<div style="
+                width: 10px; 
+                height: 10px; 
+                background: #e74c3c; 
+                border-radius: 50%; 
+                border: 1.5px solid white;
+                box-shadow: 0 1px 3px rgba(0,0,0,0.3);
+                transform: rotate(${direction}deg);
+            "></div>`,
+            iconSize: [10, 10],
+            iconAnchor: [5, 5]
+        });
+    }
+
+    function balloonPopup(balloon) {
+        // Create popup content
+        const latestPosition = balloon.path[0];
+        const speed = balloon.velocities[0][0];
+        const direction = balloon.velocities[0][1];
+        return `
+            <h3>Balloon ${balloon.id}</h3>
+            <div class="popup-item">
+                <span class="popup-label">Speed:</span>
+                <span class="popup-value">${speed.toFixed(2)} km/h</span>
+            </div>
+            <div class="popup-item">
+                <span class="popup-label">Direction:</span>
+                <span class="popup-value">${direction.toFixed(1)}°</span>
+            </div>
+            <div class="popup-item">
+                <span class="popup-label">Position:</span>
+                <span class="popup-value">${latestPosition[0].toFixed(4)}, ${latestPosition[1].toFixed(4)}</span>
+            </div>
+            <div class="popup-item">
+                <span class="popup-label">Path Length:</span>
+                <span class="popup-value">${balloon.path.length} points</span>
+            </div>
+        `;
+    }
+
     function processConstellationLinks(constellation, balloons) {
+        constellationLines.forEach(line => mymap.removeLayer(line));
+        constellationLines = [];
         if (!document.getElementById('showConstellation').checked) return;
 
-            constellation.forEach(link => {
-                const balloon1 = balloons[link[0]];
-                const balloon2 = balloons[link[1]];
+        constellation.forEach(link => {
+            const balloon1 = balloons[link[0]];
+            const balloon2 = balloons[link[1]];
 
-                if (balloon1.path.length > 0 && balloon2.path.length > 0) {
-                    const pos1 = balloon1.path[0];
-                    const pos2 = balloon2.path[0];
+            if (balloon1 && balloon2 && balloon1.path.length > 0 && balloon2.path.length > 0) {
+                const pos1 = balloon1.path[0];
+                const pos2 = balloon2.path[0];
                 const line = L.polyline([pos1, pos2], {
                     color: '#9b59b6',
                     weight: 2,
@@ -165,21 +469,27 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     }
 
+    function removeAircraftMarker(key) {
+        const marker = aircraftMarkers.get(key);
+        if (marker) mymap.removeLayer(marker);
+        aircraftMarkers.delete(key);
+    }
+
     function processAirTrafficData(aircraftData, safetyAnalysis) {
-        if (!document.getElementById('showAirTraffic').checked) return;
+        const highRiskEncounters = (safetyAnalysis && safetyAnalysis.high_risk_encounters) || [];
         
         aircraftData.forEach(aircraft => {
+            removeAircraftMarker(aircraftKey(aircraft));
             const position = [aircraft.latitude, aircraft.longitude];
             const altitude = aircraft.altitude || aircraft.geo_altitude || 0;
             const velocity = aircraft.velocity || 0;
             const track = aircraft.true_track || 0;
             
             // Determine if this aircraft is in a high-risk encounter
-            const isHighRisk = safetyAnalysis.high_risk_encounters.some(encounter => 
+            const isHighRisk = highRiskEncounters.some(encounter => 
                 encounter.aircraft_callsign === aircraft.callsign
             );
-            
-            // Create aircraft icon with color based on risk level
+
             const aircraftColor = isHighRisk ? '#f44336' : '#2196f3';
             
             const aircraftIcon = L.divIcon({
@@ -232,7 +542,7 @@ document.addEventListener('DOMContentLoaded', function () {
             `;
             
             marker.bindPopup(popupContent);
-            aircraftMarkers.push(marker);
+            aircraftMarkers.set(aircraftKey(aircraft), marker);
         });
     }
 
@@ -450,6 +760,20 @@ document.addEventListener('DOMContentLoaded', function () {
             if (safetyAnalysis.near_misses && safetyAnalysis.near_misses.length > 0) {
                 analysisHTML += `<p><span class="warning">🚨 ${safetyAnalysis.near_misses.length} NEAR MISSES detected!</span></p>`;
             }
+
+            if (safetyAnalysis.predicted_conflicts && safetyAnalysis.predicted_conflicts.length > 0) {
+                const soonest = safetyAnalysis.predicted_conflicts[0];
+                analysisHTML += `<p><span class="warning">⏱️ ${safetyAnalysis.prediction.conflicts} conflicts predicted within ${safetyAnalysis.prediction.horizon_minutes} min</span></p>`;
+                analysisHTML += `
+                    <div class="encounter-item">
+                        <div class="encounter-header">Balloon ${soonest.balloon_id} ↔ ${soonest.aircraft_callsign}</div>
+                        <div class="encounter-details">
+                            In ${(soonest.time_to_conflict/60).toFixed(1)} min |
+                            Closest: ${(soonest.closest_horizontal_distance/1000).toFixed(1)} km, ${Math.round(soonest.closest_vertical_distance)} m
+                        </div>
+                    </div>
+                `;
+            }
             
             if (safetyAnalysis.altitude_conflicts > 0) {
                 analysisHTML += `<p><span class="warning">⚠️ ${safetyAnalysis.altitude_conflicts} altitude conflicts with flight corridors</span></p>`;
@@ -525,20 +849,25 @@ document.addEventListener('DOMContentLoaded', function () {
             processConstellationLinks(lastConstellationData, lastBalloonsData);
         });
         
+        document.getElementById('showTracks').addEventListener('change', loadTracks);
+        
         document.getElementById('showAirTraffic').addEventListener('change', function() {
             // Only reload map display, don't fetch new data
-            processAirTrafficData(lastAircraftData, {});
+            renderMarkers();
         });
         
         // Add air traffic fetch toggle
         document.getElementById('fetchAirTraffic').addEventListener('change', function() {
             airTrafficEnabled = this.checked;
-            loadData(true);  // Force refresh when toggling air traffic
+            currentVersion = null;  // A different dataset, so start from a full payload
+            loadData(true).then(startStream);  // Force refresh when toggling air traffic
         });
     }
 
 
 
     // Auto-refresh every 15 minutes to avoid API rate limiting
-    setInterval(loadData, 15 * 60 * 1000);
-});
\ No newline at end of file
+    setInterval(() => {
+        if (!stream || stream.readyState === EventSource.CLOSED) loadData();
+    }, 15 * 60 * 1000);
+});
@@ -0,0 +1,56 @@
+import AirTrafficData
+import OpenSkyClient
+from AircraftBatch import AircraftBatch
+
+
+class FakeCollector:
+    def __init__(self, breaker):
+        self.client = OpenSkyClient.OpenSkyClient(breaker=breaker)
+        self.boxes = []
+
+    def fetch_area(self, *box):
+        self.boxes.append(box)
+        return AircraftBatch.empty()
+
+
+def test_half_open_circuit_fetches_a_single_trial_tile():
+    breaker = OpenSkyClient.CircuitBreaker(failure_threshold=1, cooldown=0)
+    breaker.record_failure()
+    collector = FakeCollector(breaker)
+    tiles = AirTrafficData.plan_tiles([5.0, 45.0, -45.0], [5.0, 90.0, -120.0])
+    results = AirTrafficData.fetch_tiles(tiles, collector=collector)
+    assert len(collector.boxes) == 1
+    assert set(results) == set(tiles)
+
+
+def test_spread_out_balloons_fall_back_to_one_enclosing_box():
+    lat, lon = [-60.0, 0.0, 60.0] * 100, [-150.0, 0.0, 150.0] * 100
+    tile_deg, tiles = AirTrafficData.choose_tiles(lat, lon)
+    assert list(tiles) == [(0, 0)]
+    assert AirTrafficData.plan_cost(tiles) == 4
+
+
+def test_far_apart_clusters_use_tiles_that_cost_less_than_the_box():
+    lat, lon = [1.0, 2.0, 45.0], [1.0, 2.0, 95.0]
+    tile_deg, tiles = AirTrafficData.choose_tiles(lat, lon)
+    assert tile_deg == AirTrafficData.TILE_DEG and len(tiles) == 2
+    assert AirTrafficData.plan_cost(tiles) == 2
+
+
+def test_plan_stays_within_the_remaining_credits():
+    lat, lon = [1.0, 2.0, 45.0], [1.0, 2.0, 95.0]
+    assert list(AirTrafficData.choose_tiles(lat, lon, credits=1)[1]) == [(0, 0)]
+
+
+def test_safety_from_columns_matches_safety_from_records():
+    balloons = [{'id': 7, 'path': [[10.0, 20.0, 20.0]]}, {'id': 3, 'path': []}, {'id': 9, 'path': [[-5.0, 40.0, 20.0]]}]
+    states = [['abc123', 'NEAR1   ', 'X', 0, 0, 20.01, 10.0, 20100.0, False, 0, 0, 0, None, 20100.0, '1', False, 0],
+              ['def456', 'FAR1    ', 'X', 0, 0, 40.5, -5.0, 20000.0, False, 0, 0, 0, None, 20000.0, '1', False, 0]]
+    aircraft = AircraftBatch.from_states(states)
+    heads = AirTrafficData.balloon_heads(balloons)
+    from_records = AirTrafficData.analyze_air_traffic_safety(balloons, aircraft)
+    from_columns = AirTrafficData.analyze_heads_safety(heads, [7, 3, 9], aircraft)
+    from_records.pop('timings_ms')
+    from_columns.pop('timings_ms')
+    assert from_columns == from_records
+    assert [e['balloon_id'] for e in from_columns['high_risk_encounters']] == [7]
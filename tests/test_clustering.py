@@ -0,0 +1,14 @@
+import json
+import Clustering
+
+
+def query(index, *viewport):
+    return json.loads(index.query(*viewport).bodies['identity'])
+
+
+def test_query_across_the_antimeridian():
+    index = Clustering.ClusterIndex([0.0, 1.0, 0.0], [179.0, -179.0, 0.0], ['east', 'west', 'origin'])
+    for viewport in [(170, -10, -170, 10), (170, -10, 190, 10)]:
+        body = query(index, *viewport, Clustering.MAX_ZOOM + 1)
+        assert sorted(body['points']) == ['east', 'west'] and body['clusters'] == []
+    assert query(index, -10, -10, 10, 10, Clustering.MAX_ZOOM + 1)['points'] == ['origin']
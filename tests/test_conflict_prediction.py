@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import ConflictPrediction
+import Geodesy
+from AircraftBatch import AircraftBatch
+from Snapshot import Snapshot
+
+KEY = 500000  # Absolute hour of the balloon snapshot
+NOW = KEY * 3600.0
+
+
+def state(icao24, lat, lon, altitude, velocity, track, vertical_rate=0.0):
+    """An OpenSky state vector reported at NOW"""
+    return [icao24, 'TEST1   ', 'X', NOW, NOW, lon, lat, altitude, False, velocity, track,
+            vertical_rate, None, altitude, '1', False, 0]
+
+
+def predict(heads, speed, direction, states, **kwargs):
+    return ConflictPrediction.predict(heads, np.asarray(speed, dtype=float), np.asarray(direction, dtype=float),
+                                      AircraftBatch.from_states(states), now=NOW, **kwargs)
+
+
+def test_head_on_conflict_interval():
+    # A stationary balloon at 20 km and an aircraft 100 km east of it flying west at 250 m/s, 100 m higher
+    heads = Snapshot(np.array([0.0]), np.array([0.0]), np.array([20.0]), key=KEY)
+    east = 100 / Geodesy.KM_PER_DEGREE
+    result = predict(heads, [0], [0], [state('abc123', 0.0, east, 20100.0, 250.0, 270.0)])
+
+    conflict, = result['predicted_conflicts']
+    assert conflict['aircraft_icao24'] == 'abc123'
+    assert conflict['time_to_conflict'] == pytest.approx(380, abs=1)  # 95 km at 0.25 km/s
+    assert conflict['conflict_ends'] == pytest.approx(420, abs=1)
+    assert conflict['closest_approach_time'] == pytest.approx(400, abs=1)
+    assert conflict['closest_horizontal_distance'] < 50
+    assert conflict['closest_vertical_distance'] == pytest.approx(100, abs=1)
+    assert result['prediction']['conflicts'] == 1
+
+
+def test_no_conflict_when_vertically_separated_or_diverging():
+    heads = Snapshot(np.array([0.0]), np.array([0.0]), np.array([20.0]), key=KEY)
+    east = 100 / Geodesy.KM_PER_DEGREE
+    result = predict(heads, [0], [0], [state('above', 0.0, east, 21000.0, 250.0, 270.0),
+                                       state('away', 0.0, east, 20000.0, 250.0, 90.0)])
+    assert result['predicted_conflicts'] == []
+
+
+def test_conflict_already_inside_the_minima_starts_now():
+    heads = Snapshot(np.array([10.0]), np.array([10.0]), np.array([12.0]), key=KEY)
+    result = predict(heads, [0], [0], [state('close', 10.01, 10.0, 12000.0, 200.0, 0.0)])
+    assert result['predicted_conflicts'][0]['time_to_conflict'] == 0
+
+
+def test_conflicts_name_balloons_by_track_id():
+    # The second head row is invalid and the conflicting balloon is the third one
+    heads = Snapshot(np.array([50.0, np.nan, 0.0]), np.array([50.0, 0.0, 0.0]), np.array([20.0, 20.0, 20.0]), key=KEY)
+    east = 100 / Geodesy.KM_PER_DEGREE
+    states = [state('abc123', 0.0, east, 20100.0, 250.0, 270.0)]
+    by_row = predict(heads, [0, 0, 0], [0, 0, 0], states)
+    by_id = predict(heads, [0, 0, 0], [0, 0, 0], states, balloon_ids=np.array([41, 42, 77]))
+    assert by_row['predicted_conflicts'][0]['balloon_id'] == 2
+    assert by_id['predicted_conflicts'][0]['balloon_id'] == 77
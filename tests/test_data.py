@@ -0,0 +1,40 @@
+import pytest
+import Data
+
+
+@pytest.mark.parametrize('body, records, dropped', [
+    ('[[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]', [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]], 0),
+    ('[ [1.0, 2.0, 3.0] ]\n', [[1.0, 2.0, 3.0]], 0),
+    ('[\n  [1.0, 2.0, 3.0],\n  [4.0, 5.0, 6.0]\n]\n', [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]], 0),
+    ('[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]', [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]], 0),
+    ('[[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]', [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]], 0),
+    ('[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]', [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]], 0),
+    ('[[1.0, 2.0, 3.0], [NaN, 5.0, 6.0], [95.0, 0.0, 1.0]]', [[1.0, 2.0, 3.0]], 2),
+    ('[[1.0, 2.0, 3.0], [4.0, 5.0', [[1.0, 2.0, 3.0]], 1),
+    ('[ ]', [], 0),
+    ('', [], 0),
+])
+def test_parse_records(body, records, dropped):
+    parsed, parsed_dropped = Data.parse_records(body)
+    assert parsed.shape == (len(records), 3)
+    assert (parsed.tolist(), parsed_dropped) == (records, dropped)
+
+
+@pytest.mark.parametrize('body, records, dropped', [
+    ('[[1.0, 2.0, 3.0, 4.0], [5.0, 6.0]]', [], 2),  # Same value count as two good records
+    ('[[1.0, 2.0, 3.0], [null, 5.0, 6.0], [7.0, 8.0, 9.0]]', [[1.0, 2.0, 3.0], [7.0, 8.0, 9.0]], 1),
+    ('[[1.0, 2.0, 3.0] [4.0, 5.0, 6.0]]', [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]], 0),
+    ('[[1.0, [2.0, 3.0], 4.0]]', [], 1),
+])
+def test_malformed_records_do_not_shift_their_neighbours(body, records, dropped):
+    parsed, parsed_dropped = Data.parse_records(body)
+    assert (parsed.tolist(), parsed_dropped) == (records, dropped)
+
+
+def test_parse_data_without_records_is_unavailable():
+    assert Data.parse_data('not json') is None
+
+
+@pytest.mark.parametrize('body', ['[]', '[ ]\n', ''])
+def test_parse_data_keeps_empty_snapshots(body):
+    assert Data.parse_data(body) == []
@@ -0,0 +1,82 @@
+import copy
+import numpy as np
+import Deltas
+import Tracking
+from Responses import EncodedPayload
+from SharedCache import MemoryBackend
+from Snapshot import Snapshot
+
+BALLOONS = 200
+
+
+def snapshot(key, drop=(), extra=()):
+    """Balloons drifting on straight lines, minus the dropped rows, plus extra (lat, lon) balloons"""
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-60, 60, BALLOONS) + rng.uniform(-0.5, 0.5, BALLOONS) * (key - 95)
+    lon = rng.uniform(-170, 170, BALLOONS) + rng.uniform(-0.5, 0.5, BALLOONS) * (key - 95)
+    keep = np.setdiff1d(np.arange(BALLOONS), drop)
+    lat = np.concatenate([lat[keep], [p[0] for p in extra]])
+    lon = np.concatenate([lon[keep], [p[1] for p in extra]])
+    return Snapshot(lat, lon, np.full(len(lat), 10.0), key=key)
+
+
+def payload(state, version):
+    balloons, _ = state.balloons()
+    return {'version': version, 'balloons': copy.deepcopy(balloons), 'aircraft': [], 'constellation': [],
+            'safety_analysis': {}, 'insights': {}, 'data_quality': {}, 'last_updated': '',
+            'air_traffic_enabled': False}
+
+
+def apply(old, delta):
+    """Balloons after applying a delta to an old payload, in the order static/js/main.js keeps them"""
+    by_id = {b['id']: b for b in old['balloons']}
+    for track_id in delta['balloons']['removed']:
+        del by_id[track_id]
+    for patch in delta['balloons']['extended']:
+        by_id[patch['id']] = Deltas._patch_track(by_id[patch['id']], patch)
+    for balloon in delta['balloons']['replaced']:
+        by_id[balloon['id']] = balloon
+    return [by_id[b['id']] for b in old['balloons'] if b['id'] in by_id] + delta['balloons']['added']
+
+
+def test_delta_round_trip():
+    # Balloons 3 and 7 are only seen in the oldest hour, so their tracks age out next hour
+    state = Tracking.TrackState(window=6)
+    state.update({h: snapshot(100 - h, drop=(3, 7) if h < 5 else ()) for h in range(6)})
+    old = payload(state, 1)
+    # A new balloon appears far from the rest
+    state.update({h: snapshot(101 - h, drop=(3, 7), extra=[(89.0, 0.0)] if h == 0 else ()) for h in range(6)})
+    new = payload(state, 2)
+
+    delta = Deltas.diff_payloads(old, new)
+    assert delta['since'] == 1 and delta['version'] == 2
+    assert len(delta['balloons']['removed']) == 2
+    assert len(delta['balloons']['added']) == 1
+    assert delta['balloons']['extended']
+    assert apply(old, delta) == new['balloons']
+
+
+def test_reordered_tracks_have_no_delta():
+    state = Tracking.TrackState(window=6)
+    state.update({h: snapshot(100 - h) for h in range(6)})
+    old = payload(state, 1)
+    new = copy.deepcopy(old)
+    new['version'] = 2
+    new['balloons'].reverse()
+    assert Deltas.diff_payloads(old, new) is None
+
+
+def test_history_keeps_the_last_generations():
+    history = Deltas.DeltaHistory(MemoryBackend())
+    state = Tracking.TrackState(window=6)
+    state.update({h: snapshot(100 - h) for h in range(6)})
+    payloads = []
+    for version in range(1, Deltas.MAX_GENERATIONS + 5):
+        payloads.append(payload(state, version))
+        history.record('data', payloads[-1])
+
+    latest = EncodedPayload(payloads[-1])
+    assert history.delta('data', 1, latest) is None  # Evicted
+    oldest_kept = payloads[-Deltas.MAX_GENERATIONS]['version']
+    assert history.delta('data', oldest_kept, latest) is not None
+    assert len(history.cache.get('history:data')[0]) == Deltas.MAX_GENERATIONS
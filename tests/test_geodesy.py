@@ -0,0 +1,122 @@
+import math
+import numpy as np
+import pytest
+import Geodesy
+
+QUARTER_KM = math.pi * Geodesy.EARTH_RADIUS_KM / 2
+SAMPLES = 5000
+
+
+# The formulas app.py and AirTrafficData.py used before Geodesy, copied as they were
+def app_haversine(lon1, lat1, lon2, lat2):
+    R = 6371  # Radius of Earth in kilometers
+    dLat = math.radians(lat2 - lat1)
+    dLon = math.radians(lon2 - lon1)
+    a = math.sin(dLat / 2) * math.sin(dLat / 2) + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dLon / 2) * math.sin(dLon / 2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    distance = R * c
+    return distance
+
+
+def app_calculate_bearing(lon1, lat1, lon2, lat2):
+    dLon = math.radians(lon2 - lon1)
+    lat1 = math.radians(lat1)
+    lat2 = math.radians(lat2)
+    y = math.sin(dLon) * math.cos(lat2)
+    x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dLon)
+    bearing = math.degrees(math.atan2(y, x))
+    return (bearing + 360) % 360
+
+
+def air_traffic_calculate_distance(lat1, lon1, lat2, lon2):
+    R = 6371000  # Earth's radius in meters
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lon = math.radians(lon2 - lon1)
+    a = (math.sin(delta_lat / 2) * math.sin(delta_lat / 2) +
+         math.cos(lat1_rad) * math.cos(lat2_rad) *
+         math.sin(delta_lon / 2) * math.sin(delta_lon / 2))
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
+
+
+@pytest.fixture(params=[0, 1, 2])
+def points(request):
+    """Random pairs: anywhere on the globe, within a few degrees, and near the poles and antimeridian"""
+    rng = np.random.default_rng(request.param)
+    lat1 = rng.uniform(-90, 90, SAMPLES)
+    lon1 = rng.uniform(-180, 180, SAMPLES)
+    if request.param == 0:
+        lat2, lon2 = rng.uniform(-90, 90, SAMPLES), rng.uniform(-180, 180, SAMPLES)
+    else:
+        spread = 3 if request.param == 1 else 0.01
+        lat2 = np.clip(lat1 + rng.uniform(-spread, spread, SAMPLES), -90, 90)
+        lon2 = (lon1 + rng.uniform(-spread, spread, SAMPLES) + 180) % 360 - 180
+    return lat1, lon1, lat2, lon2
+
+
+def angle_difference(a, b):
+    difference = np.abs(np.asarray(a) - np.asarray(b)) % 360
+    return np.minimum(difference, 360 - difference)
+
+
+def test_kernels_match_the_formulas_they_replaced(points):
+    lat1, lon1, lat2, lon2 = points
+    pairs = list(zip(lat1.tolist(), lon1.tolist(), lat2.tolist(), lon2.tolist()))
+    old_km = np.array([app_haversine(lo1, la1, lo2, la2) for la1, lo1, la2, lo2 in pairs])
+    old_m = np.array([air_traffic_calculate_distance(*pair) for pair in pairs])
+    old_bearing = np.array([app_calculate_bearing(lo1, la1, lo2, la2) for la1, lo1, la2, lo2 in pairs])
+
+    assert np.allclose(Geodesy.haversine_km(lat1, lon1, lat2, lon2), old_km, rtol=1e-9, atol=1e-9)
+    assert np.allclose(Geodesy.haversine_km(lat1, lon1, lat2, lon2) * 1000, old_m, rtol=1e-9, atol=1e-6)
+    assert np.allclose([Geodesy.haversine_km_scalar(*pair) for pair in pairs], old_km, rtol=1e-9, atol=1e-9)
+    assert np.all(angle_difference(Geodesy.bearing_deg(lat1, lon1, lat2, lon2), old_bearing) < 1e-9)
+    assert np.all(angle_difference([Geodesy.bearing_deg_scalar(*pair) for pair in pairs], old_bearing) < 1e-9)
+
+
+@pytest.mark.parametrize('count', [0, 1, Geodesy.SCALAR_PAIRS - 1, Geodesy.SCALAR_PAIRS, 100])
+def test_distances_and_bearings_agree_on_both_paths(points, count):
+    lat1, lon1, lat2, lon2 = (column[:count] for column in points)
+    distances, bearings = Geodesy.distances_and_bearings(lat1, lon1, lat2, lon2)
+    assert isinstance(distances, list) and len(distances) == len(bearings) == count
+    assert np.allclose(distances, Geodesy.haversine_km(lat1, lon1, lat2, lon2), rtol=1e-12, atol=1e-9)
+    assert np.all(angle_difference(bearings, Geodesy.bearing_deg(lat1, lon1, lat2, lon2)) < 1e-9)
+
+
+@pytest.mark.parametrize('lat1, lon1, lat2, lon2, km, bearing', [
+    (0, 0, 0, 90, QUARTER_KM, 90),
+    (0, 0, 90, 0, QUARTER_KM, 0),
+    (0, 0, -1, 0, Geodesy.KM_PER_DEGREE, 180),
+    (10, 179.5, 10, -179.5, None, 90),  # Across the antimeridian
+    (0, 10, 0, 9, Geodesy.KM_PER_DEGREE, 270),
+])
+def test_known_distances_and_bearings(lat1, lon1, lat2, lon2, km, bearing):
+    distance = float(Geodesy.haversine_km(lat1, lon1, lat2, lon2))
+    if km is not None:
+        assert distance == pytest.approx(km)
+    else:
+        assert distance == pytest.approx(Geodesy.KM_PER_DEGREE * math.cos(math.radians(10)), rel=1e-3)
+    assert float(Geodesy.bearing_deg(lat1, lon1, lat2, lon2)) == pytest.approx(bearing, abs=0.5)
+
+
+def test_kernels_broadcast_and_are_symmetric():
+    rng = np.random.default_rng(0)
+    lat1, lat2 = rng.uniform(-90, 90, (2, 1000))
+    lon1, lon2 = rng.uniform(-180, 180, (2, 1000))
+    forward = Geodesy.haversine_km(lat1, lon1, lat2, lon2)
+    assert forward.shape == (1000,)
+    assert np.allclose(forward, Geodesy.haversine_km(lat2, lon2, lat1, lon1))
+    assert np.all((forward >= 0) & (forward <= 2 * QUARTER_KM + 1e-6))
+    matrix = Geodesy.haversine_km(lat1[:5, None], lon1[:5, None], lat2[None, :7], lon2[None, :7])
+    assert matrix.shape == (5, 7) and np.isclose(matrix[3, 4], Geodesy.haversine_km(lat1[3], lon1[3], lat2[4], lon2[4]))
+    bearings = Geodesy.bearing_deg(lat1, lon1, lat2, lon2)
+    assert np.all((bearings >= 0) & (bearings < 360))
+
+
+def test_chord_length_matches_unit_vectors():
+    rng = np.random.default_rng(1)
+    lat1, lat2 = rng.uniform(-90, 90, (2, 1000))
+    lon1, lon2 = rng.uniform(-180, 180, (2, 1000))
+    chords = np.linalg.norm(Geodesy.to_unit_vectors(lat1, lon1) - Geodesy.to_unit_vectors(lat2, lon2), axis=1)
+    assert np.allclose(Geodesy.chord_length(Geodesy.haversine_km(lat1, lon1, lat2, lon2)), chords)
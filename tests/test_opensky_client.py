@@ -0,0 +1,59 @@
+import pytest
+import requests
+import OpenSkyClient
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=b'{"states": []}'):
+        self.status_code = status_code
+        self.content = body
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+    def json(self):
+        return requests.models.complexjson.loads(self.content)
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def get(self, *args, **kwargs):
+        return self.responses.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(OpenSkyClient, 'BACKOFF_SECONDS', 0)
+
+
+def half_open_client(*responses):
+    breaker = OpenSkyClient.CircuitBreaker(failure_threshold=1, cooldown=0)
+    breaker.record_failure()
+    client = OpenSkyClient.OpenSkyClient(breaker=breaker)
+    client.session = FakeSession(*responses)
+    return client
+
+
+def test_malformed_body_during_half_open_trial_reopens_the_circuit():
+    client = half_open_client(*[FakeResponse(body=b'<html>') for _ in range(OpenSkyClient.RETRIES + 1)])
+    with pytest.raises(ValueError):
+        client.get_states(0, 1, 0, 1)
+    assert client.breaker.state == 'open'
+    assert client.counts['failures'] == 1
+    # The next trial goes out and closes the circuit again
+    client.session = FakeSession(FakeResponse())
+    assert client.get_states(0, 1, 0, 1) == {'states': []}
+    assert client.breaker.state == 'closed'
+
+
+def test_malformed_bodies_count_towards_opening_the_circuit():
+    client = OpenSkyClient.OpenSkyClient(breaker=OpenSkyClient.CircuitBreaker(failure_threshold=2))
+    client.session = FakeSession(*[FakeResponse(body=b'') for _ in range(2 * (OpenSkyClient.RETRIES + 1))])
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            client.get_states(0, 1, 0, 1)
+    assert client.breaker.state == 'open'
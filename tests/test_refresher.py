@@ -0,0 +1,25 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import Refresher
+
+
+def test_stale_requests_back_off_after_a_failed_refresh():
+    calls = []
+    done = threading.Event()
+
+    def compute(key):
+        calls.append(key)
+        done.set()
+        raise RuntimeError('upstream down')
+
+    scheduler = Refresher.RefreshScheduler(compute, ttl=timedelta(minutes=5), poll_seconds=60)
+    scheduler.cache.set(scheduler._cache_key('balloons'), ('old', datetime.now() - timedelta(hours=1)), ttl=3600)
+
+    assert scheduler.get('balloons') == 'old'
+    assert done.wait(5)
+    while scheduler._flight.in_flight('balloons'):
+        time.sleep(0.01)
+    for _ in range(10):
+        assert scheduler.get('balloons') == 'old'
+    assert calls == ['balloons']
@@ -0,0 +1,35 @@
+import numpy as np
+from Snapshot import Snapshot
+from SnapshotArchive import SnapshotArchive
+
+
+def snapshot(key):
+    lat = np.array([10.0, -20.0, np.nan])
+    return Snapshot(lat, np.array([30.0, -40.0, 0.0]), np.array([1.0, 2.0, 3.0]), key=key)
+
+
+def test_query_reads_only_partitions_on_disk(tmp_path, monkeypatch):
+    archive = SnapshotArchive(str(tmp_path))
+    keys = [480000, 480001, 480030]  # Two UTC days
+    for key in keys:
+        assert archive.append(key, snapshot(key))
+    (tmp_path / 'not-a-day').mkdir()
+    opened = []
+    partition = archive.partition
+    monkeypatch.setattr(archive, 'partition', lambda name: opened.append(name) or partition(name))
+
+    # A range of millions of hours only touches the two days that exist
+    found = list(archive.query(-10 ** 7, 10 ** 7))
+    assert [key for key, _ in found] == keys
+    assert len(opened) == 2
+    assert found[0][1]['lat'].tolist() == [-20.0, 10.0]  # Sorted by longitude, invalid rows dropped
+    assert [key for key, _ in archive.query(480001, 480029)] == [480001]
+    assert [key for key, _ in archive.query(480000, 480000, (20, 0, 40, 20))] == [480000]
+
+
+def test_query_across_the_antimeridian(tmp_path):
+    archive = SnapshotArchive(str(tmp_path))
+    lat = np.array([0.0, 0.0, 0.0])
+    archive.append(480000, Snapshot(lat, np.array([175.0, -175.0, 0.0]), np.ones(3), key=480000))
+    (_, columns), = archive.query(480000, 480000, (170, -5, -170, 5))
+    assert sorted(columns['lon'].tolist()) == [-175.0, 175.0]
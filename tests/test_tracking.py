@@ -0,0 +1,99 @@
+import itertools
+import pickle
+import numpy as np
+import pytest
+import Synthetic
+import Tracking
+from Snapshot import Snapshot
+
+LATEST = 123  # Absolute hour of the newest synthetic snapshot
+
+
+def snapshots(hours, balloons=300):
+    """{hours ago: Snapshot} for the newest `hours` of one synthetic constellation"""
+    lat, lon, alt = Synthetic.balloon_positions(balloons, 24, seed=5)
+    return {h: Snapshot(lat[h], lon[h], alt[h], hour=h, key=LATEST - h) for h in range(hours)}
+
+
+def older(data, hours):
+    """The same snapshots as they looked `hours` earlier, before the newest ones were published"""
+    return {h - hours: s for h, s in data.items() if h >= hours}
+
+
+@pytest.mark.parametrize('shape', [(1, 1), (2, 2), (3, 5), (5, 5), (4, 7)])
+def test_hungarian_matches_brute_force(shape):
+    rng = np.random.default_rng(sum(shape))
+    for _ in range(20):
+        cost = rng.uniform(0, 100, shape)
+        assignment = Tracking._hungarian(cost)
+        assert sorted(set(assignment.tolist())) == sorted(assignment.tolist())  # No column used twice
+        best = min(sum(cost[row, column] for row, column in enumerate(columns))
+                   for columns in itertools.permutations(range(shape[1]), shape[0]))
+        assert cost[np.arange(shape[0]), assignment].sum() == pytest.approx(best)
+
+
+@pytest.mark.parametrize('method', ['optimal', 'greedy'])
+def test_incremental_updates_match_tracking_from_scratch(method):
+    data = snapshots(24)
+    state = Tracking.TrackState(window=24, method=method)
+    for step in (12, 6, 3, 1, 0):
+        assert state.needs_update(older(data, step))
+        assert state.update(older(data, step))
+    assert not state.needs_update(data)
+    assert not state.update(data)
+
+    incremental, incremental_heads = state.balloons()
+    scratch, scratch_heads = Tracking.track_balloons(data, method=method).balloons()
+    assert incremental == scratch
+    assert incremental_heads.key == scratch_heads.key == LATEST
+    assert np.array_equal(incremental_heads.lat, scratch_heads.lat)
+
+
+def test_points_older_than_the_window_age_out():
+    data = snapshots(24)
+    state = Tracking.TrackState(window=6)
+    state.update(older(data, 10))
+    state.update(data)
+    balloons, heads = state.balloons()
+    assert heads.key == LATEST
+    assert all(len(b['path']) <= 6 for b in balloons)
+
+
+def test_newest_hour_going_backwards_keeps_track_ids():
+    data = snapshots(24)
+    state = Tracking.TrackState(window=24)
+    state.update(data)
+    before, _ = state.balloons()
+    version = state.version
+    # The newest file failed to fetch, so the next refresh only offers the hours behind it
+    assert not state.needs_update(older(data, 1))
+    assert not state.update(older(data, 1))
+    after, heads = state.balloons()
+    assert after == before
+    assert heads.key == LATEST and state.version == version
+
+
+def test_pickle_round_trip():
+    data = snapshots(24)
+    state = Tracking.track_balloons(older(data, 4))
+    copy = pickle.loads(pickle.dumps(state))
+    balloons, heads = state.balloons()
+    copied, copied_heads = copy.balloons()
+    assert copied == balloons
+    assert np.array_equal(copied_heads.lat, heads.lat) and copied_heads.key == heads.key
+    assert copy.version == state.version
+    # The copy keeps tracking from where the original was
+    assert not copy.needs_update(older(data, 4))
+    assert copy.update(data) and state.update(data)
+    assert copy.balloons()[0] == state.balloons()[0]
+
+
+def test_reset_does_not_reuse_track_ids():
+    data = snapshots(24)
+    state = Tracking.TrackState(window=24)
+    state.update(data)
+    before = {b['id'] for b in state.balloons()[0]}
+    # A refresh a whole window later starts the tracks over
+    state.update({h: Snapshot(s.lat, s.lon, s.alt, hour=h, key=s.key + 48) for h, s in data.items()})
+    after = {b['id'] for b in state.balloons()[0]}
+    assert after and not before & after
@@ -0,0 +1,68 @@
+import json
+import math
+import pytest
+import TrackTiles
+
+BALLOONS = [
+    {'id': 1, 'path': [[10.0, 20.0], [10.5, 19.0]], 'velocities': [[100, 90], [0, 0]]},
+    {'id': 2, 'path': [[-40.0, -100.0]], 'velocities': [[0, 0]]},
+    {'id': 3, 'path': [[0.0, 179.5], [0.0, -179.5]], 'velocities': [[100, 270], [0, 0]]},
+]
+
+
+@pytest.fixture
+def tiles():
+    return TrackTiles.TrackTiles(BALLOONS, version=7)
+
+
+def ids(payload):
+    return sorted(b['id'] for b in json.loads(payload.bodies['identity'])['balloons'])
+
+
+@pytest.mark.parametrize('zoom', [0, 3, 8, 22, 30, 1e308, math.inf, math.nan])
+def test_tiles_for_stays_within_limits(tiles, zoom):
+    tile_zoom, found = tiles._tiles_for(-180, -85, 180, 85, zoom)
+    assert 0 <= tile_zoom <= TrackTiles.MAX_ZOOM
+    assert len(found) <= TrackTiles.MAX_TILES
+    assert len(set(found)) == len(found)
+
+
+def test_deep_zoom_is_clamped(tiles):
+    assert tiles._tiles_for(20.000001, 10.000001, 20.000011, 10.000011, 1e308)[0] == TrackTiles.MAX_ZOOM
+
+
+def test_query_selects_tracks_in_the_viewport(tiles):
+    assert ids(tiles.query(15, 5, 25, 15, 6)) == [1]
+    assert ids(tiles.query(-110, -50, -90, -30, 6)) == [2]
+    assert ids(tiles.query(-180, -85, 180, 85, 1)) == [1, 2, 3]
+    assert ids(tiles.query(0, -60, 10, -50, 6)) == []
+
+
+def test_query_across_the_antimeridian(tiles):
+    assert ids(tiles.query(170, -5, 190, 5, 5)) == [3]
+    assert ids(tiles.query(170, -5, -170, 5, 5)) == [3]  # Written west > east
+
+
+@pytest.mark.parametrize('west, east, ranges', [
+    (170, -170, [(170, 180), (-180, -170)]),
+    (190, 200, [(-170, -160)]),
+    (-10, 10, [(-10, 10)]),
+    (10, -10, [(10, 180), (-180, -10)]),
+])
+def test_lon_ranges(west, east, ranges):
+    assert TrackTiles.lon_ranges(west, east) == ranges
+
+
+def test_query_simplifies_per_zoom(tiles):
+    body = json.loads(tiles.query(-180, -85, 180, 85, 1).bodies['identity'])
+    assert body['version'] == 7 and body['lod_zoom'] == TrackTiles.LOD_ZOOMS[0]
+    assert json.loads(tiles.query(15, 5, 25, 15, 14).bodies['identity'])['lod_zoom'] is None
+
+
+def test_tile_cache_is_bounded(tiles, monkeypatch):
+    monkeypatch.setattr(TrackTiles, 'MAX_CACHED_TILES', 4)
+    for x in range(10):
+        tiles._tile_tracks(8, x, 100)
+    tiles._tile_tracks(8, 6, 100)  # A hit moves the tile to the most recently used end
+    tiles._tile_tracks(8, 10, 100)
+    assert list(tiles._tiles) == [(8, 8, 100), (8, 9, 100), (8, 6, 100), (8, 10, 100)]